@@ -1,11 +1,20 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Response, abort, render_template, request, jsonify, send_from_directory
+import hmac
 import os
 import json
 import time
 from config import config
+from session_store import SessionConflict, create_session_store
+from puzzle_engine import PuzzleBoard
+from puzzle_solver import get_solver
+from puzzle_scrambler import ScramblePool
+from catch_sim import WEB_RULES
+from replay import InvalidReplay, ReplayVerifier, VerifierBusy
+from metrics import CONTENT_TYPE, ENDPOINT_KEY, MetricsMiddleware, RequestMetrics
+from session_memory import allocations, memory_report
 
 app = Flask(__name__)
-app.config.from_object(config['development'])
+app.config.from_object(config[os.environ.get('FLASK_CONFIG', 'default')])
 
 # Game configuration
 GAME_CONFIG = {
@@ -21,11 +30,65 @@ GAME_CONFIG = {
         {"filename": "persons_face.png", "points": 10, "count": 1}
     ],
     'PUZZLE_SIZE': 3,
-    'TILE_SIZE': 150
+    'PUZZLE_DIFFICULTY': 'random',  # 'random', 'easy', 'medium' or 'hard'
+    'TILE_SIZE': 150,
+    'EVENT_BATCH_SIZE': 10,  # client flushes queued catch/miss events at this size...
+    'EVENT_FLUSH_MS': 1000,  # ...or after this many milliseconds
+    'MOVE_FLUSH_MS': 150,    # puzzle clicks within this window go in one request
+    'RULES': WEB_RULES.to_dict()  # fixed-tick rules the client simulates and the server replays
 }
 
-# Store game sessions (in production, use a database)
-game_sessions = {}
+# Upper bound on events accepted by one /api/events call
+MAX_EVENTS_PER_REQUEST = 200
+# Upper bound on tile moves accepted by one /api/move_tiles call
+MAX_MOVES_PER_REQUEST = 100
+# Most points a single caught item is worth
+MAX_ITEM_POINTS = max(item['points'] for item in GAME_CONFIG['items_to_spawn'])
+
+# Store game sessions (bounded, expiring, safe under threaded workers)
+game_sessions = create_session_store(app.config)
+
+# Load (or build, on first run) the solver tables once at startup
+puzzle_solver = get_solver(GAME_CONFIG['PUZZLE_SIZE'])
+
+# Shuffled boards kept ready so start_puzzle does no shuffling itself. The
+# difficulty is the server's choice, never the client's.
+scramble_pool = ScramblePool(GAME_CONFIG['PUZZLE_SIZE'], difficulties=(GAME_CONFIG['PUZZLE_DIFFICULTY'],))
+
+# Re-simulates catch game replays before a win is accepted
+replay_verifier = ReplayVerifier(
+    workers=app.config.get('REPLAY_WORKERS', 2),
+    max_pending=app.config.get('REPLAY_MAX_PENDING', 64),
+    timeout=app.config.get('REPLAY_TIMEOUT', 5.0),
+)
+
+# Per-endpoint request timing and volume, exported on /metrics
+request_metrics = RequestMetrics()
+request_metrics.gauge('game_sessions', 'Live sessions held by the session store.', lambda: len(game_sessions))
+# Of the store's stats() only these go up and down; the rest only ever grow
+STORE_GAUGES = ('sessions', 'pending')
+request_metrics.gauge('game_session_store', 'Session store levels, see its stats().',
+                      lambda: {k: v for k, v in game_sessions.stats().items() if k in STORE_GAUGES}, label='stat')
+request_metrics.counter('game_session_store_total', 'Session store event counts, see its stats().',
+                        lambda: {k: v for k, v in game_sessions.stats().items() if k not in STORE_GAUGES},
+                        label='stat')
+if app.config.get('METRICS_ENABLED', True):
+    app.wsgi_app = MetricsMiddleware(app.wsgi_app, request_metrics)
+
+    @app.before_request
+    def tag_endpoint():
+        # Label requests by route rather than path, so the metric set stays bounded
+        request.environ[ENDPOINT_KEY] = request.endpoint
+
+    @app.route('/metrics')
+    def metrics():
+        """Request and session metrics in Prometheus text format"""
+        return Response(request_metrics.render(), content_type=CONTENT_TYPE)
+
+@app.errorhandler(SessionConflict)
+def session_conflict(error):
+    # Another worker changed the session mid-request; nothing was stored
+    return jsonify({'success': False, 'error': 'Session changed, try again', 'retry': True}), 409
 
 @app.route('/')
 def index():
@@ -42,39 +105,44 @@ def puzzle():
 @app.route('/api/start_game', methods=['POST'])
 def start_game():
     """Initialize a new game session"""
-    session_id = str(int(time.time() * 1000))  # Simple session ID
-    
-    game_sessions[session_id] = {
-        'score': 0,
-        'items_caught': 0,
-        'items_missed': 0,
-        'start_time': time.time(),
-        'game_over': False,
-        'won': False
-    }
+    session_id = game_sessions.create()
     
-    return jsonify({
-        'session_id': session_id,
-        'config': GAME_CONFIG
-    })
+    with game_sessions.locked(session_id) as session:
+        return jsonify({
+            'session_id': game_sessions.issue(session_id, session),
+            'seed': session.replay_seed,
+            'config': GAME_CONFIG
+        })
+
+def catch_points(points):
+    """Points for one caught item, capped at the most any item is worth
+
+    Returns None for anything that is not a non-negative int (bools included).
+    """
+    if isinstance(points, bool) or not isinstance(points, int) or points < 0:
+        return None
+    return min(points, MAX_ITEM_POINTS)
 
 @app.route('/api/update_score', methods=['POST'])
 def update_score():
     """Update game score when an item is caught"""
     data = request.get_json()
     session_id = data.get('session_id')
-    points = data.get('points', 0)
+    points = catch_points(data.get('points', 0))
+    if points is None:
+        return jsonify({'success': False, 'error': 'Invalid points'})
     
-    if session_id in game_sessions:
-        session = game_sessions[session_id]
-        session['score'] += points
-        session['items_caught'] += 1
-        
-        return jsonify({
-            'success': True,
-            'score': session['score'],
-            'items_caught': session['items_caught']
-        })
+    with game_sessions.locked(session_id) as session:
+        if session is not None:
+            session.score += points
+            session.items_caught += 1
+            
+            return jsonify({
+                'success': True,
+                'session_id': game_sessions.issue(session_id, session),
+                'score': session.score,
+                'items_caught': session.items_caught
+            })
     
     return jsonify({'success': False, 'error': 'Invalid session'})
 
@@ -84,47 +152,123 @@ def miss_item():
     data = request.get_json()
     session_id = data.get('session_id')
     
-    if session_id in game_sessions:
-        session = game_sessions[session_id]
-        session['items_missed'] += 1
-        
-        return jsonify({
-            'success': True,
-            'items_missed': session['items_missed']
-        })
+    with game_sessions.locked(session_id) as session:
+        if session is not None:
+            session.items_missed += 1
+            
+            return jsonify({
+                'success': True,
+                'session_id': game_sessions.issue(session_id, session),
+                'items_missed': session.items_missed
+            })
+    
+    return jsonify({'success': False, 'error': 'Invalid session'})
+
+@app.route('/api/events', methods=['POST'])
+def record_events():
+    """Apply an ordered batch of catch/miss events
+
+    Each event is {"seq": n, "type": "catch" | "miss", "points": p}. Events
+    with a sequence number already applied are skipped, so a client can
+    safely resend a batch after a failed request.
+    """
+    data = request.get_json()
+    session_id = data.get('session_id')
+    events = data.get('events')
+    
+    if not isinstance(events, list) or len(events) > MAX_EVENTS_PER_REQUEST:
+        return jsonify({'success': False, 'error': 'Invalid events'})
+    
+    with game_sessions.locked(session_id) as session:
+        if session is not None:
+            applied = 0
+            for event in events:
+                if not isinstance(event, dict):
+                    continue
+                seq = event.get('seq')
+                if not isinstance(seq, int) or seq <= session.event_seq:
+                    continue  # duplicate or retried event
+                
+                event_type = event.get('type')
+                points = catch_points(event.get('points', 0))
+                if event_type == 'catch' and points is not None:
+                    session.score += points
+                    session.items_caught += 1
+                elif event_type == 'miss':
+                    session.items_missed += 1
+                else:
+                    continue
+                session.event_seq = seq
+                applied += 1
+            
+            return jsonify({
+                'success': True,
+                'session_id': game_sessions.issue(session_id, session),
+                'applied': applied,
+                'last_seq': session.event_seq,
+                'score': session.score,
+                'items_caught': session.items_caught,
+                'items_missed': session.items_missed
+            })
     
     return jsonify({'success': False, 'error': 'Invalid session'})
 
 @app.route('/api/end_game', methods=['POST'])
 def end_game():
-    """End game and return final stats"""
+    """End game and return final stats
+
+    A win is only accepted with a replay (base64 recording of the mouse x on
+    every tick) that re-simulates to a win from the session's seed; the
+    replayed score and counts then replace the ones the client reported.
+    """
     data = request.get_json()
     session_id = data.get('session_id')
-    won = data.get('won', False)
-    missed_final_item = data.get('missed_final_item', False)
-    
-    if session_id in game_sessions:
-        session = game_sessions[session_id]
-        session['game_over'] = True
-        session['won'] = won
-        session['missed_final_item'] = missed_final_item
-        session['end_time'] = time.time()
-        session['duration'] = session['end_time'] - session['start_time']
-        
-        # Set the first part of the answer if won
-        if won:
-            session['first_answer_part'] = "aCM_iS_"
-        
-        return jsonify({
-            'success': True,
-            'final_score': session['score'],
-            'items_caught': session['items_caught'],
-            'items_missed': session['items_missed'],
-            'duration': session['duration'],
-            'won': won,
-            'missed_final_item': missed_final_item,
-            'first_answer_part': session.get('first_answer_part', '') if won else ''
-        })
+    won = data.get('won', False) is True
+    missed_final_item = data.get('missed_final_item', False) is True
+    
+    with game_sessions.locked(session_id) as session:
+        if session is None:
+            return jsonify({'success': False, 'error': 'Invalid session'})
+        seed = session.replay_seed
+    
+    # Verified outside the session lock, in the replay worker pool
+    result = None
+    if won:
+        try:
+            result = replay_verifier.verify(data.get('replay'), seed)
+        except VerifierBusy:
+            return jsonify({'success': False, 'error': 'Server busy', 'retry': True})
+        except InvalidReplay:
+            result = None
+        won = result is not None and result.won
+    
+    with game_sessions.locked(session_id) as session:
+        if session is not None:
+            if result is not None:
+                game_sessions.set_counters(session, score=result.score, items_caught=result.items_caught,
+                                           items_missed=result.items_missed)
+            session.game_over = True
+            session.won = won
+            session.missed_final_item = missed_final_item
+            session.end_time = time.time()
+            session.duration = session.end_time - session.start_time
+            
+            # Set the first part of the answer if won
+            if won:
+                session.first_answer_part = "aCM_iS_"
+            
+            return jsonify({
+                'success': True,
+                'session_id': game_sessions.issue(session_id, session),
+                'final_score': session.score,
+                'items_caught': session.items_caught,
+                'items_missed': session.items_missed,
+                'duration': session.duration,
+                'won': won,
+                'verified': result is not None and result.won,
+                'missed_final_item': missed_final_item,
+                'first_answer_part': session.first_answer_part if won else ''
+            })
     
     return jsonify({'success': False, 'error': 'Invalid session'})
 
@@ -134,45 +278,47 @@ def start_puzzle():
     data = request.get_json()
     session_id = data.get('session_id')
     
-    if session_id in game_sessions:
-        session = game_sessions[session_id]
-        session['puzzle_moves'] = 0
-        session['puzzle_completed'] = False
-        session['puzzle_start_time'] = time.time()
-        
-        # Generate shuffled puzzle state
-        puzzle_state = list(range(9))  # 0-8, where 8 is empty
-        import random
-        
-        # Shuffle by making random valid moves
-        empty_pos = 8
-        for _ in range(1000):
-            valid_moves = []
-            row, col = empty_pos // 3, empty_pos % 3
+    with game_sessions.locked(session_id) as session:
+        if session is not None:
+            if not session.won:
+                return jsonify({'success': False, 'error': 'Catch game not won'})
             
-            # Check all 4 directions
-            for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                new_row, new_col = row + dr, col + dc
-                if 0 <= new_row < 3 and 0 <= new_col < 3:
-                    valid_moves.append(new_row * 3 + new_col)
+            game_sessions.set_counters(session, puzzle_moves=0)
+            session.puzzle_completed = False
+            session.puzzle_start_time = time.time()
             
-            if valid_moves:
-                move_pos = random.choice(valid_moves)
-                # Swap empty space with the chosen position
-                puzzle_state[empty_pos], puzzle_state[move_pos] = puzzle_state[move_pos], puzzle_state[empty_pos]
-                empty_pos = move_pos
-        
-        session['puzzle_state'] = puzzle_state
-        session['empty_pos'] = empty_pos
-        
-        return jsonify({
-            'success': True,
-            'puzzle_state': puzzle_state,
-            'empty_pos': empty_pos
-        })
+            # Pre-generated shuffled board (the largest tile is the empty space)
+            board = PuzzleBoard(GAME_CONFIG['PUZZLE_SIZE'], scramble_pool.pop(GAME_CONFIG['PUZZLE_DIFFICULTY']))
+            session.puzzle_state = board
+            
+            return jsonify({
+                'success': True,
+                'session_id': game_sessions.issue(session_id, session),
+                'puzzle_state': board.to_list(),
+                'empty_pos': board.empty_pos
+            })
     
     return jsonify({'success': False, 'error': 'Invalid session'})
 
+def apply_tile_move(session, tile_pos):
+    """Slide the tile at tile_pos into the empty space if it is adjacent
+
+    Returns True if the move was made. Marks the puzzle completed when the
+    move solves it.
+    """
+    board = session.puzzle_state
+    if not board.move(tile_pos):
+        return False
+    session.puzzle_moves += 1
+    
+    # Check if solved
+    if board.is_solved:
+        session.puzzle_completed = True
+        session.puzzle_end_time = time.time()
+        session.second_answer_part = "tHe_GOaT"
+        session.full_answer = session.first_answer_part + session.second_answer_part
+    return True
+
 @app.route('/api/move_tile', methods=['POST'])
 def move_tile():
     """Move a tile in the puzzle"""
@@ -180,42 +326,137 @@ def move_tile():
     session_id = data.get('session_id')
     tile_pos = data.get('tile_pos')
     
-    if session_id in game_sessions:
-        session = game_sessions[session_id]
-        puzzle_state = session['puzzle_state']
-        empty_pos = session['empty_pos']
-        
-        # Check if move is valid (adjacent to empty space)
-        empty_row, empty_col = empty_pos // 3, empty_pos % 3
-        tile_row, tile_col = tile_pos // 3, tile_pos % 3
-        
-        if abs(empty_row - tile_row) + abs(empty_col - tile_col) == 1:
-            # Valid move - swap tile with empty space
-            puzzle_state[empty_pos], puzzle_state[tile_pos] = puzzle_state[tile_pos], puzzle_state[empty_pos]
-            session['empty_pos'] = tile_pos
-            session['puzzle_moves'] += 1
+    with game_sessions.locked(session_id) as session:
+        if session is not None:
+            if not session.won:
+                return jsonify({'success': False, 'error': 'Catch game not won'})
+            if session.puzzle_state is None:
+                return jsonify({'success': False, 'error': 'Puzzle not started'})
             
-            # Check if solved
-            solved = puzzle_state == list(range(9))
-            if solved:
-                session['puzzle_completed'] = True
-                session['puzzle_end_time'] = time.time()
-                session['second_answer_part'] = "tHe_GOaT"
-                session['full_answer'] = "aCM_iS_tHe_GOaT"
+            if apply_tile_move(session, tile_pos):
+                board = session.puzzle_state
+                solved = board.is_solved
+                return jsonify({
+                    'success': True,
+                    'session_id': game_sessions.issue(session_id, session),
+                    'puzzle_state': board.to_list(),
+                    'empty_pos': board.empty_pos,
+                    'moves': session.puzzle_moves,
+                    'solved': solved,
+                    'second_answer_part': session.second_answer_part if solved else '',
+                    'full_answer': session.full_answer if solved else ''
+                })
+            else:
+                return jsonify({'success': False, 'error': 'Invalid move'})
+    
+    return jsonify({'success': False, 'error': 'Invalid session'})
+
+@app.route('/api/move_tiles', methods=['POST'])
+def move_tiles():
+    """Apply a sequence of tile moves and return only what changed
+
+    Moves are applied in order and processing stops at the first illegal
+    one. The response lists the tile positions that were moved (each one
+    swapped with the empty space at that point), so the client can replay
+    them; the full grid is only sent back when a move was rejected.
+    """
+    data = request.get_json()
+    session_id = data.get('session_id')
+    tile_positions = data.get('tile_positions')
+    
+    if not isinstance(tile_positions, list) or len(tile_positions) > MAX_MOVES_PER_REQUEST:
+        return jsonify({'success': False, 'error': 'Invalid moves'})
+    
+    with game_sessions.locked(session_id) as session:
+        if session is not None:
+            if not session.won:
+                return jsonify({'success': False, 'error': 'Catch game not won'})
+            if session.puzzle_state is None:
+                return jsonify({'success': False, 'error': 'Puzzle not started'})
             
-            return jsonify({
+            board = session.puzzle_state
+            moved = []
+            solved = False
+            for tile_pos in tile_positions:
+                if not apply_tile_move(session, tile_pos):
+                    break
+                moved.append(tile_pos)
+                solved = board.is_solved
+                if solved:
+                    break
+            
+            response = {
                 'success': True,
-                'puzzle_state': puzzle_state,
-                'empty_pos': session['empty_pos'],
-                'moves': session['puzzle_moves'],
-                'solved': solved,
-                'second_answer_part': session.get('second_answer_part', '') if solved else '',
-                'full_answer': session.get('full_answer', '') if solved else ''
-            })
-        else:
-            return jsonify({'success': False, 'error': 'Invalid move'})
+                'session_id': game_sessions.issue(session_id, session),
+                'moved': moved,
+                'empty_pos': board.empty_pos,
+                'moves': session.puzzle_moves,
+                'solved': solved
+            }
+            if len(moved) < len(tile_positions) and not solved:
+                response['error'] = 'Invalid move'
+                response['rejected_index'] = len(moved)
+                response['puzzle_state'] = board.to_list()
+            if solved:
+                response['second_answer_part'] = session.second_answer_part
+                response['full_answer'] = session.full_answer
+            return jsonify(response)
     
     return jsonify({'success': False, 'error': 'Invalid session'})
 
+@app.route('/api/puzzle_hint', methods=['POST'])
+def puzzle_hint():
+    """Suggest the best next tile to move and how far the puzzle is from solved"""
+    data = request.get_json()
+    session_id = data.get('session_id')
+    
+    with game_sessions.locked(session_id) as session:
+        if session is None:
+            return jsonify({'success': False, 'error': 'Invalid session'})
+        if not session.won:
+            return jsonify({'success': False, 'error': 'Catch game not won'})
+        if session.puzzle_state is None:
+            return jsonify({'success': False, 'error': 'Puzzle not started'})
+        puzzle_state = session.puzzle_state.to_list()
+        next_session_id = game_sessions.issue(session_id, session)
+    
+    # Searched outside the session lock; larger boards can take a while
+    hint = puzzle_solver.hint(puzzle_state)
+    return jsonify({
+        'success': True,
+        'session_id': next_session_id,
+        'tile_pos': hint.tile_pos if hint else None,
+        'distance': hint.distance if hint else 0,
+        'exact': hint.exact if hint else True,
+        'solved': hint is None
+    })
+
+def check_admin():
+    """Abort unless the request carries the configured ADMIN_TOKEN"""
+    token = app.config.get('ADMIN_TOKEN')
+    if not token:
+        abort(404)  # admin endpoints are off without a token
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token):
+        abort(403)
+
+@app.route('/admin/memory')
+def admin_memory():
+    """Live session count, sampled bytes per session and a projection"""
+    check_admin()
+    targets = request.args.getlist('target', type=int) or [10000]
+    return jsonify(memory_report(game_sessions, request.args.get('sample', 200, type=int), targets))
+
+@app.route('/admin/memory/snapshot', methods=['POST'])
+def admin_memory_snapshot():
+    """Diff a tracemalloc snapshot against the previous one
+
+    The first call starts tracing and only records the baseline.
+    """
+    check_admin()
+    sites = allocations.diff(request.args.get('top', 10, type=int))
+    if request.args.get('stop'):
+        allocations.stop()
+    return jsonify({'sites': sites, 'tracemalloc': allocations.stats()})
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,252 @@
+# Shared image cache for the pygame games
+#
+# Every surface is loaded from disk, scaled and converted to the display's
+# pixel format once, then handed out to everything that asks for the same
+# (path, size, alpha). Converted surfaces blit without a per-pixel format
+# conversion, and because the cache lives at module level it outlives
+# Game / SlidePuzzle restarts, which rebuild their objects with __init__.
+#
+# Surfaces derived from others (the blurred background, puzzle tiles) can
+# be memoised under any hashable key with derived().
+#
+# Scaled and derived surfaces are also kept on disk under .asset_cache/ as
+# raw pixels, named by a hash of the source files' bytes plus the transform
+# parameters. The next launch reads those small ready-to-blit files instead
+# of decoding a 1024x1024 PNG to get an 80x60 basket or re-running the
+# background blur; editing a source file changes its hash, so stale entries
+# are simply never read again. `python asset_cache.py --startup` times a
+# cold and a warm start.
+
+import argparse
+import hashlib
+import os
+import struct
+import time
+
+import pygame
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.asset_cache')
+CACHE_VERSION = 1
+
+# magic, flags, surface count, width, height; then the raw pixels of each surface
+HEADER = struct.Struct('<4sBHHH')
+MAGIC = b'ASC1'
+FLAG_ALPHA = 1
+FLAG_LIST = 2
+
+
+def _surface_bytes(surface):
+    return surface.get_pitch() * surface.get_height()
+
+
+class AssetCache:
+    """Load-once store of display-ready surfaces, backed by a disk cache"""
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir  # None turns the disk cache off
+        self._images = {}  # (path, size, alpha) -> [surface, converted]
+        self._derived = {}  # key -> surface or list of surfaces
+        self._hashes = {}  # path -> (mtime_ns, size, digest)
+        self.loads = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.disk_writes = 0
+
+    # -- disk cache --------------------------------------------------------
+
+    def _source_hash(self, path):
+        stat = os.stat(path)
+        cached = self._hashes.get(path)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        with open(path, 'rb') as f:
+            digest = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+        self._hashes[path] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def _disk_path(self, sources, params):
+        if self.cache_dir is None:
+            return None
+        try:
+            digests = [self._source_hash(path) for path in sources]
+        except OSError:
+            return None  # a source is missing; it may be generated by build()
+        key = repr((CACHE_VERSION, digests, params)).encode('utf-8')
+        return os.path.join(self.cache_dir, hashlib.blake2b(key, digest_size=20).hexdigest() + '.bin')
+
+    def _read(self, path):
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) < HEADER.size:
+            return None
+        magic, flags, count, width, height = HEADER.unpack_from(data)
+        fmt = 'RGBA' if flags & FLAG_ALPHA else 'RGB'
+        size = width * height * len(fmt)
+        if magic != MAGIC or len(data) != HEADER.size + count * size:
+            return None
+
+        surfaces = []
+        for i in range(count):
+            start = HEADER.size + i * size
+            surface = pygame.image.frombytes(data[start:start + size], (width, height), fmt)
+            if pygame.display.get_surface() is not None:
+                surface = surface.convert_alpha() if flags & FLAG_ALPHA else surface.convert()
+            surfaces.append(surface)
+        self.disk_hits += 1
+        return surfaces if flags & FLAG_LIST else surfaces[0]
+
+    def _write(self, path, value):
+        surfaces = value if isinstance(value, (list, tuple)) else [value]
+        width, height = surfaces[0].get_size()
+        alpha = any(surface.get_flags() & pygame.SRCALPHA for surface in surfaces)
+        fmt = 'RGBA' if alpha else 'RGB'
+        flags = (FLAG_ALPHA if alpha else 0) | (FLAG_LIST if isinstance(value, (list, tuple)) else 0)
+        parts = [HEADER.pack(MAGIC, flags, len(surfaces), width, height)]
+        parts.extend(pygame.image.tobytes(surface, fmt) for surface in surfaces)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = f'{path}.{os.getpid()}.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(b''.join(parts))
+            os.replace(tmp, path)
+            self.disk_writes += 1
+        except OSError:
+            pass  # the cache is an optimisation; a read-only checkout still runs
+
+    def _cached_on_disk(self, sources, params, build):
+        disk_path = self._disk_path(sources, params)
+        if disk_path is not None:
+            value = self._read(disk_path)
+            if value is not None:
+                return value
+        value = build()
+        if disk_path is None:
+            # Sources generated by build() can be hashed now
+            disk_path = self._disk_path(sources, params)
+        if disk_path is not None:
+            self._write(disk_path, value)
+        return value
+
+    # -- public interface --------------------------------------------------
+
+    def image(self, path, size=None, alpha=None):
+        """Return the image at path, scaled to size and converted for fast blits
+
+        alpha=True keeps per-pixel transparency (convert_alpha), alpha=False
+        drops it (convert), and None picks whichever the file needs.
+        """
+        key = (path, tuple(size) if size else None, alpha)
+        entry = self._images.get(key)
+        if entry is None:
+            self.loads += 1
+            if size:
+                surface = self._cached_on_disk(
+                    [path], ('scale', key[1]),
+                    lambda: pygame.transform.scale(pygame.image.load(path), size))
+            else:
+                surface = pygame.image.load(path)
+            entry = self._images[key] = [surface, False]
+        else:
+            self.hits += 1
+        if not entry[1]:
+            # Converting needs a display mode; until one is set the raw surface is used
+            entry[1] = self._convert(entry, alpha)
+        return entry[0]
+
+    def _convert(self, entry, alpha):
+        if pygame.display.get_surface() is None:
+            return False
+        surface = entry[0]
+        if alpha is None:
+            alpha = bool(surface.get_flags() & pygame.SRCALPHA)
+        entry[0] = surface.convert_alpha() if alpha else surface.convert()
+        return True
+
+    def derived(self, key, build, sources=()):
+        """Return the surface(s) cached under key, calling build() the first time
+
+        With sources (file paths the result is made from) the result is also
+        kept on disk, keyed by those files' contents and key.
+        """
+        value = self._derived.get(key)
+        if value is None:
+            self.loads += 1
+            if sources:
+                value = self._cached_on_disk(list(sources), key, build)
+            else:
+                value = build()
+            self._derived[key] = value
+        else:
+            self.hits += 1
+        return value
+
+    def clear(self, disk=False):
+        """Forget every cached surface, and the files on disk too if disk is true"""
+        self._images.clear()
+        self._derived.clear()
+        if disk and self.cache_dir is not None and os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.bin'):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+    def stats(self):
+        """Return counts and the pixel memory held by cached surfaces"""
+        held = sum(_surface_bytes(surface) for surface, _ in self._images.values())
+        for value in self._derived.values():
+            for surface in (value if isinstance(value, (list, tuple)) else [value]):
+                held += _surface_bytes(surface)
+        return {
+            'images': len(self._images),
+            'derived': len(self._derived),
+            'loads': self.loads,
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'disk_writes': self.disk_writes,
+            'bytes': held,
+        }
+
+
+# The cache every game shares
+assets = AssetCache()
+
+
+def _time_startup(cache):
+    # Imported here: the games import this module
+    from catch_game import Game
+    from slide_puzzle import SlidePuzzle
+
+    cache.clear()
+    start = time.perf_counter()
+    Game()
+    SlidePuzzle()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the on-disk cache of scaled and derived game images.')
+    parser.add_argument('--startup', action='store_true', help='time a cold and a warm start of both games')
+    parser.add_argument('--clear', action='store_true', help='delete the cached files')
+    args = parser.parse_args()
+
+    # Run as a script this file is __main__; the games share the instance in
+    # the imported asset_cache module
+    from asset_cache import assets as cache
+
+    if args.clear:
+        cache.clear(disk=True)
+        print(f'Cleared {CACHE_DIR}')
+    if args.startup:
+        pygame.init()
+        cache.clear(disk=True)
+        cold = _time_startup(cache)
+        warm = _time_startup(cache)
+        print(f'cold start: {cold * 1000:.1f} ms')
+        print(f'warm start: {warm * 1000:.1f} ms ({cache.stats()["disk_hits"]} files read from {CACHE_DIR})')
+        pygame.quit()
+
+
+if __name__ == '__main__':
+    main()
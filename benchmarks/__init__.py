@@ -0,0 +1,22 @@
+# Reproducible benchmarks for the Flask API and the pygame games
+#
+#     api     each API endpoint through Flask's test client (no network),
+#             at several numbers of live sessions
+#     frames  catch_game.Game.update/draw and SlidePuzzle.draw on SDL's
+#             dummy video driver
+#
+# Every case reports throughput and latency percentiles. Results are
+# written as JSON, and a run can be compared against a stored baseline,
+# flagging any case whose p50 or p95 got slower by more than a threshold:
+#
+#     python -m benchmarks --save-baseline
+#     python -m benchmarks --compare
+#     python -m benchmarks --suite api --sessions 0 5000 --requests 1000 --output api.json
+#     python -m benchmarks --compare benchmarks/baseline.json --input api.json
+#
+# Baselines only mean something on the machine that recorded them.
+#
+# Capacity is measured separately, against a running server, by replaying
+# virtual players' sessions (see loadgen.py):
+#
+#     python -m benchmarks.loadgen --url http://127.0.0.1:5000 --players 25 50 100 200
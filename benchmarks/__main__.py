@@ -0,0 +1,66 @@
+import argparse
+import os
+import sys
+
+from . import report
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(HERE, 'baseline.json')
+RESULTS = os.path.join(HERE, 'results.json')
+SUITES = ('api', 'frames')
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Benchmark the API endpoints and the games\' frames.')
+    parser.add_argument('--suite', choices=SUITES, action='append',
+                        help='suite to run (repeatable; default: all)')
+    parser.add_argument('--sessions', type=int, nargs='+', default=None,
+                        help='live-session counts for the api suite (default: 0 1000 10000)')
+    parser.add_argument('--requests', type=int, default=None,
+                        help='requests per endpoint and session count (default: 500)')
+    parser.add_argument('--frames', type=int, default=None, help='frames per game case (default: 600)')
+    parser.add_argument('--seed', type=int, default=0, help='seed for sessions, moves and rounds (default: 0)')
+    parser.add_argument('--output', default=RESULTS, help=f'where to write the results (default: {RESULTS})')
+    parser.add_argument('--save-baseline', action='store_true', help=f'also write the results to {BASELINE}')
+    parser.add_argument('--compare', nargs='?', const=BASELINE, metavar='BASELINE',
+                        help='compare against a baseline file and exit 1 on regressions '
+                             f'(default: {BASELINE})')
+    parser.add_argument('--input', help='with --compare, compare this results file instead of running')
+    parser.add_argument('--threshold', type=float, default=report.THRESHOLD,
+                        help=f'slowdown that counts as a regression (default: {report.THRESHOLD})')
+    args = parser.parse_args()
+
+    if args.input:
+        if not args.compare:
+            parser.error('--input needs --compare')
+        results = report.load(args.input)
+    else:
+        # Imported per suite: the frames suite needs pygame, the api suite Flask
+        results = {}
+        suites = args.suite or SUITES
+        if 'api' in suites:
+            from . import api
+            results.update(api.run(args.sessions or api.SESSION_COUNTS, args.requests or api.REQUESTS, args.seed))
+        if 'frames' in suites:
+            from . import frames
+            results.update(frames.run(args.frames or frames.FRAMES, args.seed))
+        report.save(args.output, results)
+        if args.save_baseline:
+            report.save(BASELINE, results)
+        report.print_results(results)
+        print(f'Results written to {args.output}')
+
+    if args.compare:
+        rows = report.compare(report.load(args.compare), results, args.threshold)
+        print()
+        report.print_comparison(rows)
+        regressions = sum(1 for row in rows if row[-1])
+        if regressions:
+            print(f'{regressions} regression(s) over {args.threshold:.0%}')
+            sys.exit(1)
+        print('No regressions')
+
+
+if __name__ == '__main__':
+    main()
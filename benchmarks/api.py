@@ -0,0 +1,97 @@
+# API endpoint benchmarks through Flask's test client
+#
+# For each live-session count the store is topped up with synthetic
+# sessions (session_memory.synthesize), then every endpoint is called
+# `requests` times in the order a player would: start_game creates the
+# sessions the catch game endpoints then use round-robin. end_game reports a
+# loss, so no replay is sent to the verifier's process pool; the puzzle
+# endpoints, which only serve winners, run on synthetic sessions marked as
+# won instead. All of these stay in the store, so each level starts a
+# little above its nominal count; the real number is reported as
+# live_sessions.
+
+import random
+import time
+
+from .report import summarize
+
+SESSION_COUNTS = (0, 1000, 10000)
+REQUESTS = 500
+WARMUP = 20
+
+
+def _post(client, url, payload):
+    # Buffered, so the response is closed and MetricsMiddleware records it as a server would
+    start = time.perf_counter_ns()
+    response = client.post(url, json=payload, buffered=True)
+    elapsed = time.perf_counter_ns() - start
+    data = response.get_json(silent=True)
+    ok = response.status_code == 200 and isinstance(data, dict) and data.get('success', True)
+    return elapsed, data, ok
+
+
+def _run_endpoint(client, url, payload, requests, on_response=None):
+    """Post payload (or payload(i)) requests times; returns the times and the error count"""
+    samples = []
+    errors = 0
+    for i in range(requests):
+        elapsed, data, ok = _post(client, url, payload(i) if callable(payload) else payload)
+        samples.append(elapsed)
+        if not ok:
+            errors += 1
+        elif on_response is not None:
+            on_response(i, data)
+    return samples, errors
+
+
+def run(session_counts=SESSION_COUNTS, requests=REQUESTS, seed=0):
+    """Benchmark the game API at each live-session count and return the results"""
+    # Imported here: loading the app builds the solver tables and session store
+    import app as server
+    from puzzle_engine import neighbors
+    from session_memory import synthesize
+
+    rng = random.Random(seed)
+    client = server.app.test_client()
+    store = server.game_sessions
+    cells = neighbors(server.GAME_CONFIG['PUZZLE_SIZE'])
+
+    for _ in range(WARMUP):
+        _post(client, '/api/start_game', {})
+
+    results = {}
+    for count in sorted(session_counts):
+        missing = count - len(store)
+        if missing > 0:
+            synthesize(store, missing, rng=rng)
+        winners = synthesize(store, requests, puzzle_share=1, rng=rng)
+        live = len(store)
+
+        ids = []
+        empty = {}
+
+        def started(i, data):
+            ids.append(data['session_id'])
+
+        def puzzle_started(i, data):
+            empty[winners[i % len(winners)]] = data['empty_pos']
+
+        def moved(i, data):
+            empty[winners[i % len(winners)]] = data['empty_pos']
+
+        def next_move(i):
+            session_id = winners[i % len(winners)]
+            return {'session_id': session_id, 'tile_pos': rng.choice(cells[empty[session_id]])}
+
+        cases = (
+            ('start_game', {}, started),
+            ('update_score', lambda i: {'session_id': ids[i % len(ids)], 'points': 2}, None),
+            ('miss_item', lambda i: {'session_id': ids[i % len(ids)]}, None),
+            ('end_game', lambda i: {'session_id': ids[i % len(ids)], 'won': False}, None),
+            ('start_puzzle', lambda i: {'session_id': winners[i % len(winners)]}, puzzle_started),
+            ('move_tile', next_move, moved),
+        )
+        for endpoint, payload, on_response in cases:
+            samples, errors = _run_endpoint(client, f'/api/{endpoint}', payload, requests, on_response)
+            results[f'api/{endpoint}@{count}'] = summarize(samples, errors=errors, live_sessions=live)
+    return results
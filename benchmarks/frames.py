@@ -0,0 +1,85 @@
+# Headless frame benchmarks for the pygame games
+#
+# Runs on SDL's dummy video driver, so drawing goes to an off-screen window
+# and present() costs next to nothing; the numbers are the games' own
+# update and drawing work. The catch game is steered by catch_sim's
+# chase_lowest_item bot so the round keeps going with items on screen, and
+# restarts (untimed) if it ends early.
+
+import os
+import random
+import time
+
+from .report import summarize
+
+FRAMES = 600
+WARMUP = 60  # untimed frames first, so caches and the allocator settle
+
+
+def _catch(frames, seed, dirty_rects):
+    from catch_game import Game
+    from catch_sim import chase_lowest_item
+
+    game = Game(seed, dirty_rects)
+    game.draw()  # the first frame is always a full redraw
+    update_ns = []
+    draw_ns = []
+    for _ in range(WARMUP + frames):
+        if game.game_over or game.won:
+            game.restart_game()
+            game.draw()
+        mouse_x = chase_lowest_item(game.sim)
+        start = time.perf_counter_ns()
+        game.update(mouse_x)
+        updated = time.perf_counter_ns()
+        game.alpha = 0.5
+        game.draw()
+        update_ns.append(updated - start)
+        draw_ns.append(time.perf_counter_ns() - updated)
+    return update_ns[WARMUP:], draw_ns[WARMUP:]
+
+
+def _puzzle(frames, seed):
+    from slide_puzzle import SlidePuzzle
+
+    random.seed(seed)  # the scrambles come from the random module
+    rng = random.Random(seed)
+    puzzle = SlidePuzzle()
+    puzzle.draw()
+
+    full_ns = []
+    for _ in range(WARMUP + frames):
+        puzzle.full_redraw = True
+        start = time.perf_counter_ns()
+        puzzle.draw()
+        full_ns.append(time.perf_counter_ns() - start)
+
+    move_ns = []
+    for _ in range(WARMUP + frames):
+        if puzzle.solved:
+            puzzle.shuffle_puzzle()
+            puzzle.full_redraw = True
+            puzzle.draw()
+        puzzle.move_tile(rng.choice(puzzle.board.valid_moves()))
+        start = time.perf_counter_ns()
+        puzzle.draw()
+        move_ns.append(time.perf_counter_ns() - start)
+    return full_ns[WARMUP:], move_ns[WARMUP:]
+
+
+def run(frames=FRAMES, seed=0):
+    """Time the games' per-frame work and return the results"""
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+    results = {}
+    update_ns, draw_ns = _catch(frames, seed, dirty_rects=True)
+    results['frames/catch_update'] = summarize(update_ns)
+    results['frames/catch_draw'] = summarize(draw_ns)
+    _, draw_ns = _catch(frames, seed, dirty_rects=False)
+    results['frames/catch_draw_full'] = summarize(draw_ns)
+
+    full_ns, move_ns = _puzzle(frames, seed)
+    results['frames/puzzle_draw_full'] = summarize(full_ns)
+    results['frames/puzzle_draw_move'] = summarize(move_ns)
+    return results
@@ -0,0 +1,447 @@
+# Load generator: virtual players replaying the browser client against a server
+#
+# Each virtual player does what templates/game.html and puzzle.html do, on
+# their timing:
+#
+# * start_game, then play the round on the rules and seed the server sent,
+#   in catch_sim on the real fixed tick, with the spawn_delay ramp and the
+#   item counts from the server's config. A chasing bot steers the basket
+#   and lets each item drop with --miss-chance, so some rounds are lost.
+# * Catches and misses are posted when they happen: batched to /api/events
+#   (EVENT_BATCH_SIZE events, or every EVENT_FLUSH_MS) like the current
+#   client, or one update_score / miss_item call each with --mix legacy.
+# * end_game with the recorded replay, so wins go through the verifier,
+#   retrying with the client's backoff while it answers "busy".
+# * Winners think for a moment, start_puzzle and click --moves tiles at
+#   human speed, batched within MOVE_FLUSH_MS to /api/move_tiles (legacy:
+#   one move_tile each). Then they start over.
+#
+# Requests from one player are sent one at a time on one keep-alive
+# connection, as the browser's queue does. The load runs in steps of
+# increasing player counts; every step reports p50/p95/p99 per endpoint and
+# error rates, and the saturation point is the first step where p95 breaks
+# --slo-ms, errors pass --max-error-rate or throughput stops growing with
+# the number of players. Run the server in its own process (or machine):
+#
+#     gunicorn -w 4 --threads 8 -b 127.0.0.1:5000 app:app
+#     python -m benchmarks.loadgen --players 25 50 100 200 --duration 60
+#
+# --speed N plays the game N times faster than real time, which is roughly
+# N times as many real players' worth of requests per virtual player.
+
+import argparse
+import base64
+import http.client
+import json
+import random
+import threading
+import time
+import urllib.parse
+
+from catch_sim import CatchRules, CatchSimulation, Mulberry32
+from puzzle_engine import PuzzleBoard, neighbors
+from replay import encode_replay
+
+from .report import summarize
+
+DEFAULT_URL = 'http://127.0.0.1:5000'
+PLAYER_STEPS = (10, 25, 50, 100)
+STEP_SECONDS = 60
+RAMP_SECONDS = 5
+MOVES = 40
+CLICK_SECONDS = 0.6  # mean time between puzzle clicks
+THINK_SECONDS = 3.0  # on the game-over screen, before the puzzle or a new round
+MISS_CHANCE = 0.01
+SLO_MS = 250
+MAX_ERROR_RATE = 0.01
+FLAT_GROWTH = 0.8  # a step saturates below this share of the per-player throughput of the first
+END_GAME_ATTEMPTS = 5  # the client's retries while the verifier is busy
+HEADERS = {'Content-Type': 'application/json'}
+
+
+# -- what one player does -------------------------------------------------
+
+class SloppyChaser:
+    """Basket input that chases the lowest item it has not given up on"""
+
+    def __init__(self, miss_chance, rng):
+        self.miss_chance = miss_chance
+        self.rng = rng
+        self.seen = set()
+        self.ignored = set()
+
+    def __call__(self, sim):
+        target = None
+        for item in sim.items:
+            if id(item) not in self.seen:
+                self.seen.add(id(item))
+                if self.rng.random() < self.miss_chance:
+                    self.ignored.add(id(item))
+            if id(item) not in self.ignored and (target is None or item.y > target.y):
+                target = item
+        if target is None:
+            return round(sim.basket_x + sim.rules.basket_width / 2)
+        return round(target.x + sim.rules.item_size / 2)
+
+
+def play_round(rules, seed, miss_chance, rng):
+    """Play a round as the browser would; returns (events, seconds, won, replay)
+
+    events are (seconds, type, points) in the order they happened.
+    """
+    sim = CatchSimulation(rules, seed, rng=Mulberry32(seed))
+    steer = SloppyChaser(miss_chance, rng)
+    positions = []
+    events = []
+    while not sim.finished:
+        caught, missed, score = sim.items_caught, sim.items_missed, sim.score
+        x = steer(sim)
+        positions.append(x)
+        sim.step(x)
+        seconds = sim.tick / rules.fps
+        if sim.items_caught > caught:
+            events.append((seconds, 'catch', sim.score - score))
+        if sim.items_missed > missed:
+            events.append((seconds, 'miss', 0))
+    # The tick that found the time up recorded a position without advancing
+    positions = positions[:sim.tick]
+    return events, sim.tick / rules.fps, sim.won, base64.b64encode(encode_replay(seed, positions)).decode('ascii')
+
+
+def event_batches(events, end, batch_size, flush_seconds):
+    """(seconds, events) of every /api/events call the client makes for a round"""
+    batches = []
+    pending = []
+    next_flush = flush_seconds
+    for event in events:
+        while next_flush <= event[0]:
+            if pending:
+                batches.append((next_flush, pending))
+                pending = []
+            next_flush += flush_seconds
+        pending.append(event)
+        if len(pending) >= batch_size:
+            batches.append((event[0], pending))
+            pending = []
+    # endGame flushes whatever the timer has not sent yet
+    if pending:
+        batches.append((end, pending))
+    return batches
+
+
+def click_batches(board, moves, click_seconds, flush_seconds, rng):
+    """(seconds, tile positions) of the move requests for one puzzle
+
+    Clicks a random tile next to the empty space (not the one just moved)
+    every click_seconds on average; clicks within flush_seconds of the first
+    one pending go in the same request, and solving sends at once.
+    """
+    cells = neighbors(board.size)
+    batches = []
+    pending = []
+    opened = 0.0
+    now = 0.0
+    previous = None
+    for _ in range(moves):
+        now += click_seconds * rng.uniform(0.5, 1.5)
+        if pending and now >= opened + flush_seconds:
+            batches.append((opened + flush_seconds, pending))
+            pending = []
+        choices = [pos for pos in cells[board.empty_pos] if pos != previous] or list(cells[board.empty_pos])
+        tile_pos = rng.choice(choices)
+        previous = board.empty_pos
+        board.move(tile_pos)
+        if not pending:
+            opened = now
+        pending.append(tile_pos)
+        if board.is_solved:
+            batches.append((now, pending))
+            return batches
+    if pending:
+        batches.append((opened + flush_seconds, pending))
+    return batches
+
+
+# -- HTTP -------------------------------------------------------------------
+
+class Connection:
+    """One keep-alive HTTP connection posting JSON"""
+
+    def __init__(self, url, timeout=30):
+        parts = urllib.parse.urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._conn = None
+
+    def post(self, path, body):
+        """Return (status, JSON body or None); reconnects once if a reused connection was dropped"""
+        payload = json.dumps(body).encode('utf-8')
+        for attempt in range(2):
+            reused = self._conn is not None
+            if not reused:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request('POST', self.prefix + path, payload, HEADERS)
+                response = self._conn.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, OSError):
+                self.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            if response.will_close:
+                self.close()
+            try:
+                return response.status, json.loads(data) if data else None
+            except ValueError:
+                return response.status, None
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class VirtualPlayer(threading.Thread):
+    """Plays sessions back to back until stopped, recording every request"""
+
+    def __init__(self, index, url, options, stop, start_at):
+        super().__init__(name=f'player-{index}', daemon=True)
+        self.options = options
+        self.stop = stop
+        self.start_at = start_at
+        self.rng = random.Random(options.seed * 100003 + index)
+        self.connection = Connection(url)
+        self.session_id = None
+        self.records = []  # (endpoint, started, seconds, outcome); only this thread appends
+        self.sessions = 0
+
+    def sleep_until(self, moment):
+        delay = moment - time.monotonic()
+        return not self.stop.wait(delay) if delay > 0 else not self.stop.is_set()
+
+    def call(self, endpoint, body):
+        """Post to /api/<endpoint> with the current session ID; returns the JSON or None"""
+        if self.session_id is not None:
+            body['session_id'] = self.session_id
+        started = time.monotonic()
+        try:
+            status, data = self.connection.post(f'/api/{endpoint}', body)
+        except (http.client.HTTPException, OSError):
+            self.records.append((endpoint, started, time.monotonic() - started, 'error'))
+            return None
+        elapsed = time.monotonic() - started
+        if status != 200 or not isinstance(data, dict):
+            outcome = 'error'
+        elif data.get('retry'):
+            outcome = 'busy'
+        elif data.get('success', True) is False:
+            outcome = 'error'
+        else:
+            outcome = 'ok'
+        self.records.append((endpoint, started, elapsed, outcome))
+        if outcome == 'error':
+            return None
+        if data.get('session_id'):
+            self.session_id = data['session_id']
+        return data
+
+    def run(self):
+        if not self.sleep_until(self.start_at):
+            return
+        while not self.stop.is_set():
+            self.play_session()
+            self.sessions += 1
+        self.connection.close()
+
+    def play_session(self):
+        options = self.options
+        speed = options.speed
+        self.session_id = None
+        data = self.call('start_game', {})
+        if data is None:
+            self.sleep_until(time.monotonic() + THINK_SECONDS / speed)
+            return
+        config = data['config']
+        rules = CatchRules(**config['RULES'])
+        events, end, won, replay = play_round(rules, data['seed'], options.miss_chance, self.rng)
+
+        # The catch game
+        began = time.monotonic()
+        seq = 0
+        for at, batch in event_batches(events, end, config['EVENT_BATCH_SIZE'], config['EVENT_FLUSH_MS'] / 1000):
+            if not self.sleep_until(began + at / speed):
+                return
+            if options.mix == 'legacy':
+                for _, kind, points in batch:
+                    if kind == 'catch':
+                        self.call('update_score', {'points': points})
+                    else:
+                        self.call('miss_item', {})
+                continue
+            payload = []
+            for _, kind, points in batch:
+                seq += 1
+                payload.append({'seq': seq, 'type': kind, 'points': points})
+            self.call('events', {'events': payload})
+        if not self.sleep_until(began + end / speed):
+            return
+        for attempt in range(END_GAME_ATTEMPTS):
+            data = self.call('end_game', {'won': won, 'missed_final_item': not won, 'replay': replay})
+            if data is None or not data.get('retry'):
+                break
+            if not self.sleep_until(time.monotonic() + 0.5 * (attempt + 1) / speed):
+                return
+        won = data is not None and data.get('won') is True
+        if not self.sleep_until(time.monotonic() + THINK_SECONDS / speed) or not won:
+            return
+
+        # The puzzle
+        data = self.call('start_puzzle', {})
+        if data is None:
+            return
+        board = PuzzleBoard(config['PUZZLE_SIZE'], data['puzzle_state'])
+        began = time.monotonic()
+        for at, tile_positions in click_batches(board, options.moves, CLICK_SECONDS,
+                                                config['MOVE_FLUSH_MS'] / 1000, self.rng):
+            if not self.sleep_until(began + at / speed):
+                return
+            if options.mix == 'legacy':
+                for tile_pos in tile_positions:
+                    self.call('move_tile', {'tile_pos': tile_pos})
+            else:
+                self.call('move_tiles', {'tile_positions': tile_positions})
+        self.sleep_until(time.monotonic() + THINK_SECONDS / speed)
+
+
+# -- steps and the report ---------------------------------------------------
+
+def _summary(records):
+    samples = [int(seconds * 1e9) for _, _, seconds, _ in records]
+    errors = sum(1 for record in records if record[3] == 'error')
+    busy = sum(1 for record in records if record[3] == 'busy')
+    return summarize(samples, errors=errors, busy=busy, error_rate=round(errors / len(records), 4))
+
+
+def run_step(url, players, options):
+    """Run `players` virtual players for one step and summarise the measured window"""
+    stop = threading.Event()
+    start = time.monotonic()
+    vps = [VirtualPlayer(i, url, options, stop, start + options.ramp * i / players) for i in range(players)]
+    cpu = time.process_time()
+    for vp in vps:
+        vp.start()
+    window = (start + options.ramp, start + options.ramp + options.duration)
+    stop.wait(window[1] - time.monotonic())
+    stop.set()
+    for vp in vps:
+        vp.join(5)
+    cpu = time.process_time() - cpu
+    wall = time.monotonic() - start
+
+    records = [record for vp in vps for record in vp.records if window[0] <= record[1] < window[1]]
+    by_endpoint = {}
+    for record in records:
+        by_endpoint.setdefault(record[0], []).append(record)
+    result = {
+        'players': players,
+        'seconds': options.duration,
+        'requests': len(records),
+        'throughput': round(len(records) / options.duration, 1),
+        'sessions': sum(vp.sessions for vp in vps),
+        'client_cpu': round(cpu / wall, 2),  # cores the generator itself used
+        'endpoints': {endpoint: _summary(group) for endpoint, group in sorted(by_endpoint.items())},
+    }
+    result['overall'] = _summary(records) if records else None
+    return result
+
+
+def find_saturation(steps, slo_ms=SLO_MS, max_error_rate=MAX_ERROR_RATE):
+    """Return (index of the first saturated step or None, its reasons)"""
+    base = next((step for step in steps if step['requests']), None)
+    if base is None:
+        return None, []
+    per_player = base['throughput'] / base['players']
+    for i, step in enumerate(steps):
+        overall = step['overall']
+        reasons = []
+        if overall is None:
+            reasons.append('no requests completed')
+        else:
+            if overall['p95_ms'] > slo_ms:
+                reasons.append(f'p95 {overall["p95_ms"]:.0f} ms over {slo_ms} ms')
+            if overall['error_rate'] > max_error_rate:
+                reasons.append(f'error rate {overall["error_rate"]:.1%}')
+        if step['throughput'] < FLAT_GROWTH * per_player * step['players']:
+            reasons.append(f'throughput {step["throughput"]:.0f} req/s, '
+                           f'{step["throughput"] / (per_player * step["players"]):.0%} of linear')
+        if reasons:
+            return i, reasons
+    return None, []
+
+
+def print_step(step):
+    overall = step['overall'] or {'p50_ms': 0, 'p95_ms': 0, 'p99_ms': 0, 'error_rate': 0}
+    print(f'{step["players"]} players: {step["throughput"]} req/s, p50 {overall["p50_ms"]:.1f} '
+          f'p95 {overall["p95_ms"]:.1f} p99 {overall["p99_ms"]:.1f} ms, errors {overall["error_rate"]:.2%}, '
+          f'{step["sessions"]} sessions, generator CPU {step["client_cpu"]:.2f}')
+    for endpoint, summary in step['endpoints'].items():
+        print(f'    {endpoint:<14} {summary["n"]:>7} {summary["p50_ms"]:>9.2f} {summary["p95_ms"]:>9.2f} '
+              f'{summary["p99_ms"]:>9.2f} {summary["error_rate"]:>8.2%} {summary["busy"]:>6}')
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.loadgen',
+                                     description='Replay virtual players against a running server.')
+    parser.add_argument('--url', default=DEFAULT_URL, help=f'server to load (default: {DEFAULT_URL})')
+    parser.add_argument('--players', type=int, nargs='+', default=list(PLAYER_STEPS),
+                        help=f'player counts, one step each (default: {" ".join(map(str, PLAYER_STEPS))})')
+    parser.add_argument('--duration', type=float, default=STEP_SECONDS,
+                        help=f'measured seconds per step (default: {STEP_SECONDS})')
+    parser.add_argument('--ramp', type=float, default=RAMP_SECONDS,
+                        help=f'seconds over which a step\'s players join, not measured (default: {RAMP_SECONDS})')
+    parser.add_argument('--speed', type=float, default=1.0, help='game speed multiplier (default: 1)')
+    parser.add_argument('--moves', type=int, default=MOVES, help=f'puzzle moves per winner (default: {MOVES})')
+    parser.add_argument('--miss-chance', type=float, default=MISS_CHANCE,
+                        help=f'chance a player lets an item drop (default: {MISS_CHANCE})')
+    parser.add_argument('--mix', choices=('batched', 'legacy'), default='batched',
+                        help='batched: /api/events and /api/move_tiles like the current client; '
+                             'legacy: one request per catch, miss and move (default: batched)')
+    parser.add_argument('--slo-ms', type=float, default=SLO_MS, help=f'p95 latency target (default: {SLO_MS})')
+    parser.add_argument('--max-error-rate', type=float, default=MAX_ERROR_RATE,
+                        help=f'error rate that counts as saturated (default: {MAX_ERROR_RATE})')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the players\' choices (default: 0)')
+    parser.add_argument('--json', metavar='PATH', help='also write the report to PATH as JSON')
+    args = parser.parse_args()
+
+    steps = []
+    print(f'{"":<4}{"endpoint":<14} {"n":>7} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"errors":>8} {"busy":>6}')
+    for players in args.players:
+        step = run_step(args.url, players, args)
+        steps.append(step)
+        print_step(step)
+        if step['client_cpu'] > 0.8:
+            print('    warning: the generator used most of a core; it may be the bottleneck')
+
+    index, reasons = find_saturation(steps, args.slo_ms, args.max_error_rate)
+    if index is None:
+        print(f'No saturation up to {steps[-1]["players"]} players')
+    else:
+        held = steps[index - 1] if index else None
+        if held:
+            print(f'Held {held["players"]} players ({held["throughput"]} req/s)')
+        print(f'Saturated at {steps[index]["players"]} players: {"; ".join(reasons)}')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'url': args.url, 'speed': args.speed, 'mix': args.mix, 'steps': steps,
+                'saturated_at': steps[index]['players'] if index is not None else None,
+                'saturation_reasons': reasons,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# Summaries, result files and baseline comparison for the benchmarks
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+THRESHOLD = 0.20  # relative slowdown that counts as a regression
+MIN_DELTA_MS = 0.05  # ...as long as it is also at least this many milliseconds
+COMPARED = ('p50_ms', 'p95_ms')
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted list"""
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(samples_ns, **extra):
+    """Throughput and latency percentiles of per-operation times in nanoseconds"""
+    ordered = sorted(samples_ns)
+    total = sum(ordered)
+    summary = {
+        'n': len(ordered),
+        'ops_per_s': round(len(ordered) / (total / 1e9), 1) if total else 0.0,
+        'mean_ms': round(total / len(ordered) / 1e6, 4),
+        'p50_ms': round(percentile(ordered, 0.50) / 1e6, 4),
+        'p95_ms': round(percentile(ordered, 0.95) / 1e6, 4),
+        'p99_ms': round(percentile(ordered, 0.99) / 1e6, 4),
+        'max_ms': round(ordered[-1] / 1e6, 4),
+    }
+    summary.update(extra)
+    return summary
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment():
+    """Where and when the results were taken"""
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'argv': sys.argv[1:],
+    }
+
+
+def save(path, results):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)['results']
+
+
+def compare(baseline, current, threshold=THRESHOLD, min_delta=MIN_DELTA_MS):
+    """Compare the cases two runs share; returns (name, metric, before, after, change, regressed) rows"""
+    rows = []
+    for name in sorted(set(baseline) & set(current)):
+        for metric in COMPARED:
+            before = baseline[name].get(metric)
+            after = current[name].get(metric)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before if before else 0.0
+            regressed = change > threshold and after - before > min_delta
+            rows.append((name, metric, before, after, change, regressed))
+    return rows
+
+
+def print_results(results):
+    print(f'{"case":<34} {"n":>6} {"ops/s":>10} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}')
+    for name, summary in sorted(results.items()):
+        print(f'{name:<34} {summary["n"]:>6} {summary["ops_per_s"]:>10.1f} {summary["p50_ms"]:>9.3f} '
+              f'{summary["p95_ms"]:>9.3f} {summary["p99_ms"]:>9.3f}')
+
+
+def print_comparison(rows):
+    print(f'{"case":<34} {"metric":<7} {"baseline":>9} {"current":>9} {"change":>8}')
+    for name, metric, before, after, change, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        print(f'{name:<34} {metric[:3]:<7} {before:>9.3f} {after:>9.3f} {change:>+8.1%}{flag}')
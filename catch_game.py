@@ -1,20 +1,21 @@
+import argparse
 import pygame
-import random
 import sys
 import time
-from pygame import gfxdraw
 
-# Initialize Pygame
-pygame.init()
+from asset_cache import assets
+from text_cache import texts
+from catch_sim import PYGAME_RULES, CatchSimulation
+from render_scale import SceneRenderer, parse_scale
+from frame_profiler import DEFAULT_CSV, OverlaySprite, profiler
 
 # Constants
 SCREEN_WIDTH = 1000  # Increased from 800
 SCREEN_HEIGHT = 700  # Increased from 600
-FPS = 60
+FPS = 60  # frames drawn per second; the simulation always ticks at PYGAME_RULES.fps
+TICK = 1.0 / PYGAME_RULES.fps
+MAX_TICKS_PER_FRAME = 5  # catch-up limit; a slower machine plays in slow motion
 BASKET_SPEED = 8
-FALL_SPEED_BASE = 5  # Reduced from 9 to 5
-FALL_SPEED_INCREMENT = 1.0
-TIME_LIMIT = 120  # 2 minutes
 
 # Colors
 WHITE = (255, 255, 255)
@@ -23,265 +24,350 @@ GREEN = (0, 255, 0)
 RED = (255, 0, 0)
 BLUE = (0, 0, 255)
 
-class FallingItem:
-    def __init__(self, image_path, points, x=None, speed=None, is_final_item=False):
-        self.image = pygame.image.load(image_path)
-        self.image = pygame.transform.scale(self.image, (50, 50))
+# Draw order for the dirty-rect renderer
+BASKET_LAYER = 0
+ITEM_LAYER = 1
+HUD_LAYER = 2
+OVERLAY_LAYER = 3
+
+class FallingItem(pygame.sprite.DirtySprite):
+    """Sprite for one item of the simulation"""
+
+    def __init__(self, image_path, sim_item, view):
+        super().__init__()
+        self.view = view
+        self.image = assets.image(image_path, (view.px(50), view.px(50)))
         self.rect = self.image.get_rect()
-        self.rect.x = x if x is not None else random.randint(0, SCREEN_WIDTH - self.rect.width)
-        self.rect.y = -self.rect.height
-        
-        # Set speed based on item type
-        if is_final_item:  # Person's face - keep it slow
-            self.speed = 2 + random.uniform(0, 1)
-        else:
-            # Other items - mix of normal (5) and some fast (9) speeds
-            if random.random() < 0.3:  # 30% chance for fast items
-                self.speed = 9 + random.uniform(0, 2)
-            else:  # 70% chance for normal speed
-                self.speed = 5 + random.uniform(0, 1)
-        
-        self.points = points
-        self.is_final_item = is_final_item
-        
+        self.sim_item = sim_item
+        self.points = sim_item.points
+        self.is_final_item = sim_item.is_final
+        self.previous = self.current = (sim_item.x, sim_item.y)
+        self.place(1.0)
+
     def update(self):
-        self.rect.y += self.speed
-        
+        """Take the item's position after a simulation tick"""
+        self.previous = self.current
+        self.current = (self.sim_item.x, self.sim_item.y)
+
+    def place(self, alpha):
+        """Draw the item alpha of the way from its previous tick's position to the current one"""
+        (x0, y0), (x1, y1) = self.previous, self.current
+        # Positions are kept as floats by the simulation; snap them for drawing
+        x, y = self.view.point(x0 + (x1 - x0) * alpha, y0 + (y1 - y0) * alpha)
+        if (x, y) != self.rect.topleft:
+            self.rect.topleft = (x, y)
+            self.dirty = 1
+
     def draw(self, screen):
         screen.blit(self.image, self.rect)
-        
-    def is_off_screen(self):
-        return self.rect.y > SCREEN_HEIGHT
 
-class Basket:
-    def __init__(self):
-        self.image = pygame.image.load("basket.png")
-        self.image = pygame.transform.scale(self.image, (80, 60))
+class Basket(pygame.sprite.DirtySprite):
+    def __init__(self, view):
+        super().__init__()
+        self.view = view
+        self.image = assets.image("basket.png", (view.px(80), view.px(60)))
         self.rect = self.image.get_rect()
-        self.rect.x = SCREEN_WIDTH // 2 - self.rect.width // 2
-        self.rect.y = SCREEN_HEIGHT - self.rect.height - 10
-        
-    def update(self, mouse_x):
-        self.rect.x = mouse_x - self.rect.width // 2
-        # Keep basket on screen
-        if self.rect.x < 0:
-            self.rect.x = 0
-        elif self.rect.x > SCREEN_WIDTH - self.rect.width:
-            self.rect.x = SCREEN_WIDTH - self.rect.width
-            
+        self.rect.x = (view.size[0] - self.rect.width) // 2
+        self.rect.y = view.px(SCREEN_HEIGHT - 10) - self.rect.height
+        self.previous = self.current = None
+
+    def update(self, basket_x):
+        """Take the basket's position after a simulation tick"""
+        self.previous = basket_x if self.current is None else self.current
+        self.current = basket_x
+
+    def place(self, alpha):
+        """Draw the basket alpha of the way from its previous tick's position to the current one"""
+        x = self.view.px(self.previous + (self.current - self.previous) * alpha)
+        if x != self.rect.x:
+            self.rect.x = x
+            self.dirty = 1
+
     def draw(self, screen):
         screen.blit(self.image, self.rect)
 
+class TextSprite(pygame.sprite.DirtySprite):
+    """HUD label that is only redrawn when its text changes"""
+
+    def __init__(self, font, color, topleft):
+        super().__init__()
+        self.font = font
+        self.color = color
+        self.topleft = topleft
+        self.text = None
+        self.set_text("")
+
+    def set_text(self, text):
+        if text != self.text:
+            self.text = text
+            self.image = texts.render(self.font, text, True, self.color)
+            self.rect = self.image.get_rect(topleft=self.topleft)
+            self.dirty = 1
+
 class Game:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    def __init__(self, seed=None, dirty_rects=True, render_scale=1.0, fps=FPS):
+        """render_scale draws the scene at a fraction of the window size, or
+        "auto" to choose one from the frame time; a SceneRenderer from an
+        earlier game is reused as is, along with its window
+
+        fps only sets how often frames are drawn: the simulation ticks at a
+        fixed rate, so the round plays the same at any frame rate.
+        """
+        if isinstance(render_scale, SceneRenderer):
+            self.view = render_scale
+            self.window = self.view.window
+        else:
+            # Only the parts of pygame the game uses, and only once it is needed
+            pygame.display.init()
+            pygame.font.init()
+            self.window = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+            self.view = SceneRenderer(self.window, render_scale, fps)
         pygame.display.set_caption("ACM Catch Game")
+        self.view.profiler = profiler
         self.clock = pygame.time.Clock()
-        self.font = pygame.font.Font(None, 36)
-        self.big_font = pygame.font.Font(None, 72)
-        
-        # Load and blur background
-        self.original_background = pygame.image.load("background_image.webp")
-        self.original_background = pygame.transform.scale(self.original_background, (SCREEN_WIDTH, SCREEN_HEIGHT))
-        self.background = self.blur_surface(self.original_background, 5)
+        self.fps = fps
         
-        # Game objects
-        self.basket = Basket()
-        self.falling_items = []
-        
-        # Game state
-        self.score = 0
-        self.items_caught = 0
-        self.items_missed = 0
-        self.total_items_spawned = 0
+        # Game state - spawning, movement and collisions run in the headless
+        # simulation on a fixed tick. advance() runs as many ticks as the
+        # real time since the last frame covers, and sprites are drawn
+        # `alpha` of the way between the last two ticks.
+        self.sim = CatchSimulation(PYGAME_RULES, seed)
+        self.accumulator = 0.0
+        self.alpha = 1.0
         self.start_time = time.time()
-        self.game_over = False
-        self.won = False
-        self.show_try_again = False
+        self.items_to_spawn = list(self.sim.rules.items)
         
-        # Item counts and queue
-        self.items_to_spawn = [
-            ("chocolates.jpg", 2, 15),  # (filename, points, count)
-            ("chips.jpg", 3, 10),
-            ("donuts.jpg", 4, 8),
-            ("pizza.jpg", 5, 4),
-            ("persons_face.png", 10, 1)  # Final item
-        ]
+        # Calculate total items for win condition
+        self.total_items_to_catch = self.sim.rules.total_items
+
+        # Sprites drawn while playing. With dirty_rects only the areas they
+        # covered last frame and cover now are restored from the background
+        # and sent to the display; otherwise the whole screen is redrawn and
+        # flipped every frame.
+        self.dirty_rects = dirty_rects
+        self.build_scene()
+
+    def build_scene(self):
+        """Create everything drawn at the view's scale (again after it changes)"""
+        view = self.view
+        self.screen = view.surface
+        self.font = texts.font(None, view.px(36))
+        self.big_font = texts.font(None, view.px(72))
         
-        self.current_item_index = 0
-        self.current_item_count = 0
-        self.spawn_timer = 0
-        self.spawn_delay = 60  # frames between spawns
+        # Load and blur background (both kept in the shared cache across restarts)
+        self.original_background = assets.image("background_image.webp", view.size)
+        self.background = assets.derived(
+            ("blurred", "background_image.webp", *view.size, 5),
+            lambda: self.blur_surface(self.original_background, 5),
+            sources=["background_image.webp"])
         
-        # Calculate total items for win condition
-        self.total_items_to_catch = sum(item[2] for item in self.items_to_spawn)
+        # Game objects; item sprites are attached again by update()
+        self.basket = Basket(view)
+        self.basket.update(self.sim.basket_x)
+        for sim_item in self.sim.items:
+            sim_item.sprite = None
+        self.falling_items = []
+
+        self.full_redraw = True
+        self.sprites = pygame.sprite.LayeredDirty()
+        self.sprites.clear(self.screen, self.background)
+        self.sprites.add(self.basket, layer=BASKET_LAYER)
+        self.score_label = TextSprite(self.font, BLACK, view.point(10, 10))
+        self.caught_label = TextSprite(self.font, BLACK, view.point(10, 50))
+        self.time_label = TextSprite(self.font, BLACK, view.point(10, 90))
+        self.current_label = TextSprite(self.font, BLACK, view.point(SCREEN_WIDTH - 250, 10))
+        warning_label = TextSprite(self.font, RED, view.point(SCREEN_WIDTH - 250, 50))
+        warning_label.set_text("Don't miss ANY item!")
+        self.sprites.add(self.score_label, self.caught_label, self.time_label,
+                         self.current_label, warning_label, layer=HUD_LAYER)
+        self.overlay = OverlaySprite(profiler, texts.font(None, view.px(20)), view.point(SCREEN_WIDTH - 10, 100))
+        self.sprites.add(self.overlay, layer=OVERLAY_LAYER)
+
+    @property
+    def score(self):
+        return self.sim.score
+
+    @property
+    def items_caught(self):
+        return self.sim.items_caught
+
+    @property
+    def items_missed(self):
+        return self.sim.items_missed
+
+    @property
+    def total_items_spawned(self):
+        return self.sim.total_items_spawned
+
+    @property
+    def current_item_index(self):
+        return self.sim.current_item_index
+
+    @property
+    def game_over(self):
+        return self.sim.game_over
+
+    @property
+    def won(self):
+        return self.sim.won
+
+    @property
+    def show_try_again(self):
+        return self.sim.show_try_again
     
     def blur_surface(self, surface, blur_radius):
         """Apply a simple blur effect to a surface"""
         # Create a copy of the surface
         blurred = surface.copy()
+        width, height = surface.get_size()
         
         # Apply multiple passes of averaging for blur effect
         for _ in range(blur_radius):
             # Scale down and up to create blur effect
-            small = pygame.transform.smoothscale(blurred, (SCREEN_WIDTH//4, SCREEN_HEIGHT//4))
-            blurred = pygame.transform.smoothscale(small, (SCREEN_WIDTH, SCREEN_HEIGHT))
+            small = pygame.transform.smoothscale(blurred, (width//4, height//4))
+            blurred = pygame.transform.smoothscale(small, (width, height))
         
         return blurred
+
+    def advance(self, dt):
+        """Run the simulation ticks that dt seconds of real time add up to
+
+        At most MAX_TICKS_PER_FRAME run per call; time beyond that is dropped
+        rather than caught up later. Returns the number of ticks run.
+        """
+        self.accumulator += dt
+        ticks = 0
+        while self.accumulator >= TICK and ticks < MAX_TICKS_PER_FRAME:
+            self.update()
+            self.accumulator -= TICK
+            ticks += 1
+        if self.accumulator >= TICK:
+            self.accumulator %= TICK
+        self.alpha = self.accumulator / TICK
+        return ticks
         
-    def spawn_item(self):
-        if self.current_item_index < len(self.items_to_spawn):
-            item_info = self.items_to_spawn[self.current_item_index]
-            filename, points, total_count = item_info
-            
-            if self.current_item_count < total_count:
-                # Check if this is the final item (person's face)
-                is_final_item = (filename == "persons_face.png")
-                
-                new_item = FallingItem(filename, points, is_final_item=is_final_item)
-                self.falling_items.append(new_item)
-                self.current_item_count += 1
-                self.total_items_spawned += 1
-                
-                # Decrease spawn delay as game progresses (increase difficulty)
-                self.spawn_delay = max(20, 60 - (self.current_item_index * 10))
-            else:
-                # Move to next item type
-                self.current_item_index += 1
-                self.current_item_count = 0
-                if self.current_item_index < len(self.items_to_spawn):
-                    self.spawn_delay = 40  # Brief pause between item types
-    
-    def update(self):
+    def update(self, mouse_x=None):
+        """Run one simulation tick, with the basket following mouse_x (default: the mouse)"""
         if self.game_over or self.won:
             return
-            
-        # Check time limit
-        elapsed_time = time.time() - self.start_time
-        if elapsed_time > TIME_LIMIT:
-            self.game_over = True
-            self.show_try_again = True
-            return
-            
-        # Update basket position with mouse
-        mouse_x, _ = pygame.mouse.get_pos()
-        self.basket.update(mouse_x)
         
-        # Spawn items
-        self.spawn_timer += 1
-        if self.spawn_timer >= self.spawn_delay:
-            self.spawn_item()
-            self.spawn_timer = 0
+        # Update basket position with mouse
+        if mouse_x is None:
+            mouse_x, _ = pygame.mouse.get_pos()
+        self.sim.step(mouse_x)
+        self.basket.update(self.sim.basket_x)
         
-        # Update falling items
-        for item in self.falling_items[:]:
+        # Attach sprites to newly spawned items, drop the ones that were caught or missed
+        live = []
+        for sim_item in self.sim.items:
+            if sim_item.sprite is None:
+                filename = self.items_to_spawn[sim_item.kind][0]
+                sim_item.sprite = FallingItem(filename, sim_item, self.view)
+                self.sprites.add(sim_item.sprite, layer=ITEM_LAYER)
+            live.append(sim_item.sprite)
+        gone = set(self.falling_items).difference(live)
+        if gone:
+            self.sprites.remove(*gone)
+        self.falling_items = live
+        for item in self.falling_items:
             item.update()
-            
-            # Check collision with basket
-            if self.basket.rect.colliderect(item.rect):
-                self.score += item.points
-                self.items_caught += 1
-                self.falling_items.remove(item)
-                
-                # Check win condition - must catch ALL items
-                if self.items_caught >= self.total_items_to_catch:
-                    self.won = True
-                    
-            # Check if item falls off screen - IMMEDIATE LOSS
-            elif item.is_off_screen():
-                self.items_missed += 1
-                self.falling_items.remove(item)
-                # Immediate game over if any item is missed
-                self.game_over = True
-                self.show_try_again = True
-                return
-    
+
+    def update_hud(self):
+        self.score_label.set_text(f"Score: {self.score}")
+        self.caught_label.set_text(f"Caught: {self.items_caught}/{self.total_items_to_catch}")
+        self.time_label.set_text(f"Time: {int(self.sim.remaining_time)}s")
+
+        # Show current item type
+        if self.current_item_index < len(self.items_to_spawn):
+            item_name = self.items_to_spawn[self.current_item_index][0].split('.')[0]
+            self.current_label.set_text(f"Catching: {item_name.title()}")
+            self.current_label.visible = 1
+        else:
+            self.current_label.visible = 0
+
     def draw(self):
-        self.screen.blit(self.background, (0, 0))
-        
         if not self.game_over and not self.won:
-            # Draw game objects
-            self.basket.draw(self.screen)
+            self.basket.place(self.alpha)
             for item in self.falling_items:
-                item.draw(self.screen)
-            
-            # Draw UI with black text
-            score_text = self.font.render(f"Score: {self.score}", True, BLACK)
-            self.screen.blit(score_text, (10, 10))
-            
-            caught_text = self.font.render(f"Caught: {self.items_caught}/{self.total_items_to_catch}", True, BLACK)
-            self.screen.blit(caught_text, (10, 50))
-            
-            elapsed_time = time.time() - self.start_time
-            remaining_time = max(0, TIME_LIMIT - elapsed_time)
-            time_text = self.font.render(f"Time: {int(remaining_time)}s", True, BLACK)
-            self.screen.blit(time_text, (10, 90))
-            
-            # Show current item type
-            if self.current_item_index < len(self.items_to_spawn):
-                item_name = self.items_to_spawn[self.current_item_index][0].split('.')[0]
-                current_text = self.font.render(f"Catching: {item_name.title()}", True, BLACK)
-                self.screen.blit(current_text, (SCREEN_WIDTH - 250, 10))
-            
-            # Warning message
-            warning_text = self.font.render("Don't miss ANY item!", True, RED)
-            self.screen.blit(warning_text, (SCREEN_WIDTH - 250, 50))
-        
-        elif self.won:
+                item.place(self.alpha)
+            self.update_hud()
+            self.overlay.update()
+            if self.full_redraw or not self.dirty_rects:
+                # Fallback, and the first frame: repaint and present the whole screen
+                self.sprites.repaint_rect(self.screen.get_rect())
+                self.sprites.draw(self.screen)
+                self.view.present()
+                self.full_redraw = False
+            else:
+                self.view.present(self.sprites.draw(self.screen))
+            return
+
+        # End screens are static; they are drawn in full
+        self.screen.blit(self.background, (0, 0))
+        if self.won:
             # Victory screen
-            win_text = self.big_font.render("FIRST HALF COMPLETE!", True, GREEN)
-            win_rect = win_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 120))
+            win_text = texts.render(self.big_font, "FIRST HALF COMPLETE!", True, GREEN)
+            win_rect = win_text.get_rect(center=self.view.point(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 120))
             self.screen.blit(win_text, win_rect)
             
-            answer_text = self.font.render('First half answer is: "AcM_is_"', True, GREEN)
-            answer_rect = answer_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 70))
+            answer_text = texts.render(self.font, 'First half answer is: "AcM_is_"', True, GREEN)
+            answer_rect = answer_text.get_rect(center=self.view.point(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 70))
             self.screen.blit(answer_text, answer_rect)
             
-            score_text = self.font.render(f"Final Score: {self.score}", True, BLACK)
-            score_rect = score_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 30))
+            score_text = texts.render(self.font, f"Final Score: {self.score}", True, BLACK)
+            score_rect = score_text.get_rect(center=self.view.point(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 30))
             self.screen.blit(score_text, score_rect)
             
-            perfect_text = self.font.render("Perfect Game! All items caught!", True, BLACK)
-            perfect_rect = perfect_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 10))
+            perfect_text = texts.render(self.font, "Perfect Game! All items caught!", True, BLACK)
+            perfect_rect = perfect_text.get_rect(center=self.view.point(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 10))
             self.screen.blit(perfect_text, perfect_rect)
             
-            continue_text = self.font.render("Press ENTER to continue to second half", True, BLUE)
-            continue_rect = continue_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 50))
+            continue_text = texts.render(self.font, "Press ENTER to continue to second half", True, BLUE)
+            continue_rect = continue_text.get_rect(center=self.view.point(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 50))
             self.screen.blit(continue_text, continue_rect)
             
-            restart_text = self.font.render("Press SPACE to restart or ESC to quit", True, BLACK)
-            restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 90))
+            restart_text = texts.render(self.font, "Press SPACE to restart or ESC to quit", True, BLACK)
+            restart_rect = restart_text.get_rect(center=self.view.point(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 90))
             self.screen.blit(restart_text, restart_rect)
             
         elif self.show_try_again:
             # Game over screen
-            game_over_text = self.big_font.render("GAME OVER", True, RED)
-            game_over_rect = game_over_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 100))
+            game_over_text = texts.render(self.big_font, "GAME OVER", True, RED)
+            game_over_rect = game_over_text.get_rect(center=self.view.point(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 100))
             self.screen.blit(game_over_text, game_over_rect)
             
-            reason_text = self.font.render("You missed an item!", True, RED)
-            reason_rect = reason_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 60))
+            reason_text = texts.render(self.font, "You missed an item!", True, RED)
+            reason_rect = reason_text.get_rect(center=self.view.point(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 60))
             self.screen.blit(reason_text, reason_rect)
             
-            score_text = self.font.render(f"Final Score: {self.score}", True, BLACK)
-            score_rect = score_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 20))
+            score_text = texts.render(self.font, f"Final Score: {self.score}", True, BLACK)
+            score_rect = score_text.get_rect(center=self.view.point(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 20))
             self.screen.blit(score_text, score_rect)
             
-            caught_text = self.font.render(f"Items Caught: {self.items_caught}/{self.total_items_to_catch}", True, BLACK)
-            caught_rect = caught_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 20))
+            caught_text = texts.render(self.font, f"Items Caught: {self.items_caught}/{self.total_items_to_catch}", True, BLACK)
+            caught_rect = caught_text.get_rect(center=self.view.point(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 20))
             self.screen.blit(caught_text, caught_rect)
             
-            try_again_text = self.font.render("Press SPACE to try again or ESC to quit", True, BLACK)
-            try_again_rect = try_again_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 60))
+            try_again_text = texts.render(self.font, "Press SPACE to try again or ESC to quit", True, BLACK)
+            try_again_rect = try_again_text.get_rect(center=self.view.point(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 60))
             self.screen.blit(try_again_text, try_again_rect)
         
-        pygame.display.flip()
+        self.draw_overlay()
+        self.view.present()
     
+    def draw_overlay(self):
+        """Blit the profiler overlay, for screens drawn in full"""
+        self.overlay.update()
+        if self.overlay.visible:
+            self.screen.blit(self.overlay.image, self.overlay.rect)
+
     def handle_events(self):
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 return False
             elif event.type == pygame.KEYDOWN:
+                if profiler.handle_key(event.key):
+                    continue
                 if event.key == pygame.K_ESCAPE:
                     return False
                 elif event.key == pygame.K_SPACE:
@@ -294,25 +380,105 @@ class Game:
         return True
     
     def restart_game(self):
-        self.__init__()
+        self.__init__(self.sim.seed, self.dirty_rects, self.view, self.fps)
     
     def run(self):
         running = True
+        last_frame = time.perf_counter()
+        profiler.scene = "catch"
         while running:
             result = self.handle_events()
+            profiler.mark("events")
             if result == "start_slide_puzzle":
                 return "start_slide_puzzle"
             elif result == False:
                 running = False
-            self.update()
+            start = time.perf_counter()
+            self.advance(start - last_frame)
+            last_frame = start
+            profiler.mark("update")
             self.draw()
-            self.clock.tick(FPS)
+            profiler.mark("draw")
+            if self.view.record(time.perf_counter() - start):
+                self.build_scene()
+            self.clock.tick(self.fps)
+            profiler.mark("wait")
+            profiler.end_frame()
         
         pygame.quit()
         return "quit"
 
+class StressGame(Game):
+    """Crowd stress mode: thousands of items at once, kept in NumPy arrays"""
+
+    def __init__(self, crowd=2000, seed=None, render_scale=1.0, fps=FPS):
+        # Imported here so the regular game does not pay for loading NumPy
+        from item_store import StressSimulation
+        self.stress = StressSimulation(crowd, PYGAME_RULES, seed)
+        super().__init__(seed, False, render_scale, fps)
+
+    def build_scene(self):
+        super().build_scene()
+        size = (self.view.px(50), self.view.px(50))
+        self.item_images = [assets.image(filename, size) for filename, _, _ in self.items_to_spawn]
+
+    def update(self, mouse_x=None):
+        if mouse_x is None:
+            mouse_x, _ = pygame.mouse.get_pos()
+        self.stress.step(mouse_x)
+        self.basket.update(self.stress.basket_x)
+
+    def draw(self):
+        self.screen.blit(self.background, (0, 0))
+
+        items = self.stress.items
+        n = items.count
+        images = self.item_images
+        scale = self.view.scale
+        # Items only fall, at a constant speed, so the interpolated y is a step back from the current one
+        y = items.y[:n] - items.speed[:n] * (1.0 - self.alpha)
+        positions = zip((items.x[:n] * scale).astype(int).tolist(), (y * scale).astype(int).tolist())
+        self.screen.blits([(images[kind], pos) for kind, pos in zip(items.kind[:n].tolist(), positions)],
+                          doreturn=False)
+        self.basket.place(self.alpha)
+        self.basket.draw(self.screen)
+
+        lines = [
+            f"Items: {n}",
+            f"Caught: {self.stress.items_caught}",
+            f"Missed: {self.stress.items_missed}",
+            f"FPS: {self.clock.get_fps():.0f}",
+        ]
+        for i, line in enumerate(lines):
+            self.screen.blit(texts.render(self.font, line, True, BLACK), self.view.point(10, 10 + i * 40))
+
+        self.draw_overlay()
+        self.view.present()
+
+    def restart_game(self):
+        self.__init__(self.stress.crowd, self.sim.seed, self.view, self.fps)
+
 if __name__ == "__main__":
-    game = Game()
+    parser = argparse.ArgumentParser(description="ACM Catch Game")
+    parser.add_argument("--stress", type=int, metavar="N", help="stress mode with N items falling at once")
+    parser.add_argument("--seed", type=int, help="seed for the item spawner")
+    parser.add_argument("--full-redraw", action="store_true",
+                        help="redraw and flip the whole screen every frame instead of only what changed")
+    parser.add_argument("--render-scale", type=parse_scale, default=1.0, metavar="SCALE",
+                        help="draw at this fraction of the window resolution, or 'auto' to pick one "
+                             "from the frame time (default: 1)")
+    parser.add_argument("--fps", type=int, default=FPS,
+                        help=f"frames drawn per second; gameplay does not depend on it (default: {FPS})")
+    parser.add_argument("--profile", nargs="?", const=DEFAULT_CSV, metavar="CSV",
+                        help=f"time every frame and write the phase times to CSV on exit (default: {DEFAULT_CSV}); "
+                             "F3 shows the overlay, F4 runs cProfile")
+    args = parser.parse_args()
+    if args.profile:
+        profiler.enable(args.profile)
+    if args.stress:
+        game = StressGame(args.stress, args.seed, args.render_scale, args.fps)
+    else:
+        game = Game(args.seed, not args.full_redraw, args.render_scale, args.fps)
     result = game.run()
     if result == "start_slide_puzzle":
         print("Starting second half...")
@@ -0,0 +1,282 @@
+# Headless simulation of the catch game
+#
+# Everything that decides the outcome of a round lives here: item spawning,
+# fall speeds, basket movement and collisions. It advances in fixed ticks
+# (one tick = one frame at rules.fps), takes its randomness from a seeded
+# RNG and reads the basket position from an input source instead of the
+# mouse, so a round is reproducible and runs as fast as the CPU allows.
+# catch_game.Game drives the same simulation and only adds drawing.
+
+import random
+
+# (filename, points, count), spawned in this order
+ITEMS_TO_SPAWN = (
+    ("chocolates.jpg", 2, 15),
+    ("chips.jpg", 3, 10),
+    ("donuts.jpg", 4, 8),
+    ("pizza.jpg", 5, 4),
+    ("persons_face.png", 10, 1),  # Final item
+)
+
+
+class CatchRules:
+    """Gameplay constants for one flavour of the catch game"""
+
+    def __init__(self, width=1000, height=700, fps=60, time_limit=120,
+                 items=ITEMS_TO_SPAWN, final_item="persons_face.png",
+                 item_size=50, basket_width=80, basket_height=60, basket_margin=10,
+                 initial_spawn_delay=60, min_spawn_delay=20, spawn_delay_step=10, type_pause=40,
+                 final_speed=(2, 1), fast_chance=0.3, fast_speed=(9, 2), normal_speed=(5, 1),
+                 integer_spawn_x=True, max_misses=1, win_on_final_item=False):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.time_limit = time_limit
+        self.items = tuple(items)
+        self.final_item = final_item
+        self.item_size = item_size
+        self.basket_width = basket_width
+        self.basket_height = basket_height
+        self.basket_margin = basket_margin
+        self.initial_spawn_delay = initial_spawn_delay  # ticks
+        self.min_spawn_delay = min_spawn_delay
+        self.spawn_delay_step = spawn_delay_step
+        self.type_pause = type_pause  # ticks between item types, None to keep the ramp
+        self.final_speed = final_speed  # (base, random extra) in pixels per tick
+        self.fast_chance = fast_chance
+        self.fast_speed = fast_speed
+        self.normal_speed = normal_speed
+        self.integer_spawn_x = integer_spawn_x
+        self.max_misses = max_misses  # misses that end the round
+        self.win_on_final_item = win_on_final_item  # otherwise every item must be caught
+
+    def to_dict(self):
+        """Return the rules as plain values (shipped to the browser as JSON)"""
+        return dict(vars(self))
+
+    @property
+    def time_limit_ticks(self):
+        return int(self.time_limit * self.fps)
+
+    @property
+    def total_items(self):
+        return sum(count for _, _, count in self.items)
+
+
+# The pygame version (catch_game.py)
+PYGAME_RULES = CatchRules()
+
+# The browser version (templates/game.html)
+WEB_RULES = CatchRules(
+    final_speed=(1.5, 0.5), fast_speed=(4, 1), normal_speed=(2.5, 0.5),
+    type_pause=None, integer_spawn_x=False, max_misses=2, win_on_final_item=True,
+)
+
+
+class Mulberry32:
+    """Tiny seeded PRNG with a bit-exact JavaScript twin
+
+    random.Random cannot be reproduced in a browser, so rounds that must be
+    replayed on both sides (see replay.py) draw from this instead. The
+    JavaScript version in templates/game.html returns the same sequence.
+    """
+
+    __slots__ = ('state',)
+
+    def __init__(self, seed=0):
+        self.state = seed & 0xFFFFFFFF
+
+    def random(self):
+        self.state = state = (self.state + 0x6D2B79F5) & 0xFFFFFFFF
+        t = ((state ^ (state >> 15)) * (state | 1)) & 0xFFFFFFFF
+        t ^= (t + ((t ^ (t >> 7)) * (t | 61))) & 0xFFFFFFFF
+        return (t ^ (t >> 14)) / 4294967296
+
+
+class SimItem:
+    """One falling item; `sprite` is free for a front end to attach drawing data"""
+
+    __slots__ = ('x', 'y', 'speed', 'points', 'kind', 'is_final', 'sprite')
+
+    def __init__(self, x, y, speed, points, kind, is_final):
+        self.x = x
+        self.y = y
+        self.speed = speed
+        self.points = points
+        self.kind = kind  # index into rules.items
+        self.is_final = is_final
+        self.sprite = None
+
+
+class CatchSimulation:
+    """Fixed-tick, display-free state of one round"""
+
+    def __init__(self, rules=PYGAME_RULES, seed=None, rng=None):
+        self.rules = rules
+        self.seed = seed
+        self.rng = rng if rng is not None else random.Random(seed)
+
+        self.basket_y = rules.height - rules.basket_height - rules.basket_margin
+        self.basket_x = rules.width // 2 - rules.basket_width // 2
+        self.items = []
+
+        self.tick = 0
+        self.score = 0
+        self.items_caught = 0
+        self.items_missed = 0
+        self.total_items_spawned = 0
+        self.game_over = False
+        self.won = False
+        self.show_try_again = False
+        self.missed_items = []  # kinds of the items that were missed
+
+        self.current_item_index = 0
+        self.current_item_count = 0
+        self.spawn_timer = 0
+        self.spawn_delay = rules.initial_spawn_delay
+
+    # -- state -------------------------------------------------------------
+
+    @property
+    def finished(self):
+        return self.game_over or self.won
+
+    @property
+    def elapsed_time(self):
+        return self.tick / self.rules.fps
+
+    @property
+    def remaining_time(self):
+        return max(0, self.rules.time_limit - self.elapsed_time)
+
+    # -- rules -------------------------------------------------------------
+
+    def roll_speed(self, is_final):
+        rng = self.rng
+        rules = self.rules
+        if is_final:  # Person's face - keep it slow
+            base, extra = rules.final_speed
+        elif rng.random() < rules.fast_chance:
+            base, extra = rules.fast_speed
+        else:
+            base, extra = rules.normal_speed
+        return base + rng.random() * extra
+
+    def spawn_item(self):
+        rules = self.rules
+        if self.current_item_index >= len(rules.items):
+            return
+
+        filename, points, total_count = rules.items[self.current_item_index]
+        if self.current_item_count < total_count:
+            span = rules.width - rules.item_size
+            if rules.integer_spawn_x:
+                x = int(self.rng.random() * (span + 1))
+            else:
+                x = self.rng.random() * span
+            is_final = filename == rules.final_item
+            speed = self.roll_speed(is_final)
+            self.items.append(SimItem(x, -rules.item_size, speed, points, self.current_item_index, is_final))
+            self.current_item_count += 1
+            self.total_items_spawned += 1
+
+            # Decrease spawn delay as game progresses (increase difficulty)
+            self.spawn_delay = max(rules.min_spawn_delay,
+                                   rules.initial_spawn_delay - self.current_item_index * rules.spawn_delay_step)
+        else:
+            # Move to next item type
+            self.current_item_index += 1
+            self.current_item_count = 0
+            if rules.type_pause is not None and self.current_item_index < len(rules.items):
+                self.spawn_delay = rules.type_pause  # Brief pause between item types
+
+    def move_basket(self, mouse_x):
+        rules = self.rules
+        x = mouse_x - rules.basket_width // 2
+        # Keep basket on screen
+        self.basket_x = min(max(x, 0), rules.width - rules.basket_width)
+
+    def step(self, mouse_x):
+        """Advance one tick with the basket centred on mouse_x"""
+        if self.finished:
+            return
+        rules = self.rules
+
+        # Check time limit
+        if self.tick >= rules.time_limit_ticks:
+            self.game_over = True
+            self.show_try_again = True
+            return
+        self.tick += 1
+
+        self.move_basket(mouse_x)
+
+        # Spawn items
+        self.spawn_timer += 1
+        if self.spawn_timer >= self.spawn_delay:
+            self.spawn_item()
+            self.spawn_timer = 0
+
+        # Update falling items
+        left = self.basket_x
+        right = left + rules.basket_width
+        top = self.basket_y
+        bottom = top + rules.basket_height
+        size = rules.item_size
+        for item in self.items[:]:
+            item.y += item.speed
+
+            # Check collision with basket
+            if item.x < right and item.x + size > left and item.y < bottom and item.y + size > top:
+                self.score += item.points
+                self.items_caught += 1
+                self.items.remove(item)
+
+                if rules.win_on_final_item and item.is_final:
+                    self.won = True
+                    return
+                if self.items_caught >= rules.total_items:
+                    self.won = True
+
+            # Check if item falls off screen
+            elif item.y > rules.height:
+                self.items_missed += 1
+                self.missed_items.append(item.kind)
+                self.items.remove(item)
+                if self.items_missed >= rules.max_misses:
+                    self.game_over = True
+                    self.show_try_again = True
+                    return
+
+    def run(self, input_source, max_ticks=None):
+        """Step until the round ends; input_source(sim) returns the mouse x for each tick"""
+        limit = self.rules.time_limit_ticks + 1 if max_ticks is None else max_ticks
+        while not self.finished and limit > 0:
+            self.step(input_source(self))
+            limit -= 1
+        return self
+
+
+class ScriptedInput:
+    """Input source that replays a list of mouse x positions, holding the last one"""
+
+    def __init__(self, positions):
+        self.positions = list(positions)
+
+    def __call__(self, sim):
+        if not self.positions:
+            return sim.basket_x + sim.rules.basket_width // 2
+        return self.positions[min(sim.tick, len(self.positions) - 1)]
+
+
+def chase_lowest_item(sim):
+    """Input source that puts the basket under the item closest to the ground"""
+    if not sim.items:
+        return sim.basket_x + sim.rules.basket_width // 2
+    target = max(sim.items, key=lambda item: item.y)
+    return target.x + sim.rules.item_size / 2
+
+
+def simulate_round(seed, input_source=chase_lowest_item, rules=PYGAME_RULES):
+    """Play one full round headlessly and return the finished simulation"""
+    return CatchSimulation(rules, seed).run(input_source)
@@ -1,14 +1,48 @@
 # Configuration for different environments
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 class Config:
     SECRET_KEY = 'your-secret-key-change-this-in-production'
     DEBUG = False
 
+    # Session store: idle sessions expire after SESSION_TTL seconds and the
+    # least recently used are evicted once SESSION_MAX is reached
+    SESSION_TTL = 60 * 60
+    SESSION_MAX = 20000
+    SESSION_STRIPES = 64
+    SESSION_REAP_INTERVAL = 30
+
+    # 'memory' keeps sessions inside one process; 'sqlite' shares them between
+    # worker processes through a WAL-mode database file; 'token' keeps no
+    # server state at all and hands the client a signed session token
+    SESSION_BACKEND = 'memory'
+    SESSION_DB_PATH = os.path.join(BASE_DIR, 'instance', 'sessions.db')
+    SESSION_CACHE_SIZE = 4096
+    SESSION_CACHE_TTL = 0.25  # seconds a cached session is trusted without a version check
+    SESSION_FLUSH_INTERVAL = 0.2  # seconds between batched counter writes
+    SESSION_REPLAY_WINDOW = 50000  # token sessions tracked per worker for replay checks
+
+    # A claimed catch game win is only accepted after its input replay has
+    # been re-simulated by one of these worker processes (0 verifies inline)
+    REPLAY_WORKERS = 2
+    REPLAY_MAX_PENDING = 64  # replays queued at once before end_game answers "busy"
+    REPLAY_TIMEOUT = 5.0  # seconds to wait for a verification
+
+    # Time every request and serve the totals on /metrics (Prometheus text)
+    METRICS_ENABLED = True
+
+    # /admin/* endpoints answer only requests sending this in X-Admin-Token,
+    # and are disabled while it is unset
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
 class DevelopmentConfig(Config):
     DEBUG = True
 
 class ProductionConfig(Config):
     DEBUG = False
+    SESSION_BACKEND = 'sqlite'
 
 # Choose config based on environment
 config = {
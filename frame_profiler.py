@@ -0,0 +1,195 @@
+# Per-phase frame timing for the pygame loops
+#
+# The game loops mark the end of each phase of a frame (handling events,
+# updating, drawing, presenting, waiting for the next frame) and the
+# profiler keeps the last CAPACITY frames of every phase in ring buffers,
+# from which it reports rolling p50/p95/p99. While it is off mark() returns
+# straight away, so the marks stay in the loops for good.
+#
+#     F3  show or hide the overlay (recording starts the first time)
+#     F4  run cProfile over the next PROFILE_FRAMES frames
+#
+# Started with --profile, the games record from the first frame and write
+# every frame's phase times to a CSV file, which is complete on exit.
+
+import atexit
+import cProfile
+import csv
+import pstats
+import time
+from array import array
+
+import pygame
+
+PHASES = ('events', 'update', 'draw', 'present', 'wait')
+CAPACITY = 600  # frames the percentiles cover, 10 s at 60 FPS
+OVERLAY_REFRESH = 15  # frames between overlay updates
+PROFILE_FRAMES = 300
+OVERLAY_KEY = pygame.K_F3
+PROFILE_KEY = pygame.K_F4
+DEFAULT_CSV = 'frame_times.csv'
+
+WHITE = (255, 255, 255)
+BACKDROP = (0, 0, 0, 170)
+
+
+class FrameProfiler:
+    """Phase timer with rolling percentiles, CSV output and cProfile capture"""
+
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self.enabled = False
+        self.overlay_visible = False
+        self.scene = ''  # which loop is running, for the CSV
+        self.frames = 0
+        self.version = 0  # changes whenever the overlay should be redrawn
+        self.columns = PHASES + ('total',)
+        self._slots = {phase: i for i, phase in enumerate(PHASES)}
+        self._rings = [array('q', bytes(8 * capacity)) for _ in self.columns]
+        self._current = [0] * len(PHASES)
+        self._last = 0
+        self._csv_file = None
+        self._csv = None
+        self._cprofile = None
+        self._cprofile_frames = 0
+
+    def enable(self, csv_path=None):
+        """Start recording, also to csv_path if given"""
+        if csv_path and self._csv_file is None:
+            self._csv_file = open(csv_path, 'w', newline='')
+            self._csv = csv.writer(self._csv_file)
+            self._csv.writerow(('frame', 'scene') + tuple(f'{column}_us' for column in self.columns))
+            atexit.register(self.close)
+        if not self.enabled:
+            self.enabled = True
+            self._last = time.perf_counter_ns()
+
+    def close(self):
+        if self._csv_file is not None:
+            self._csv_file.close()
+            self._csv_file = self._csv = None
+
+    # -- per frame ------------------------------------------------------------
+
+    def mark(self, phase):
+        """End `phase` of the current frame; a phase may be marked more than once"""
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        self._current[self._slots[phase]] += now - self._last
+        self._last = now
+
+    def end_frame(self):
+        if self._cprofile is not None:
+            self._cprofile_frames -= 1
+            if self._cprofile_frames <= 0:
+                self._finish_cprofile()
+        if not self.enabled:
+            return
+
+        current = self._current
+        total = sum(current)
+        slot = self.frames % self.capacity
+        for ring, value in zip(self._rings, current):
+            ring[slot] = value
+        self._rings[-1][slot] = total
+        if self._csv is not None:
+            self._csv.writerow((self.frames, self.scene, *(value // 1000 for value in current), total // 1000))
+        self._current = [0] * len(PHASES)
+        self.frames += 1
+        if self.overlay_visible and self.frames % OVERLAY_REFRESH == 0:
+            self.version += 1
+
+    def percentiles(self):
+        """{column: (p50, p95, p99)} in milliseconds over the buffered frames"""
+        count = min(self.frames, self.capacity)
+        result = {}
+        for column, ring in zip(self.columns, self._rings):
+            if not count:
+                result[column] = (0.0, 0.0, 0.0)
+                continue
+            values = sorted(ring[:count])
+            result[column] = tuple(values[min(count - 1, int(q * count))] / 1e6 for q in (0.5, 0.95, 0.99))
+        return result
+
+    # -- hotkeys ----------------------------------------------------------------
+
+    def handle_key(self, key):
+        """Act on the profiler's hotkeys; returns whether key was one of them"""
+        if key == OVERLAY_KEY:
+            self.overlay_visible = not self.overlay_visible
+            self.version += 1
+            self.enable()
+            return True
+        if key == PROFILE_KEY:
+            self.start_cprofile()
+            return True
+        return False
+
+    def start_cprofile(self, frames=PROFILE_FRAMES):
+        if self._cprofile is not None:
+            return
+        print(f"Profiling the next {frames} frames...")
+        self._cprofile_frames = frames
+        self._cprofile = cProfile.Profile()
+        self._cprofile.enable()
+
+    def _finish_cprofile(self):
+        profile, self._cprofile = self._cprofile, None
+        profile.disable()
+        path = time.strftime('profile-%Y%m%d-%H%M%S.prof')
+        profile.dump_stats(path)
+        pstats.Stats(profile).sort_stats('cumulative').print_stats(15)
+        print(f"cProfile stats written to {path}")
+
+    # -- overlay ------------------------------------------------------------------
+
+    def render_overlay(self, font):
+        """Surface with the percentile table"""
+        stats = self.percentiles()
+        rows = [('ms', 'p50', 'p95', 'p99')]
+        rows.extend((column, *(f'{value:.2f}' for value in stats[column])) for column in self.columns)
+        cells = [[font.render(text, True, WHITE) for text in row] for row in rows]
+        widths = [max(row[i].get_width() for row in cells) for i in range(len(rows[0]))]
+        gap = font.size(' ')[0] * 2
+        line = font.get_linesize()
+
+        surface = pygame.Surface((sum(widths) + gap * (len(widths) + 1), line * len(rows) + gap), pygame.SRCALPHA)
+        surface.fill(BACKDROP)
+        for y, row in enumerate(cells):
+            x = gap
+            for i, cell in enumerate(row):
+                # Names left-aligned, numbers right-aligned
+                offset = 0 if i == 0 else widths[i] - cell.get_width()
+                surface.blit(cell, (x + offset, gap // 2 + y * line))
+                x += widths[i] + gap
+        return surface
+
+
+class OverlaySprite(pygame.sprite.DirtySprite):
+    """The profiler's overlay, anchored by its top right corner"""
+
+    def __init__(self, profiler, font, topright):
+        super().__init__()
+        self.profiler = profiler
+        self.font = font
+        self.topright = topright
+        self.version = None
+        self.image = pygame.Surface((0, 0))
+        self.rect = self.image.get_rect(topright=topright)
+        self.visible = 0
+
+    def update(self):
+        profiler = self.profiler
+        if profiler.version == self.version:
+            return
+        self.version = profiler.version
+        self.visible = int(profiler.overlay_visible)
+        if profiler.overlay_visible:
+            self.image = profiler.render_overlay(self.font)
+            self.rect = self.image.get_rect(topright=self.topright)
+        self.dirty = 1
+
+
+# The profiler every game loop shares
+profiler = FrameProfiler()
@@ -0,0 +1,153 @@
+# Array-backed falling items for high-density stress modes
+#
+# The regular game keeps a few dozen SimItem objects in a list, which is the
+# simplest thing for 38 items. Crowd and "chaos" variants keep thousands of
+# items on screen at once, so there the items live in a structure of NumPy
+# arrays (x, y, speed, points, kind) instead: one frame moves every item
+# with a single vector add, tests them all against the basket with one
+# vectorized AABB check, and removes caught and missed items by moving live
+# items from the tail into the holes (swap-remove), so the arrays stay dense
+# and are never reallocated while the crowd size is stable.
+
+import numpy as np
+
+from catch_sim import PYGAME_RULES
+
+
+class ItemStore:
+    """Structure-of-arrays store of falling items"""
+
+    def __init__(self, capacity=1024):
+        self.count = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old = getattr(self, 'x', None)
+        x = np.empty(capacity, dtype=np.float32)
+        y = np.empty(capacity, dtype=np.float32)
+        speed = np.empty(capacity, dtype=np.float32)
+        points = np.empty(capacity, dtype=np.int32)
+        kind = np.empty(capacity, dtype=np.int8)
+        if old is not None:
+            n = self.count
+            x[:n] = self.x[:n]
+            y[:n] = self.y[:n]
+            speed[:n] = self.speed[:n]
+            points[:n] = self.points[:n]
+            kind[:n] = self.kind[:n]
+        self.x, self.y, self.speed, self.points, self.kind = x, y, speed, points, kind
+
+    @property
+    def capacity(self):
+        return len(self.x)
+
+    def __len__(self):
+        return self.count
+
+    def add(self, x, y, speed, points, kind):
+        """Append items; every argument is a scalar or an array of equal length"""
+        x = np.atleast_1d(x)
+        added = len(x)
+        start, end = self.count, self.count + added
+        if end > self.capacity:
+            self._allocate(max(end, self.capacity * 2))
+        self.x[start:end] = x
+        self.y[start:end] = y
+        self.speed[start:end] = speed
+        self.points[start:end] = points
+        self.kind[start:end] = kind
+        self.count = end
+
+    def advance(self, ticks=1):
+        """Move every item down by its speed"""
+        n = self.count
+        self.y[:n] += self.speed[:n] * ticks
+
+    def overlapping(self, left, top, width, height, size):
+        """Boolean mask of items whose size x size box overlaps the rectangle"""
+        n = self.count
+        x = self.x[:n]
+        y = self.y[:n]
+        return (x < left + width) & (x + size > left) & (y < top + height) & (y + size > top)
+
+    def below(self, limit):
+        """Boolean mask of items whose top edge is past limit"""
+        return self.y[:self.count] > limit
+
+    def remove(self, mask):
+        """Drop the items selected by mask, filling the holes from the tail"""
+        n = self.count
+        removed = np.flatnonzero(mask)
+        if not len(removed):
+            return
+        new_count = n - len(removed)
+        # Holes inside the surviving range get the live items from past its end
+        holes = removed[removed < new_count]
+        if len(holes):
+            tail = np.ones(n - new_count, dtype=bool)
+            tail[removed[removed >= new_count] - new_count] = False
+            movers = np.flatnonzero(tail) + new_count
+            for array in (self.x, self.y, self.speed, self.points, self.kind):
+                array[holes] = array[movers]
+        self.count = new_count
+
+    def clear(self):
+        self.count = 0
+
+
+class StressSimulation:
+    """Endless crowd mode: keeps `crowd` items falling, misses do not end the round"""
+
+    def __init__(self, crowd=2000, rules=PYGAME_RULES, seed=None):
+        self.rules = rules
+        self.crowd = crowd
+        self.rng = np.random.default_rng(seed)
+        self.items = ItemStore(crowd)
+        self.basket_y = rules.height - rules.basket_height - rules.basket_margin
+        self.basket_x = rules.width // 2 - rules.basket_width // 2
+        self.tick = 0
+        self.score = 0
+        self.items_caught = 0
+        self.items_missed = 0
+
+        # Kinds except the final item, with their points
+        kinds = [i for i, item in enumerate(rules.items) if item[0] != rules.final_item]
+        self._kinds = np.array(kinds, dtype=np.int8)
+        self._points = np.array([rules.items[i][1] for i in kinds], dtype=np.int32)
+
+    def spawn(self, count):
+        """Add count items above the screen with the regular speed roll"""
+        if count <= 0:
+            return
+        rules = self.rules
+        rng = self.rng
+        fast = rng.random(count) < rules.fast_chance
+        base = np.where(fast, rules.fast_speed[0], rules.normal_speed[0])
+        extra = np.where(fast, rules.fast_speed[1], rules.normal_speed[1])
+        choice = rng.integers(0, len(self._kinds), count)
+        # Stagger the start height so a fresh crowd does not arrive as one wall
+        y = -rules.item_size - rng.random(count) * rules.height
+        self.items.add(
+            rng.integers(0, rules.width - rules.item_size + 1, count),
+            y, base + rng.random(count) * extra,
+            self._points[choice], self._kinds[choice],
+        )
+
+    def step(self, mouse_x):
+        """Advance one tick with the basket centred on mouse_x"""
+        rules = self.rules
+        self.tick += 1
+        x = mouse_x - rules.basket_width // 2
+        self.basket_x = min(max(x, 0), rules.width - rules.basket_width)
+
+        self.spawn(self.crowd - len(self.items))
+        items = self.items
+        items.advance()
+        caught = items.overlapping(self.basket_x, self.basket_y,
+                                   rules.basket_width, rules.basket_height, rules.item_size)
+        missed = ~caught & items.below(rules.height)
+        caught_count = int(caught.sum())
+        self.items_caught += caught_count
+        self.score += int(items.points[:items.count][caught].sum()) if caught_count else 0
+        self.items_missed += int(missed.sum())
+        items.remove(caught | missed)
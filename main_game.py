@@ -1,14 +1,37 @@
-import pygame
+import argparse
 import sys
 import os
+import threading
+import time
 
-# Import both game modules
+# The slide puzzle is imported when it is prepared, during the catch game
 from catch_game import Game as CatchGame
-from slide_puzzle import SlidePuzzle
+from asset_cache import assets
+from text_cache import texts
+from render_scale import parse_scale
+from frame_profiler import DEFAULT_CSV, profiler
+
+PREPARE_DELAY = 0.5  # seconds to let the catch game start before preparing the puzzle
 
 class GameController:
-    def __init__(self):
-        pygame.init()
+    def __init__(self, render_scale=1.0):
+        # pygame is initialized by the games, when the first one starts
+        self.render_scale = render_scale
+        self.prepared_board = None
+
+    def prepare_second_half(self):
+        """Scramble the puzzle and load its hint tables while the catch game runs
+
+        Only the work that needs no pygame is done here; pygame is not
+        thread-safe, so the puzzle's surfaces are made on the main thread.
+        """
+        time.sleep(PREPARE_DELAY)
+        try:
+            from slide_puzzle import prepare_board
+            self.prepared_board = prepare_board()
+        except Exception as e:
+            # The puzzle is scrambled when the second half starts instead
+            print(f"Could not prepare the slide puzzle in advance: {e}", file=sys.stderr)
         
     def run_full_game(self):
         """Run the complete two-part game"""
@@ -17,19 +40,40 @@ class GameController:
         print("Second Half: Slide Puzzle")
         print("-" * 50)
         
-        # Run first half (catch game)
-        catch_game = CatchGame()
-        result = catch_game.run()
+        # Run first half (catch game), preparing the second half meanwhile so
+        # it can start without a pause
+        catch_game = CatchGame(render_scale=self.render_scale)
+        preparer = threading.Thread(target=self.prepare_second_half, name="puzzle-preparer")
+        preparer.start()
+        try:
+            result = catch_game.run()
+        finally:
+            preparer.join()
         
         if result == "start_slide_puzzle":
             print("First half completed! Starting second half...")
             
-            # Run second half (slide puzzle)
-            slide_puzzle = SlidePuzzle()
+            # Run second half (slide puzzle), at the scale the first half settled on
+            from slide_puzzle import SlidePuzzle
+            slide_puzzle = SlidePuzzle(catch_game.view, board=self.prepared_board)
             slide_puzzle.run()
         
         print("Game completed! Thanks for playing!")
+        stats = assets.stats()
+        print(f"Assets: {stats['loads']} loaded, {stats['hits']} reused, {stats['bytes'] // 1024} KB held")
+        stats = texts.stats()
+        print(f"Text: {stats['misses']} rendered, {stats['hits']} reused")
 
 if __name__ == "__main__":
-    controller = GameController()
+    parser = argparse.ArgumentParser(description="ACM Challenge - Two Part Game")
+    parser.add_argument("--render-scale", type=parse_scale, default=1.0, metavar="SCALE",
+                        help="draw at this fraction of the window resolution, or 'auto' to pick one "
+                             "from the frame time (default: 1)")
+    parser.add_argument("--profile", nargs="?", const=DEFAULT_CSV, metavar="CSV",
+                        help=f"time every frame and write the phase times to CSV on exit (default: {DEFAULT_CSV}); "
+                             "F3 shows the overlay, F4 runs cProfile")
+    args = parser.parse_args()
+    if args.profile:
+        profiler.enable(args.profile)
+    controller = GameController(args.render_scale)
     controller.run_full_game()
@@ -0,0 +1,262 @@
+# Request metrics for the Flask API, in Prometheus text format
+#
+# MetricsMiddleware wraps the WSGI app and times every request from the
+# moment the server hands it over until the response body is closed. Each
+# worker thread counts into its own _ThreadStats, so the hot path is a few
+# dict and list updates with no lock; a scrape of /metrics sums the threads
+# (plus whatever threads that have exited left behind) when it renders.
+#
+# Exported per Flask endpoint:
+#
+#     http_requests_total{endpoint, method, status}    counter
+#     http_request_duration_seconds{endpoint}          histogram, LATENCY_BUCKETS
+#     http_request_size_bytes_total{endpoint}          counter (Content-Length)
+#     http_response_size_bytes_total{endpoint}         counter (body bytes sent)
+#     http_requests_in_flight                          gauge
+#
+# plus any gauges and counters registered with RequestMetrics.gauge() and
+# counter(), which are read at scrape time. Each worker process keeps its own numbers; with several
+# workers every scrape reports the one that served it.
+
+import threading
+import time
+import weakref
+from bisect import bisect_left
+
+# Upper bounds in seconds; end_game can wait up to REPLAY_TIMEOUT for a verification
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ENDPOINT_KEY = 'metrics.endpoint'  # environ key the app stores the matched endpoint under
+UNMATCHED = 'unmatched'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _RouteStats:
+    __slots__ = ('buckets', 'duration', 'request_bytes', 'response_bytes')
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # the last one is +Inf
+        self.duration = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def merge(self, other):
+        for i, count in enumerate(other.buckets):
+            self.buckets[i] += count
+        self.duration += other.duration
+        self.request_bytes += other.request_bytes
+        self.response_bytes += other.response_bytes
+
+
+class _ThreadStats:
+    __slots__ = ('routes', 'requests', 'in_flight', '__weakref__')
+
+    def __init__(self):
+        self.routes = {}  # endpoint -> _RouteStats
+        self.requests = {}  # (endpoint, method, status) -> count
+        self.in_flight = 0
+
+    def merge(self, other):
+        for endpoint, route in list(other.routes.items()):
+            self.routes.setdefault(endpoint, _RouteStats()).merge(route)
+        for key, count in list(other.requests.items()):
+            self.requests[key] = self.requests.get(key, 0) + count
+        self.in_flight += other.in_flight
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_le(bound):
+    return repr(float(bound))
+
+
+class RequestMetrics:
+    """Per-thread request counters summed into Prometheus text on demand"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()  # guards _threads and _retired only
+        self._threads = []
+        self._retired = _ThreadStats()  # totals of threads that have exited
+        self._collectors = []  # (name, help text, callback, label, metric type)
+
+    def thread_stats(self):
+        """Return the calling thread's counters, registering them on first use"""
+        try:
+            return self._local.stats
+        except AttributeError:
+            pass
+        stats = self._local.stats = _ThreadStats()
+        with self._lock:
+            self._threads.append(stats)
+        # Servers that start a thread per request would otherwise grow the list forever
+        weakref.finalize(threading.current_thread(), self._retire, stats)
+        return stats
+
+    def _retire(self, stats):
+        with self._lock:
+            self._threads.remove(stats)
+            self._retired.merge(stats)
+
+    def record(self, endpoint, method, status, seconds, request_bytes, response_bytes):
+        """Count one finished request in the calling thread's counters"""
+        stats = self.thread_stats()
+        route = stats.routes.get(endpoint)
+        if route is None:
+            route = stats.routes[endpoint] = _RouteStats()
+        route.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        route.duration += seconds
+        route.request_bytes += request_bytes
+        route.response_bytes += response_bytes
+        key = (endpoint, method, status)
+        stats.requests[key] = stats.requests.get(key, 0) + 1
+        stats.in_flight -= 1
+
+    def gauge(self, name, help_text, callback, label=None):
+        """Export callback() as a gauge at every scrape
+
+        The callback returns a number, or with label set a dict whose keys
+        become that label's values (non-numeric entries are skipped).
+        """
+        self._collectors.append((name, help_text, callback, label, 'gauge'))
+
+    def counter(self, name, help_text, callback, label=None):
+        """Export callback() as a counter at every scrape, like gauge()
+
+        The values must only ever grow; name should end in _total.
+        """
+        self._collectors.append((name, help_text, callback, label, 'counter'))
+
+    def snapshot(self):
+        """Return every thread's counters summed into one _ThreadStats"""
+        total = _ThreadStats()
+        with self._lock:
+            total.merge(self._retired)
+            threads = list(self._threads)
+        for stats in threads:
+            total.merge(stats)
+        return total
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format"""
+        total = self.snapshot()
+        lines = []
+
+        lines.append('# HELP http_requests_total Requests handled, by endpoint, method and status code.')
+        lines.append('# TYPE http_requests_total counter')
+        for (endpoint, method, status), count in sorted(total.requests.items()):
+            lines.append(f'http_requests_total{{endpoint="{_escape(endpoint)}",method="{_escape(method)}",'
+                         f'status="{status}"}} {count}')
+
+        lines.append('# HELP http_request_duration_seconds Time from receiving a request to closing its response.')
+        lines.append('# TYPE http_request_duration_seconds histogram')
+        for endpoint, route in sorted(total.routes.items()):
+            label = f'endpoint="{_escape(endpoint)}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, route.buckets):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{label},le="{_format_le(bound)}"}} {cumulative}')
+            cumulative += route.buckets[-1]
+            lines.append(f'http_request_duration_seconds_bucket{{{label},le="+Inf"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_sum{{{label}}} {route.duration!r}')
+            lines.append(f'http_request_duration_seconds_count{{{label}}} {cumulative}')
+
+        for name, attr, help_text in (
+            ('http_request_size_bytes_total', 'request_bytes', 'Request body bytes, from Content-Length.'),
+            ('http_response_size_bytes_total', 'response_bytes', 'Response body bytes sent.'),
+        ):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for endpoint, route in sorted(total.routes.items()):
+                lines.append(f'{name}{{endpoint="{_escape(endpoint)}"}} {getattr(route, attr)}')
+
+        lines.append('# HELP http_requests_in_flight Requests currently being handled.')
+        lines.append('# TYPE http_requests_in_flight gauge')
+        lines.append(f'http_requests_in_flight {total.in_flight}')
+
+        for name, help_text, callback, label, kind in self._collectors:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            value = callback()
+            if label is None:
+                lines.append(f'{name} {value}')
+                continue
+            for key, item in value.items():
+                if isinstance(item, (int, float)) and not isinstance(item, bool):
+                    lines.append(f'{name}{{{label}="{_escape(key)}"}} {item}')
+
+        return '\n'.join(lines) + '\n'
+
+
+class _ClosingBody:
+    """Response iterable that counts bytes and records the request when closed"""
+
+    __slots__ = ('_middleware', '_environ', '_start', '_iterable', 'status', 'size', '_recorded')
+
+    def __init__(self, middleware, environ, start):
+        self._middleware = middleware
+        self._environ = environ
+        self._start = start
+        self._iterable = ()
+        self.status = 500
+        self.size = 0
+        self._recorded = False
+
+    def __iter__(self):
+        for chunk in self._iterable:
+            self.size += len(chunk)
+            yield chunk
+
+    def close(self):
+        try:
+            close = getattr(self._iterable, 'close', None)
+            if close is not None:
+                close()
+        finally:
+            self.record()
+
+    def record(self):
+        if self._recorded:
+            return
+        self._recorded = True
+        environ = self._environ
+        try:
+            request_bytes = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            request_bytes = 0
+        self._middleware.metrics.record(
+            environ.get(ENDPOINT_KEY) or UNMATCHED, environ.get('REQUEST_METHOD', ''), self.status,
+            time.perf_counter() - self._start, request_bytes, self.size)
+
+
+class MetricsMiddleware:
+    """WSGI middleware feeding every request into a RequestMetrics
+
+    The wrapped app names the endpoint by storing it in
+    environ[ENDPOINT_KEY]; requests it leaves unnamed count as "unmatched",
+    so the label set stays bounded whatever paths clients ask for.
+
+    A request is recorded when the server closes its response, as WSGI
+    requires; in-process test clients need buffered=True (or a with block)
+    for that to happen.
+    """
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    def __call__(self, environ, start_response):
+        body = _ClosingBody(self, environ, time.perf_counter())
+        self.metrics.thread_stats().in_flight += 1
+
+        def counting_start_response(status, headers, exc_info=None):
+            body.status = int(status[:3])
+            return start_response(status, headers, exc_info)
+
+        try:
+            body._iterable = self.app(environ, counting_start_response)
+        except BaseException:
+            body.record()
+            raise
+        return body
@@ -0,0 +1,140 @@
+# Slide puzzle board shared by the Flask API and the pygame game
+#
+# A board is size x size cells stored as a packed bytearray: cell i holds the
+# tile that sits there, tile t belongs in cell t, and the largest tile
+# (size * size - 1) is the empty space. Neighbour lists and adjacency
+# bitmasks are computed once per board size, and the number of tiles in
+# their home cell is updated on every move, so checking a move or asking
+# whether the board is solved never rescans the grid.
+
+MIN_SIZE = 3
+MAX_SIZE = 10
+
+_neighbor_tables = {}
+_adjacency_masks = {}
+
+
+def neighbors(size):
+    """Return a tuple of neighbour positions for every cell of a size x size board"""
+    table = _neighbor_tables.get(size)
+    if table is None:
+        table = []
+        for pos in range(size * size):
+            row, col = divmod(pos, size)
+            cells = []
+            for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+                new_row, new_col = row + dr, col + dc
+                if 0 <= new_row < size and 0 <= new_col < size:
+                    cells.append(new_row * size + new_col)
+            table.append(tuple(cells))
+        table = _neighbor_tables[size] = tuple(table)
+    return table
+
+
+def adjacency_masks(size):
+    """Return, for every cell, a bitmask of the cells next to it"""
+    masks = _adjacency_masks.get(size)
+    if masks is None:
+        masks = _adjacency_masks[size] = tuple(
+            sum(1 << pos for pos in cells) for cells in neighbors(size))
+    return masks
+
+
+def is_solvable(grid, size):
+    """Check whether grid can reach the solved board"""
+    blank = size * size - 1
+    tiles = [v for v in grid if v != blank]
+    inversions = sum(1 for i in range(len(tiles)) for j in range(i + 1, len(tiles)) if tiles[i] > tiles[j])
+    if size % 2:
+        return inversions % 2 == 0
+    blank_row_from_bottom = size - list(grid).index(blank) // size
+    return (inversions + blank_row_from_bottom) % 2 == 1
+
+
+class PuzzleBoard:
+    """A size x size slide puzzle with O(1) moves and solved checks"""
+
+    __slots__ = ('size', 'tiles', 'empty_pos', 'correct', '_neighbors', '_masks')
+
+    def __init__(self, size=3, tiles=None):
+        if not MIN_SIZE <= size <= MAX_SIZE:
+            raise ValueError(f'puzzle size must be between {MIN_SIZE} and {MAX_SIZE}')
+        cells = size * size
+        self.size = size
+        self.tiles = bytearray(range(cells)) if tiles is None else bytearray(tiles)
+        if len(self.tiles) != cells or sorted(self.tiles) != list(range(cells)):
+            raise ValueError(f'not a {size}x{size} board')
+        self.empty_pos = self.tiles.index(cells - 1)
+        # Non-empty tiles sitting in their home cell
+        self.correct = sum(1 for pos, tile in enumerate(self.tiles) if tile == pos and tile != cells - 1)
+        self._neighbors = neighbors(size)
+        self._masks = adjacency_masks(size)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Rebuild a board from bytes(board)"""
+        size = int(round(len(data) ** 0.5))
+        return cls(size, data)
+
+    @property
+    def cells(self):
+        return len(self.tiles)
+
+    @property
+    def is_solved(self):
+        return self.correct == len(self.tiles) - 1
+
+    def valid_moves(self):
+        """Cells whose tile can slide into the empty space"""
+        return self._neighbors[self.empty_pos]
+
+    def can_move(self, pos):
+        return isinstance(pos, int) and pos >= 0 and (self._masks[self.empty_pos] >> pos) & 1 == 1
+
+    def move(self, pos):
+        """Slide the tile at pos into the empty space; return False if it is not adjacent"""
+        if not self.can_move(pos):
+            return False
+        tiles = self.tiles
+        empty = self.empty_pos
+        tile = tiles[pos]
+        self.correct += (tile == empty) - (tile == pos)
+        tiles[empty] = tile
+        tiles[pos] = len(tiles) - 1
+        self.empty_pos = pos
+        return True
+
+    def copy(self):
+        board = PuzzleBoard.__new__(PuzzleBoard)
+        board.size = self.size
+        board.tiles = bytearray(self.tiles)
+        board.empty_pos = self.empty_pos
+        board.correct = self.correct
+        board._neighbors = self._neighbors
+        board._masks = self._masks
+        return board
+
+    def to_list(self):
+        return list(self.tiles)
+
+    def __iter__(self):
+        return iter(self.tiles)
+
+    def __len__(self):
+        return len(self.tiles)
+
+    def __getitem__(self, pos):
+        return self.tiles[pos]
+
+    def __bytes__(self):
+        return bytes(self.tiles)
+
+    def __eq__(self, other):
+        if isinstance(other, PuzzleBoard):
+            return self.tiles == other.tiles
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'PuzzleBoard({self.size}, {self.to_list()})'
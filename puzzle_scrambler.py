@@ -0,0 +1,166 @@
+# Scrambled slide puzzle boards
+#
+# Random walks mostly undo themselves and give no control over difficulty,
+# so boards are drawn directly instead:
+#
+# * 'random' picks uniformly among all solvable boards: shuffle, then fix
+#   the permutation parity by swapping two tiles if needed.
+# * 'easy', 'medium' and 'hard' (3x3 only) pick uniformly among boards at an
+#   exact optimal distance, using the solver's distance table. Larger boards
+#   have no exact table, so these fall back to a non-backtracking random walk
+#   of that many moves (the optimal distance is then at most that).
+#
+# ScramblePool keeps a few boards of each kind ready, refilled by a
+# background thread, so a request just pops one.
+
+import os
+import random
+import threading
+from array import array
+from collections import deque
+
+from puzzle_engine import is_solvable, neighbors
+from puzzle_solver import UNREACHED, get_solver, permutation_unrank
+
+# Optimal distance from solved. Only exact on 3x3; larger boards walk this
+# many moves, and a walk that doubles back ends closer than its length.
+DIFFICULTY_DISTANCES = {
+    'easy': 10,
+    'medium': 18,
+    'hard': 24,
+}
+DIFFICULTIES = ('random',) + tuple(DIFFICULTY_DISTANCES)
+
+_distance_buckets = None
+_buckets_lock = threading.Lock()
+
+
+def random_solvable(size, rng=random):
+    """Uniformly random solvable board that is not already solved"""
+    cells = size * size
+    solved = list(range(cells))
+    while True:
+        grid = solved[:]
+        rng.shuffle(grid)
+        if not is_solvable(grid, size):
+            # Swapping two tiles (not the empty space) flips the parity
+            blank = cells - 1
+            first, second = [i for i, v in enumerate(grid) if v != blank][:2]
+            grid[first], grid[second] = grid[second], grid[first]
+        if grid != solved:
+            return grid
+
+
+def _buckets_3x3():
+    # Ranks of every 3x3 board grouped by optimal distance
+    global _distance_buckets
+    with _buckets_lock:
+        if _distance_buckets is None:
+            table = get_solver(3).distance_table
+            buckets = {}
+            for rank, distance in enumerate(bytes(table)):
+                if distance != UNREACHED:
+                    buckets.setdefault(distance, array('I')).append(rank)
+            _distance_buckets = buckets
+    return _distance_buckets
+
+
+def board_at_distance(distance, rng=random):
+    """Uniformly random 3x3 board exactly `distance` moves from solved"""
+    ranks = _buckets_3x3().get(distance)
+    if not ranks:
+        raise ValueError(f'no 3x3 board is {distance} moves from solved')
+    return permutation_unrank(ranks[rng.randrange(len(ranks))])
+
+
+def random_walk(size, steps, rng=random):
+    """Board reached by `steps` random moves that never undo the previous one
+
+    The board can still end up fewer than `steps` moves from solved.
+    """
+    grid = list(range(size * size))
+    adjacent = neighbors(size)
+    blank = len(grid) - 1
+    previous = -1
+    for _ in range(steps):
+        pos = rng.choice([p for p in adjacent[blank] if p != previous])
+        grid[blank], grid[pos] = grid[pos], grid[blank]
+        previous, blank = blank, pos
+    return grid
+
+
+def scramble(size=3, difficulty='random', rng=random):
+    """Return a new scrambled board
+
+    Named difficulties are exact distances on 3x3 only; see DIFFICULTY_DISTANCES.
+    """
+    if difficulty == 'random':
+        return random_solvable(size, rng)
+    if difficulty not in DIFFICULTY_DISTANCES:
+        raise ValueError(f'unknown difficulty: {difficulty!r}')
+    distance = DIFFICULTY_DISTANCES[difficulty]
+    if size == 3:
+        return board_at_distance(distance, rng)
+    return random_walk(size, distance, rng)
+
+
+class ScramblePool:
+    """Pre-generated boards per difficulty, topped up in the background"""
+
+    def __init__(self, size=3, capacity=256, difficulties=DIFFICULTIES):
+        self.size = size
+        self.capacity = capacity
+        self._pools = {difficulty: deque() for difficulty in difficulties}
+        self._rng = random.Random()
+        self._wanted = threading.Event()
+        self._refiller_pid = None
+        self._refiller_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def pop(self, difficulty='random'):
+        """Take a board from the pool (generated on the spot if it ran dry)"""
+        pool = self._pools.get(difficulty)
+        if pool is None:
+            raise ValueError(f'unknown difficulty: {difficulty!r}')
+        self._ensure_refiller()
+        try:
+            board = pool.popleft()
+            self.hits += 1
+        except IndexError:
+            board = scramble(self.size, difficulty)
+            self.misses += 1
+        if len(pool) < self.capacity // 2:
+            self._wanted.set()
+        return list(board)
+
+    def fill(self):
+        """Top every pool up to capacity"""
+        for difficulty, pool in self._pools.items():
+            while len(pool) < self.capacity:
+                pool.append(bytes(scramble(self.size, difficulty, self._rng)))
+
+    def _ensure_refiller(self):
+        # Started lazily and per process, so forking servers get their own thread
+        if self._refiller_pid == os.getpid():
+            return
+        with self._refiller_lock:
+            if self._refiller_pid == os.getpid():
+                return
+            self._refiller_pid = os.getpid()
+            self._wanted.set()
+            threading.Thread(target=self._refill_loop, name='scramble-pool', daemon=True).start()
+
+    def _refill_loop(self):
+        while True:
+            self._wanted.wait()
+            self._wanted.clear()
+            self.fill()
+
+    def stats(self):
+        """Return pool sizes and hit/miss counters"""
+        return {
+            'available': {difficulty: len(pool) for difficulty, pool in self._pools.items()},
+            'hits': self.hits,
+            'misses': self.misses,
+        }
@@ -0,0 +1,388 @@
+# Optimal move hints for the N x N slide puzzle
+#
+# Boards are flat lists where value v belongs at index v and the largest
+# value (size * size - 1) is the empty space, the same layout app.py and
+# slide_puzzle.py use.
+#
+# * 3x3: every solvable state's exact distance is precomputed by a
+#   breadth-first search from the solved board and stored one byte per
+#   permutation rank (362880 bytes). A hint is four table lookups.
+# * 4x4 and 5x5: IDA* guided by additive pattern databases. The tiles are
+#   split into small groups; each group's table holds the fewest moves of
+#   that group's tiles needed to bring them home, found by a search over the
+#   group's tiles and the empty space that only counts the group's moves, so
+#   the tables can be summed and still never overestimate.
+# * Larger boards: IDA* with plain Manhattan distance.
+#
+# Tables are built on first use, saved under puzzle_data/ and memory-mapped
+# afterwards. IDA* runs under a node budget so a hint on a hard board comes
+# back in bounded time (about 0.3 s on 4x4); if the budget runs out the hint
+# falls back to the move with the best heuristic and is flagged as not
+# exact, with a distance that is only a lower bound. On 4x4 that happens
+# for about half of fully random boards; boards within about 40 moves of
+# solved, which is where players ask for help, get exact hints.
+
+import argparse
+import mmap
+import os
+import time
+from collections import namedtuple
+
+from puzzle_engine import MAX_SIZE, MIN_SIZE, is_solvable, neighbors
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'puzzle_data')
+TABLE_VERSION = 2
+UNREACHED = 255
+
+# Pattern database groups by board size: an explicit partition, or a group
+# size for consecutive tiles. Sizes not listed fall back to single-tile
+# groups, i.e. Manhattan distance. 4x4 uses a 5-5-5 split (top left, right
+# and bottom blocks); its three 1 MB tables take about half a minute to
+# build, where six-tile groups would need a search over 268 MB of states.
+PDB_PARTITIONS = {4: ((0, 1, 2, 4, 5), (3, 6, 7, 10, 11), (8, 9, 12, 13, 14))}
+PDB_GROUP_SIZES = {5: 3}
+
+# IDA* node budget per hint
+MAX_NODES = 200000
+
+Hint = namedtuple('Hint', 'tile_pos distance exact')
+
+_FACTORIALS = [1]
+for _i in range(1, 10):
+    _FACTORIALS.append(_FACTORIALS[-1] * _i)
+
+def permutation_rank(grid):
+    """Lehmer-code rank of a 3x3 board, 0..9!-1"""
+    rank = 0
+    n = len(grid)
+    for i in range(n - 1):
+        v = grid[i]
+        smaller = 0
+        for j in range(i + 1, n):
+            if grid[j] < v:
+                smaller += 1
+        rank += smaller * _FACTORIALS[n - 1 - i]
+    return rank
+
+
+def permutation_unrank(rank, n=9):
+    """Inverse of permutation_rank"""
+    remaining = list(range(n))
+    grid = []
+    for i in range(n - 1, -1, -1):
+        index, rank = divmod(rank, _FACTORIALS[i])
+        grid.append(remaining.pop(index))
+    return grid
+
+
+def _table_path(name, data_dir):
+    return os.path.join(data_dir, f'{name}.v{TABLE_VERSION}.bin')
+
+
+def _save_table(path, table):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(table)
+    os.replace(tmp, path)
+
+
+def _map_table(path):
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _load_or_build(name, expected_size, build, data_dir):
+    path = _table_path(name, data_dir)
+    if not os.path.exists(path) or os.path.getsize(path) != expected_size:
+        _save_table(path, build())
+    return _map_table(path)
+
+
+def build_distance_table_3x3():
+    """Breadth-first search from the solved 3x3 board over all reachable states"""
+    table = bytearray([UNREACHED]) * _FACTORIALS[9]
+    adjacent = neighbors(3)
+    goal = tuple(range(9))
+    table[permutation_rank(goal)] = 0
+    frontier = [(goal, 8)]
+    depth = 0
+    while frontier:
+        depth += 1
+        next_frontier = []
+        for state, blank in frontier:
+            for pos in adjacent[blank]:
+                child = list(state)
+                child[blank], child[pos] = child[pos], child[blank]
+                rank = permutation_rank(child)
+                if table[rank] == UNREACHED:
+                    table[rank] = depth
+                    next_frontier.append((tuple(child), pos))
+        frontier = next_frontier
+    return table
+
+
+def pattern_groups(size):
+    """Split the tiles of a board into pattern database groups"""
+    if size in PDB_PARTITIONS:
+        return [tuple(tiles) for tiles in PDB_PARTITIONS[size]]
+    group_size = PDB_GROUP_SIZES.get(size, 1)
+    tiles = list(range(size * size - 1))
+    return [tuple(tiles[i:i + group_size]) for i in range(0, len(tiles), group_size)]
+
+
+def build_pattern_db(size, tiles):
+    """Fewest moves of the given tiles needed to bring them home
+
+    The search tracks the pattern tiles and the empty space: the empty space
+    wanders for free through the cells the pattern does not hold (those
+    moves belong to other groups), and each slide of a pattern tile into it
+    costs one move. Every real move moves exactly one tile, so tables of
+    disjoint groups can be added together and still never overestimate.
+    The table keeps the best case over where the empty space is, indexed by
+    the pattern tiles' cells alone.
+    """
+    cells = size * size
+    adjacent = neighbors(size)
+    count = len(tiles)
+    multipliers = [cells ** i for i in range(count)]
+    # Per group slot and cell: (target cell bit, index change) of each step
+    steps = [[[(1 << target, (target - pos) * m) for target in adjacent[pos]] for pos in range(cells)]
+             for m in multipliers]
+    # Masks for growing a set of cells one step left / right without wrapping rows
+    full = (1 << cells) - 1
+    not_first_column = sum(1 << pos for pos in range(cells) if pos % size)
+    not_last_column = sum(1 << pos for pos in range(cells) if pos % size != size - 1)
+
+    table = bytearray([UNREACHED]) * (cells ** count)
+    expanded = bytearray(cells ** (count + 1))  # per (pattern index, empty cell)
+    start = sum(tile * m for tile, m in zip(tiles, multipliers))  # every tile on its home cell
+    frontier = [start * cells + cells - 1]
+    depth = 0
+    while frontier:
+        next_frontier = []
+        append = next_frontier.append
+        for state in frontier:
+            if expanded[state]:
+                continue
+            index, blank = divmod(state, cells)
+            # States are plain indexes; unpack the cells and an occupancy mask
+            rest = index
+            occupied = 0
+            positions = []
+            for _ in range(count):
+                rest, pos = divmod(rest, cells)
+                occupied |= 1 << pos
+                positions.append(pos)
+
+            # Every cell the empty space reaches without moving a pattern tile
+            free = full & ~occupied
+            region = 1 << blank
+            while True:
+                grown = (region | region << 1 & not_first_column | region >> 1 & not_last_column |
+                         region << size | region >> size) & free
+                if grown == region:
+                    break
+                region = grown
+            base = index * cells
+            rest = region
+            while rest:
+                low = rest & -rest
+                expanded[base + low.bit_length() - 1] = 1
+                rest ^= low
+            if table[index] == UNREACHED:
+                table[index] = depth
+
+            # Slide a pattern tile into the empty space; it is left where the tile was
+            for pos, slot_steps in zip(positions, steps):
+                for bit, change in slot_steps[pos]:
+                    if region & bit:
+                        child = (index + change) * cells + pos
+                        if not expanded[child]:
+                            append(child)
+        frontier = next_frontier
+        depth += 1
+    return table
+
+
+def _manhattan_table(size, tile):
+    goal_row, goal_col = divmod(tile, size)
+    return bytes(abs(pos // size - goal_row) + abs(pos % size - goal_col) for pos in range(size * size))
+
+
+class _BudgetExceeded(Exception):
+    pass
+
+
+class PuzzleSolver:
+    """Distance and next-move oracle for one board size"""
+
+    def __init__(self, size=3, data_dir=DATA_DIR, max_nodes=MAX_NODES):
+        if not MIN_SIZE <= size <= MAX_SIZE:
+            raise ValueError(f'puzzle size must be between {MIN_SIZE} and {MAX_SIZE}')
+        self.size = size
+        self.max_nodes = max_nodes
+        self.neighbors = neighbors(size)
+        self.distance_table = None
+        self.groups = []
+        self.pattern_dbs = []
+
+        if size == 3:
+            self.distance_table = _load_or_build('distance_3x3', _FACTORIALS[9], build_distance_table_3x3, data_dir)
+            return
+
+        cells = size * size
+        self.groups = pattern_groups(size)
+        for number, tiles in enumerate(self.groups):
+            if len(tiles) == 1:
+                self.pattern_dbs.append(_manhattan_table(size, tiles[0]))
+            else:
+                name = f'pdb_{size}x{size}_{"-".join(map(str, tiles))}'
+                self.pattern_dbs.append(_load_or_build(
+                    name, cells ** len(tiles), lambda tiles=tiles: build_pattern_db(size, tiles), data_dir))
+
+        # Per tile: (group number, index multiplier within that group)
+        self._tile_group = [None] * cells
+        for number, tiles in enumerate(self.groups):
+            for i, tile in enumerate(tiles):
+                self._tile_group[tile] = (number, cells ** i)
+
+    # -- distance ----------------------------------------------------------
+
+    def _group_indexes(self, positions):
+        cells = self.size * self.size
+        return [sum(positions[tile] * cells ** i for i, tile in enumerate(tiles)) for tiles in self.groups]
+
+    def heuristic(self, grid):
+        """Admissible lower bound on the distance to the solved board"""
+        if self.distance_table is not None:
+            return self.distance_table[permutation_rank(grid)]
+        positions = [0] * len(grid)
+        for pos, tile in enumerate(grid):
+            positions[tile] = pos
+        return sum(db[index] for db, index in zip(self.pattern_dbs, self._group_indexes(positions)))
+
+    def distance(self, grid):
+        """Return (moves to solve, exact) for a board"""
+        hint = self.hint(grid)
+        return (0, True) if hint is None else (hint.distance, hint.exact)
+
+    # -- hints -------------------------------------------------------------
+
+    def hint(self, grid):
+        """Return the best next move for a board, or None if it is already solved"""
+        grid = list(grid)
+        blank_tile = len(grid) - 1
+        blank = grid.index(blank_tile)
+        if grid == list(range(len(grid))):
+            return None
+        if not is_solvable(grid, self.size):
+            raise ValueError('board is not solvable')
+
+        if self.distance_table is not None:
+            return self._table_hint(grid, blank)
+        try:
+            return self._ida_star_hint(grid, blank)
+        except _BudgetExceeded:
+            return self._greedy_hint(grid, blank)
+
+    def _table_hint(self, grid, blank):
+        best = None
+        for pos in self.neighbors[blank]:
+            grid[blank], grid[pos] = grid[pos], grid[blank]
+            distance = self.distance_table[permutation_rank(grid)]
+            grid[blank], grid[pos] = grid[pos], grid[blank]
+            if best is None or distance < best[1]:
+                best = (pos, distance)
+        return Hint(best[0], best[1] + 1, True)
+
+    def _greedy_hint(self, grid, blank):
+        best = None
+        for pos in self.neighbors[blank]:
+            grid[blank], grid[pos] = grid[pos], grid[blank]
+            estimate = self.heuristic(grid)
+            grid[blank], grid[pos] = grid[pos], grid[blank]
+            if best is None or estimate < best[1]:
+                best = (pos, estimate)
+        return Hint(best[0], best[1] + 1, False)
+
+    def _ida_star_hint(self, grid, blank):
+        positions = [0] * len(grid)
+        for pos, tile in enumerate(grid):
+            positions[tile] = pos
+        group_indexes = self._group_indexes(positions)
+        pattern_dbs = self.pattern_dbs
+        tile_group = self._tile_group
+        adjacent = self.neighbors
+        h = sum(db[index] for db, index in zip(pattern_dbs, group_indexes))
+        path = []
+        nodes = 0
+        found = -1
+
+        def search(blank, g, bound, previous, h):
+            nonlocal nodes
+            f = g + h
+            if f > bound:
+                return f
+            if h == 0:
+                return found
+            nodes += 1
+            if nodes > self.max_nodes:
+                raise _BudgetExceeded()
+
+            smallest = None
+            for pos in adjacent[blank]:
+                if pos == previous:
+                    continue
+                tile = grid[pos]
+                group, multiplier = tile_group[tile]
+                db = pattern_dbs[group]
+                old_index = group_indexes[group]
+                new_index = old_index + (blank - pos) * multiplier
+                child_h = h - db[old_index] + db[new_index]
+
+                grid[blank], grid[pos] = tile, grid[blank]
+                group_indexes[group] = new_index
+                path.append(pos)
+                result = search(pos, g + 1, bound, blank, child_h)
+                if result == found:
+                    return found
+                path.pop()
+                group_indexes[group] = old_index
+                grid[pos], grid[blank] = tile, grid[pos]
+
+                if smallest is None or result < smallest:
+                    smallest = result
+            return smallest
+
+        bound = h
+        while True:
+            result = search(blank, 0, bound, -1, h)
+            if result == found:
+                return Hint(path[0], len(path), True)
+            bound = result
+
+
+_solvers = {}
+
+
+def get_solver(size=3):
+    """Return a shared solver for a board size, loading its tables once"""
+    solver = _solvers.get(size)
+    if solver is None:
+        solver = _solvers[size] = PuzzleSolver(size)
+    return solver
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build slide puzzle solver tables ahead of time.')
+    parser.add_argument('sizes', nargs='*', type=int, default=[3, 4], help='board sizes to build (default: 3 4)')
+    args = parser.parse_args()
+    for size in args.sizes:
+        start = time.perf_counter()
+        PuzzleSolver(size)
+        print(f'{size}x{size}: ready in {time.perf_counter() - start:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+# Reduced-resolution rendering for slow machines
+#
+# The games keep all of their logic (the simulation, mouse input, hit tests)
+# in window coordinates. A SceneRenderer gives them a surface to draw on that
+# is `scale` times the window size, with helpers that map window coordinates
+# and lengths onto it, and present() scales the finished scene up into the
+# window in one pass. At scale 1 the window surface itself is the scene and
+# nothing extra is copied.
+#
+# With scale "auto" the renderer starts at full resolution, steps down
+# through SCALES while the measured frame time stays over budget and steps
+# back up once the larger scale is expected to fit comfortably again.
+
+import argparse
+import math
+from collections import deque
+
+import pygame
+
+SCALES = (1.0, 0.75, 0.5)
+SAMPLE_FRAMES = 60
+SLOW = 0.9  # step down when frames use more than this share of the budget
+FAST = 0.6  # step up when the larger scale should use less than this share
+
+
+def parse_scale(text):
+    """argparse type for --render-scale: a fraction in (0, 1] or "auto" """
+    if text == 'auto':
+        return text
+    try:
+        scale = float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid render scale: {text!r}')
+    if not 0 < scale <= 1:
+        raise argparse.ArgumentTypeError('render scale must be in (0, 1] or "auto"')
+    return scale
+
+
+class SceneRenderer:
+    """Off-screen draw target at a fraction of the window resolution"""
+
+    def __init__(self, window, scale=1.0, fps=60):
+        self.window = window
+        self.auto = scale == 'auto'
+        self.budget = 1.0 / fps
+        self.samples = deque(maxlen=SAMPLE_FRAMES)
+        self.profiler = None  # a FrameProfiler timing the draw and present phases
+        self.set_scale(1.0 if self.auto else scale)
+
+    def set_scale(self, scale):
+        self.scale = scale
+        width, height = self.window.get_size()
+        self.size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        if self.size == (width, height):
+            self.surface = self.window
+        else:
+            self.surface = pygame.Surface(self.size).convert()
+        # Every `scene` pixels along an axis stretch onto exactly `window`
+        # pixels (1 and 2 at scale 0.5, 3 and 4 at 0.75), so a rect snapped
+        # to that grid scales onto the same window pixels a full-window
+        # scale would give, and present() can scale just the rects that changed
+        self._periods = [(scene // math.gcd(scene, window), window // math.gcd(scene, window))
+                         for scene, window in zip(self.size, (width, height))]
+        self.samples.clear()
+
+    # -- window to scene coordinates ----------------------------------------
+
+    def px(self, length):
+        """Scene pixels for a length in window pixels"""
+        return round(length * self.scale)
+
+    def point(self, x, y):
+        return round(x * self.scale), round(y * self.scale)
+
+    def rect(self, x, y=None, width=None, height=None):
+        """Scene rect for a window rect (a Rect or x, y, width, height)"""
+        if y is None:
+            x, y, width, height = x
+        # Scale the edges rather than the size so neighbouring rects still meet
+        left, top = self.point(x, y)
+        right, bottom = self.point(x + width, y + height)
+        return pygame.Rect(left, top, right - left, bottom - top)
+
+    # -- presenting ---------------------------------------------------------
+
+    def present(self, rects=None):
+        """Show the scene; rects (in scene pixels) limit the update to those areas"""
+        if self.profiler is not None:
+            self.profiler.mark('draw')
+            self._present(rects)
+            self.profiler.mark('present')
+        else:
+            self._present(rects)
+
+    def _present(self, rects):
+        if self.surface is self.window:
+            if rects is None:
+                pygame.display.flip()
+            else:
+                pygame.display.update(rects)
+            return
+
+        if rects is None:
+            pygame.transform.scale(self.surface, self.window.get_size(), self.window)
+            pygame.display.flip()
+            return
+
+        (scene_x, window_x), (scene_y, window_y) = self._periods
+        bounds = self.surface.get_rect()
+        updated = []
+        for rect in rects:
+            rect = pygame.Rect(rect).clip(bounds)
+            if not rect:
+                continue
+            left, top = rect.x // scene_x, rect.y // scene_y
+            right, bottom = -(-rect.right // scene_x), -(-rect.bottom // scene_y)
+            source = pygame.Rect(left * scene_x, top * scene_y, (right - left) * scene_x, (bottom - top) * scene_y)
+            target = pygame.Rect(left * window_x, top * window_y, (right - left) * window_x, (bottom - top) * window_y)
+            pygame.transform.scale(self.surface.subsurface(source), target.size, self.window.subsurface(target))
+            updated.append(target)
+        pygame.display.update(updated)
+
+    def record(self, seconds):
+        """Add one frame's work time; returns True if auto mode changed the scale"""
+        if not self.auto:
+            return False
+        self.samples.append(seconds)
+        if len(self.samples) < SAMPLE_FRAMES:
+            return False
+
+        average = sum(self.samples) / len(self.samples)
+        index = SCALES.index(self.scale) if self.scale in SCALES else 0
+        if average > SLOW * self.budget and index + 1 < len(SCALES):
+            self.set_scale(SCALES[index + 1])
+            return True
+        if index > 0:
+            larger = SCALES[index - 1]
+            # Drawing cost grows roughly with the number of pixels
+            if average * (larger / self.scale) ** 2 < FAST * self.budget:
+                self.set_scale(larger)
+                return True
+        self.samples.clear()
+        return False
@@ -0,0 +1,199 @@
+# Catch game input replays and their server-side verification
+#
+# The browser plays the catch game on the same fixed tick, rules and PRNG
+# as catch_sim (WEB_RULES, Mulberry32 seeded by the server at start_game)
+# and records the mouse x it used on every tick. Because the simulation is
+# deterministic, that recording is enough for the server to replay the whole
+# round and see whether it really was won.
+#
+# A replay is packed as a small struct header followed by one varint per
+# tick holding the zigzag-encoded change in mouse x since the previous tick:
+#
+#     <BIH   version, seed, tick count
+#     ...    zigzag varints
+#
+# The mouse mostly rests or moves a few pixels per tick, so most ticks take
+# one byte and a full two-minute round is well under 8 KB.
+#
+# Verification runs in a process pool so a burst of finished games cannot
+# tie up the web workers' threads (or the GIL), and a bounded number of
+# replays may be queued at once; callers past that get VerifierBusy.
+
+import base64
+import multiprocessing
+import os
+import struct
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from catch_sim import WEB_RULES, CatchSimulation, Mulberry32
+
+REPLAY_VERSION = 1
+HEADER = struct.Struct('<BIH')
+MAX_REPLAY_BYTES = 64 * 1024
+
+ReplayResult = namedtuple('ReplayResult', 'won score items_caught items_missed ticks')
+
+
+class InvalidReplay(Exception):
+    """Raised when a replay is malformed or does not belong to the session"""
+
+
+class VerifierBusy(Exception):
+    """Raised when too many replays are already waiting to be verified"""
+
+
+def _zigzag(value):
+    return (value << 1) if value >= 0 else ((-value << 1) - 1)
+
+
+def _unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def encode_replay(seed, positions):
+    """Pack a seed and per-tick mouse x positions into replay bytes"""
+    out = bytearray(HEADER.pack(REPLAY_VERSION, seed, len(positions)))
+    previous = 0
+    for x in positions:
+        value = _zigzag(x - previous)
+        previous = x
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+    return bytes(out)
+
+
+def decode_replay(data):
+    """Return (seed, positions) from replay bytes"""
+    if len(data) < HEADER.size or len(data) > MAX_REPLAY_BYTES:
+        raise InvalidReplay('bad replay size')
+    version, seed, ticks = HEADER.unpack_from(data)
+    if version != REPLAY_VERSION:
+        raise InvalidReplay('unsupported replay version')
+
+    positions = []
+    append = positions.append
+    x = value = shift = 0
+    for byte in data[HEADER.size:]:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            if shift > 28:
+                raise InvalidReplay('bad varint')
+            continue
+        x += _unzigzag(value)
+        append(x)
+        value = shift = 0
+    if shift or len(positions) != ticks:
+        raise InvalidReplay('truncated replay')
+    return seed, positions
+
+
+def verify_replay(data, seed, rules=WEB_RULES):
+    """Re-simulate a replay and return its ReplayResult
+
+    Raises InvalidReplay if the replay is malformed or was recorded with a
+    different seed. The round is only reported as won if the simulation
+    ends in a win on exactly the last recorded tick.
+    """
+    replay_seed, positions = decode_replay(data)
+    if replay_seed != seed:
+        raise InvalidReplay('replay seed does not match the session')
+
+    sim = CatchSimulation(rules, seed, rng=Mulberry32(seed))
+    step = sim.step
+    for x in positions:
+        if sim.finished:
+            break
+        step(x)
+    won = sim.won and sim.tick == len(positions)
+    return ReplayResult(won, sim.score, sim.items_caught, sim.items_missed, sim.tick)
+
+
+def _mp_context():
+    # Forking a threaded web worker can copy held locks into the child
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+class ReplayVerifier:
+    """Bounded front end to a process pool that verifies replays"""
+
+    def __init__(self, workers=2, max_pending=64, timeout=5.0):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._executor_pid = None
+        self._executor_lock = threading.Lock()
+        self.verified = 0
+        self.rejected = 0
+        self.busy = 0
+
+    def _pool(self):
+        # Created lazily and per process, so forking servers get their own pool
+        if self._executor_pid != os.getpid():
+            with self._executor_lock:
+                if self._executor_pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(self.workers, mp_context=_mp_context())
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def verify(self, replay, seed):
+        """Verify a base64 replay against a session seed and return its ReplayResult"""
+        if not isinstance(replay, str):
+            raise InvalidReplay('missing replay')
+        try:
+            data = base64.b64decode(replay, validate=True)
+        except ValueError:
+            raise InvalidReplay('malformed replay')
+
+        if not self._slots.acquire(blocking=False):
+            self.busy += 1
+            raise VerifierBusy()
+        try:
+            if self.workers <= 0:
+                result = verify_replay(data, seed)
+            else:
+                try:
+                    result = self._pool().submit(verify_replay, data, seed).result(self.timeout)
+                except TimeoutError:
+                    self.busy += 1
+                    raise VerifierBusy()
+                except BrokenProcessPool:
+                    # A worker died; start a fresh pool for the next request
+                    self.close()
+                    self.busy += 1
+                    raise VerifierBusy()
+        except InvalidReplay:
+            self.rejected += 1
+            raise
+        finally:
+            self._slots.release()
+
+        if result.won:
+            self.verified += 1
+        else:
+            self.rejected += 1
+        return result
+
+    def close(self):
+        with self._executor_lock:
+            if self._executor is not None and self._executor_pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._executor_pid = None
+
+    def stats(self):
+        """Return verification counters"""
+        return {
+            'workers': self.workers,
+            'verified': self.verified,
+            'rejected': self.rejected,
+            'busy': self.busy,
+        }
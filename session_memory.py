@@ -0,0 +1,280 @@
+# Memory accounting for the API's session state
+#
+# Sizing a server for an event needs the cost of one entry in
+# game_sessions. Two estimates are offered:
+#
+# * deep_size() walks a session's __slots__ and everything they reference
+#   and adds up sys.getsizeof, counting only what the session owns: the
+#   answer strings are constants every session shares, and a PuzzleBoard's
+#   neighbour and adjacency tables are built once per board size.
+# * tracemalloc measures what creating sessions really allocates,
+#   including the store's dict entry and the session ID string.
+#
+# The API serves memory_report() and allocation diffs on /admin/memory (see
+# app.py). Run as a script, this fills a fresh in-memory store with N
+# synthetic sessions and projects the memory needed at a target number of
+# players, or with --url fetches the report from a running server:
+#
+#     python session_memory.py --sessions 20000 --target 10000 --target 50000
+#     python session_memory.py --url http://localhost:5000 --token $ADMIN_TOKEN --snapshot
+
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+import urllib.request
+
+from puzzle_engine import PuzzleBoard, adjacency_masks, neighbors
+from puzzle_scrambler import scramble
+from session_store import SessionStore
+
+SAMPLE_SIZE = 200
+TOP_SITES = 10
+DEFAULT_TARGETS = (10000,)
+
+
+def _is_shared(obj):
+    # Singletons, cached small ints and strings (sessions only hold
+    # constants and '') cost nothing per session
+    return (obj is None or isinstance(obj, (bool, str, type))
+            or (type(obj) is int and -5 <= obj <= 256))
+
+
+def deep_size(obj, seen=None):
+    """Bytes held by obj and everything it references that it does not share"""
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or _is_shared(item):
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+
+        if isinstance(item, PuzzleBoard):
+            for table in (neighbors(item.size), adjacency_masks(item.size)):
+                seen.add(id(table))
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        for cls in type(item).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                if hasattr(item, name):
+                    stack.append(getattr(item, name))
+        if hasattr(item, '__dict__'):
+            stack.append(item.__dict__)
+    return total
+
+
+def synthesize(store, count, puzzle_share=0.5, rng=random):
+    """Create count sessions in store that look like players mid-event
+
+    The first puzzle_share of them have won the catch game and started the
+    puzzle, so they also hold a board. Returns the session IDs to use.
+    """
+    puzzles = int(count * puzzle_share)
+    now = time.time()
+    session_ids = []
+    for i in range(count):
+        session_id = store.create()
+        with store.locked(session_id) as session:
+            session.score = rng.randrange(150)
+            session.items_caught = rng.randrange(39)
+            session.items_missed = rng.randrange(3)
+            session.event_seq = rng.randrange(40)
+            if i < puzzles:
+                session.game_over = True
+                session.won = True
+                session.end_time = now
+                session.duration = rng.uniform(60, 120)
+                session.first_answer_part = "aCM_iS_"
+                session.puzzle_start_time = now
+                session.puzzle_moves = rng.randrange(60)
+                session.puzzle_state = PuzzleBoard(3, scramble(3, rng=rng))
+            session_ids.append(store.issue(session_id, session))
+    return session_ids
+
+
+def size_summary(sessions):
+    """Mean, min and max deep_size of sessions"""
+    sizes = [deep_size(session) for session in sessions]
+    if not sizes:
+        return {'mean': 0, 'min': 0, 'max': 0}
+    return {'mean': round(sum(sizes) / len(sizes)), 'min': min(sizes), 'max': max(sizes)}
+
+
+def _site(stat):
+    frame = stat.traceback[0]
+    return {
+        'site': f'{frame.filename}:{frame.lineno}',
+        'size_diff': stat.size_diff,
+        'count_diff': stat.count_diff,
+        'size': stat.size,
+        'count': stat.count,
+    }
+
+
+def _snapshot():
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    ))
+
+
+class AllocationTracker:
+    """tracemalloc snapshots, each diffed against the one before it"""
+
+    def __init__(self, frames=1):
+        self.frames = frames
+        self._baseline = None
+
+    @property
+    def tracing(self):
+        return tracemalloc.is_tracing()
+
+    def diff(self, top=TOP_SITES):
+        """Snapshot and return the allocation sites that grew most since the last call
+
+        Starts tracing on first use; that call only takes the baseline and
+        returns an empty list.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._baseline = None
+        snapshot = _snapshot()
+        baseline, self._baseline = self._baseline, snapshot
+        if baseline is None:
+            return []
+        return [_site(stat) for stat in snapshot.compare_to(baseline, 'lineno')[:top]]
+
+    def stop(self):
+        tracemalloc.stop()
+        self._baseline = None
+
+    def stats(self):
+        """Return whether tracing is on and the traced memory in bytes"""
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        return {'tracing': tracemalloc.is_tracing(), 'traced_bytes': current, 'peak_bytes': peak}
+
+
+# The tracker the API's admin endpoints share
+allocations = AllocationTracker()
+
+
+def memory_report(store, sample=SAMPLE_SIZE, targets=DEFAULT_TARGETS):
+    """Live session count, sampled deep sizes and a projection for each target"""
+    sessions = store.sample(sample)
+    sizes = size_summary(sessions)
+    return {
+        'backend': type(store).__name__,
+        'sessions': len(store),
+        'sampled': len(sessions),
+        'session_bytes': sizes,
+        'projected_bytes': {str(target): sizes['mean'] * target for target in targets},
+        'tracemalloc': allocations.stats(),
+    }
+
+
+def measure(count, puzzle_share=0.5, targets=DEFAULT_TARGETS, top=TOP_SITES, seed=0):
+    """Synthesize count sessions in a fresh store under tracemalloc and report their cost"""
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        # Capacity is per stripe, so leave room for an uneven spread of IDs
+        store = SessionStore(max_sessions=2 * count, reap_interval=0)
+        before = _snapshot()
+        traced_before = tracemalloc.get_traced_memory()[0]
+        synthesize(store, count, puzzle_share, random.Random(seed))
+        traced = tracemalloc.get_traced_memory()[0] - traced_before
+        sites = _snapshot().compare_to(before, 'lineno')[:top]
+    finally:
+        if started:
+            tracemalloc.stop()
+
+    sizes = size_summary(store.sample(count))
+    per_session = traced / count if count else 0
+    return {
+        'sessions': len(store),
+        'puzzle_share': puzzle_share,
+        'session_bytes': sizes,
+        'traced_bytes_per_session': round(per_session),
+        'projected_bytes': {str(target): round(per_session * target) for target in targets},
+        'top_sites': [_site(stat) for stat in sites],
+    }
+
+
+def fetch(url, token, snapshot=False, top=TOP_SITES):
+    """Fetch the memory report (or an allocation diff) from a running server"""
+    base = url.rstrip('/') + '/admin/memory'
+    if snapshot:
+        request = urllib.request.Request(f'{base}/snapshot?top={top}', data=b'', method='POST')
+    else:
+        request = urllib.request.Request(base)
+    request.add_header('X-Admin-Token', token or '')
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)
+
+
+def _mb(value):
+    return f'{value / 1e6:.1f} MB'
+
+
+def _print_sites(sites):
+    for site in sites:
+        print(f'    {site["size_diff"]:>+12,} B  {site["count_diff"]:>+9,}  {site["site"]}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure and project the memory used by API sessions.')
+    parser.add_argument('--sessions', type=int, default=10000, help='synthetic sessions to create (default: 10000)')
+    parser.add_argument('--puzzle-share', type=float, default=0.5,
+                        help='share of sessions that have started the puzzle (default: 0.5)')
+    parser.add_argument('--target', type=int, action='append',
+                        help='player count to project memory for (repeatable; default: 10000)')
+    parser.add_argument('--top', type=int, default=TOP_SITES, help=f'allocation sites to list (default: {TOP_SITES})')
+    parser.add_argument('--url', help='report on a running server instead, e.g. http://localhost:5000')
+    parser.add_argument('--token', help='the server\'s ADMIN_TOKEN (with --url)')
+    parser.add_argument('--snapshot', action='store_true',
+                        help='with --url, take a tracemalloc snapshot and diff it against the previous one')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+    targets = tuple(args.target or DEFAULT_TARGETS)
+
+    if args.url:
+        report = fetch(args.url, args.token, args.snapshot, args.top)
+    else:
+        report = measure(args.sessions, args.puzzle_share, targets, args.top)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    if args.url and args.snapshot:
+        if not report['sites']:
+            print('Tracing started; snapshot again later to see what grew.')
+        _print_sites(report['sites'])
+        return
+
+    sizes = report['session_bytes']
+    if args.url:
+        print(f'{report["sessions"]} live sessions ({report["backend"]}), {report["sampled"]} sampled')
+    else:
+        print(f'{report["sessions"]} synthetic sessions, {report["puzzle_share"]:.0%} in the puzzle')
+    print(f'  deep size:  mean {sizes["mean"]} B  min {sizes["min"]} B  max {sizes["max"]} B')
+    if 'traced_bytes_per_session' in report:
+        print(f'  allocated:  {report["traced_bytes_per_session"]} B per session, including the store entry')
+    for target, value in report['projected_bytes'].items():
+        print(f'  {int(target):>8,} players: {_mb(value)}')
+    if report.get('top_sites'):
+        print('  top allocation sites:')
+        _print_sites(report['top_sites'])
+
+
+if __name__ == '__main__':
+    main()
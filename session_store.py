@@ -0,0 +1,238 @@
+# Session storage for the Flask API
+#
+# Sessions live in a fixed number of "stripes". Each stripe has its own lock
+# and its own LRU-ordered dict, so requests for different players rarely
+# contend and a route can hold a session's lock for its whole
+# read-modify-write without blocking everybody else.
+
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import islice
+
+
+class SessionConflict(Exception):
+    """Raised when a session changed elsewhere while a request was updating it"""
+
+
+class GameSession:
+    """State for one player, kept compact with __slots__"""
+
+    __slots__ = (
+        'score', 'items_caught', 'items_missed',
+        'start_time', 'end_time', 'duration',
+        'game_over', 'won', 'missed_final_item', 'first_answer_part',
+        'puzzle_moves', 'puzzle_completed', 'puzzle_start_time', 'puzzle_end_time',
+        'puzzle_state', 'second_answer_part', 'full_answer',
+        'event_seq', 'replay_seed', 'last_access',
+    )
+
+    def __init__(self, now=None):
+        now = time.time() if now is None else now
+        self.score = 0
+        self.items_caught = 0
+        self.items_missed = 0
+        self.start_time = now
+        self.end_time = None
+        self.duration = None
+        self.game_over = False
+        self.won = False
+        self.missed_final_item = False
+        self.first_answer_part = ''
+        self.puzzle_moves = 0
+        self.puzzle_completed = False
+        self.puzzle_start_time = None
+        self.puzzle_end_time = None
+        self.puzzle_state = None  # PuzzleBoard once the puzzle has started
+        self.second_answer_part = ''
+        self.full_answer = ''
+        self.event_seq = 0  # highest client event sequence applied
+        self.replay_seed = secrets.randbits(32)  # seeds the client's item spawner
+        self.last_access = now
+
+    def to_dict(self):
+        """Return the session as a plain dict (for debugging and export)"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class _Stripe:
+    __slots__ = ('lock', 'sessions', 'hits', 'misses', 'expired', 'evicted')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = OrderedDict()  # oldest access first
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+
+class SessionStore:
+    """In-process session store with idle-TTL and max-size eviction"""
+
+    def __init__(self, ttl=3600, max_sessions=20000, stripes=64, reap_interval=30):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.reap_interval = reap_interval
+        self._stripes = [_Stripe() for _ in range(stripes)]
+        # Capacity is enforced per stripe so eviction never needs a global lock
+        self._stripe_capacity = max(1, -(-max_sessions // stripes))
+        self._reaper = None
+        self._reaper_pid = None
+        self._reaper_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _stripe_for(self, session_id):
+        return self._stripes[hash(session_id) % len(self._stripes)]
+
+    def new_session_id(self):
+        """Mint an unguessable, collision-free session ID"""
+        return secrets.token_urlsafe(12)
+
+    def create(self):
+        """Create a new session and return its ID"""
+        self._ensure_reaper()
+        session_id = self.new_session_id()
+        now = time.time()
+        stripe = self._stripe_for(session_id)
+        with stripe.lock:
+            stripe.sessions[session_id] = GameSession(now)
+            while len(stripe.sessions) > self._stripe_capacity:
+                stripe.sessions.popitem(last=False)
+                stripe.evicted += 1
+        return session_id
+
+    def issue(self, session_id, session):
+        """Return the session ID the client should send next time"""
+        return session_id
+
+    def set_counters(self, session, **values):
+        """Set counters of the session being updated to absolute values"""
+        for name, value in values.items():
+            setattr(session, name, value)
+
+    @contextmanager
+    def locked(self, session_id):
+        """Yield the session for session_id with its stripe lock held
+
+        Yields None if the session does not exist or has expired.
+        """
+        if not isinstance(session_id, str):
+            yield None
+            return
+
+        stripe = self._stripe_for(session_id)
+        with stripe.lock:
+            session = stripe.sessions.get(session_id)
+            now = time.time()
+            if session is not None and now - session.last_access > self.ttl:
+                del stripe.sessions[session_id]
+                stripe.expired += 1
+                session = None
+
+            if session is None:
+                stripe.misses += 1
+                yield None
+                return
+
+            stripe.hits += 1
+            session.last_access = now
+            stripe.sessions.move_to_end(session_id)
+            yield session
+
+    def reap(self, now=None):
+        """Drop every session idle for longer than the TTL, return the count"""
+        now = time.time() if now is None else now
+        cutoff = now - self.ttl
+        reaped = 0
+        for stripe in self._stripes:
+            with stripe.lock:
+                sessions = stripe.sessions
+                # Sessions are kept in access order, so stop at the first live one
+                while sessions:
+                    session_id, session = next(iter(sessions.items()))
+                    if session.last_access > cutoff:
+                        break
+                    del sessions[session_id]
+                    stripe.expired += 1
+                    reaped += 1
+        return reaped
+
+    def _ensure_reaper(self):
+        # Started lazily and per process, so forking servers get their own thread
+        if self._reaper_pid == os.getpid() or not self.reap_interval:
+            return
+        with self._reaper_lock:
+            if self._reaper_pid == os.getpid():
+                return
+            self._reaper = threading.Thread(target=self._reap_loop, name='session-reaper', daemon=True)
+            self._reaper_pid = os.getpid()
+            self._reaper.start()
+
+    def _reap_loop(self):
+        while not self._stop.wait(self.reap_interval):
+            self.reap()
+
+    def close(self):
+        """Stop the background reaper"""
+        self._stop.set()
+
+    def __len__(self):
+        return sum(len(stripe.sessions) for stripe in self._stripes)
+
+    def sample(self, limit):
+        """Return up to limit live sessions, taken evenly from the stripes"""
+        per_stripe = max(1, -(-limit // len(self._stripes)))
+        sessions = []
+        for stripe in self._stripes:
+            with stripe.lock:
+                sessions.extend(islice(stripe.sessions.values(), per_stripe))
+            if len(sessions) >= limit:
+                break
+        return sessions[:limit]
+
+    def stats(self):
+        """Return hit/miss/eviction counters and the live session count"""
+        totals = {'sessions': 0, 'hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0}
+        for stripe in self._stripes:
+            totals['sessions'] += len(stripe.sessions)
+            totals['hits'] += stripe.hits
+            totals['misses'] += stripe.misses
+            totals['expired'] += stripe.expired
+            totals['evicted'] += stripe.evicted
+        return totals
+
+
+def create_session_store(config):
+    """Build the session store described by a Flask config"""
+    backend = config.get('SESSION_BACKEND', 'memory')
+    if backend == 'sqlite':
+        from sqlite_session_store import SqliteSessionStore
+        return SqliteSessionStore(
+            config['SESSION_DB_PATH'],
+            ttl=config.get('SESSION_TTL', 3600),
+            max_sessions=config.get('SESSION_MAX', 20000),
+            stripes=config.get('SESSION_STRIPES', 64),
+            reap_interval=config.get('SESSION_REAP_INTERVAL', 30),
+            cache_size=config.get('SESSION_CACHE_SIZE', 4096),
+            cache_ttl=config.get('SESSION_CACHE_TTL', 0.25),
+            flush_interval=config.get('SESSION_FLUSH_INTERVAL', 0.2),
+        )
+    if backend == 'token':
+        from token_session_store import TokenSessionStore
+        return TokenSessionStore(
+            config['SECRET_KEY'],
+            ttl=config.get('SESSION_TTL', 3600),
+            replay_window=config.get('SESSION_REPLAY_WINDOW', 50000),
+        )
+    if backend != 'memory':
+        raise ValueError(f'Unknown SESSION_BACKEND: {backend!r}')
+    return SessionStore(
+        ttl=config.get('SESSION_TTL', 3600),
+        max_sessions=config.get('SESSION_MAX', 20000),
+        stripes=config.get('SESSION_STRIPES', 64),
+        reap_interval=config.get('SESSION_REAP_INTERVAL', 30),
+    )
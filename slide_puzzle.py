@@ -1,10 +1,16 @@
+import argparse
 import pygame
 import random
 import sys
 import os
-
-# Initialize Pygame
-pygame.init()
+import time
+from puzzle_engine import PuzzleBoard
+from puzzle_solver import get_solver
+from puzzle_scrambler import scramble
+from asset_cache import assets
+from text_cache import texts
+from render_scale import SceneRenderer, parse_scale
+from frame_profiler import DEFAULT_CSV, OverlaySprite, profiler
 
 # Constants
 SCREEN_WIDTH = 1000  # Increased from 800
@@ -14,6 +20,8 @@ TILE_SIZE = 150
 GRID_OFFSET_X = (SCREEN_WIDTH - GRID_SIZE * TILE_SIZE) // 2
 GRID_OFFSET_Y = (SCREEN_HEIGHT - GRID_SIZE * TILE_SIZE) // 2 + 50  # Moved down to make room for UI
 FPS = 60
+IDLE_TIMEOUT_MS = 1000  # longest the loop sleeps waiting for input
+PUZZLE_DIFFICULTY = 'random'  # 'random', 'easy', 'medium' or 'hard'
 
 # Colors
 WHITE = (255, 255, 255)
@@ -24,63 +32,123 @@ BLUE = (0, 0, 255)
 GRAY = (128, 128, 128)
 LIGHT_GRAY = (200, 200, 200)
 
+# Screen areas redrawn when the move count or progress change
+MOVES_AREA = pygame.Rect(50, 250, 200, 30)
+PROGRESS_X = SCREEN_WIDTH - 200
+PROGRESS_Y = 280
+PROGRESS_AREA = pygame.Rect(PROGRESS_X, PROGRESS_Y, 160, 55)
+
+def prepare_board():
+    """Scramble a board and load the hint tables, without touching pygame
+
+    Safe to run on a background thread; pass the board to SlidePuzzle.
+    """
+    get_solver(GRID_SIZE)
+    return PuzzleBoard(GRID_SIZE, scramble(GRID_SIZE, PUZZLE_DIFFICULTY))
+
 class SlidePuzzle:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption("ACM Slide Puzzle - Second Half")
+    def __init__(self, render_scale=1.0, board=None):
+        """render_scale draws the puzzle at a fraction of the window size, or
+        "auto" to choose one from the frame time; a SceneRenderer from an
+        earlier game is reused as is, along with its window
+
+        board is a scrambled board from prepare_board(); a new one is
+        scrambled if it is None. Nothing is shown until run().
+        """
+        if isinstance(render_scale, SceneRenderer):
+            self.view = render_scale
+            self.window = self.view.window
+        else:
+            # Only the parts of pygame the puzzle uses, and only once it is needed
+            pygame.display.init()
+            pygame.font.init()
+            self.window = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+            self.view = SceneRenderer(self.window, render_scale, FPS)
+        self.view.profiler = profiler
         self.clock = pygame.time.Clock()
-        self.font = pygame.font.Font(None, 36)
-        self.big_font = pygame.font.Font(None, 72)
-        
-        # Create ACM logo tiles
-        self.create_tiles()
         
         # Game state
-        self.grid = list(range(9))  # 0-8, where 8 is empty space
-        self.empty_pos = 8  # Position of empty space
+        self.board = PuzzleBoard(GRID_SIZE)  # the largest tile is the empty space
         self.solved = False
         self.moves = 0
+        self.hint_pos = None  # tile suggested by the H key
         
         # Shuffle the puzzle
-        self.shuffle_puzzle()
+        if board is None:
+            self.shuffle_puzzle()
+        else:
+            self.board = board
+
+        # Load the hint tables now rather than on the first H press
+        get_solver(GRID_SIZE)
+
+        self.build_scene()
+
+    def build_scene(self):
+        """Create everything drawn at the view's scale (again after it changes)"""
+        view = self.view
+        self.screen = view.surface
+        self.font = texts.font(None, view.px(36))
+        self.big_font = texts.font(None, view.px(72))
+
+        # The grid is laid out from whole scene pixels so tiles always meet
+        self.tile_size = view.px(TILE_SIZE)
+        self.grid_origin = view.point(GRID_OFFSET_X, GRID_OFFSET_Y)
+        
+        # Create ACM logo tiles
+        self.create_tiles()
+
+        # Everything that never changes is drawn once into this layer; draw()
+        # only repaints the cells, counter and progress bar that changed
+        self.chrome = assets.derived(("puzzle_chrome", *view.size), self.build_chrome)
+        self.overlay = OverlaySprite(profiler, texts.font(None, view.px(20)), view.point(SCREEN_WIDTH - 10, 100))
+        self.overlay_rect = None
+        self.full_redraw = True
+        self.drawn_cells = [None] * self.board.cells
+        self.drawn_moves = None
+        self.drawn_correct = None
         
     def create_tiles(self):
-        """Create 9 tiles from ACM logo image"""
+        """Create 9 tiles from ACM logo image (built once, shared across restarts)"""
+        self.tiles = assets.derived(("puzzle_tiles", "acm.png", GRID_SIZE, self.tile_size), self.build_tiles,
+                                    sources=["acm.png"])
+    
+    def build_tiles(self):
+        """Slice the ACM logo into numbered tiles"""
         # Check if acm.png exists, if not create a placeholder
         if not os.path.exists("acm.png"):
             self.create_placeholder_acm_logo()
         
-        # Load and resize the ACM logo
+        # Load the ACM logo, resized to fit the grid
+        tile_size = self.tile_size
+        total_size = GRID_SIZE * tile_size
         try:
-            acm_image = pygame.image.load("acm.png")
+            acm_image = assets.image("acm.png", (total_size, total_size))
         except:
             # Create a simple ACM logo if file doesn't exist
             self.create_simple_acm_logo()
-            acm_image = pygame.image.load("acm_logo.png")
-            
-        # Resize to fit the grid
-        total_size = GRID_SIZE * TILE_SIZE
-        acm_image = pygame.transform.scale(acm_image, (total_size, total_size))
+            acm_image = assets.image("acm_logo.png", (total_size, total_size))
         
         # Split into 9 tiles
-        self.tiles = []
+        tiles = []
         for i in range(GRID_SIZE):
             for j in range(GRID_SIZE):
-                if i * GRID_SIZE + j < 8:  # Don't create tile for empty space
-                    tile_rect = pygame.Rect(j * TILE_SIZE, i * TILE_SIZE, TILE_SIZE, TILE_SIZE)
-                    tile_surface = pygame.Surface((TILE_SIZE, TILE_SIZE))
+                if i * GRID_SIZE + j < GRID_SIZE * GRID_SIZE - 1:  # Don't create tile for empty space
+                    tile_rect = pygame.Rect(j * tile_size, i * tile_size, tile_size, tile_size)
+                    tile_surface = pygame.Surface((tile_size, tile_size)).convert()
                     tile_surface.blit(acm_image, (0, 0), tile_rect)
                     
                     # Add border to tile
-                    pygame.draw.rect(tile_surface, BLACK, (0, 0, TILE_SIZE, TILE_SIZE), 3)
+                    pygame.draw.rect(tile_surface, BLACK, (0, 0, tile_size, tile_size), self.line_width(3))
                     
                     # Add tile number for reference
-                    number_text = self.font.render(str(i * GRID_SIZE + j + 1), True, WHITE)
+                    number_text = texts.render(self.font, str(i * GRID_SIZE + j + 1), True, WHITE)
                     number_rect = number_text.get_rect()
-                    number_rect.topleft = (5, 5)
+                    number_rect.topleft = self.view.point(5, 5)
                     tile_surface.blit(number_text, number_rect)
                     
-                    self.tiles.append(tile_surface)
+                    tiles.append(tile_surface)
+        return tiles
     
     def create_simple_acm_logo(self):
         """Create a simple ACM logo if the file doesn't exist"""
@@ -126,69 +194,28 @@ class SlidePuzzle:
         pygame.image.save(logo_surface, "acm.png")
     
     def shuffle_puzzle(self):
-        """Shuffle the puzzle by making random valid moves"""
-        # Reset solved state and moves before shuffling
+        """Shuffle the puzzle into a random solvable (and unsolved) arrangement"""
         self.solved = False
         self.moves = 0
-        
-        # Make many random moves to scramble the puzzle
-        for _ in range(2000):  # Increased shuffling moves
-            self.make_random_move_without_counting()
-        
-        # Reset moves counter after shuffling
-        self.moves = 0
-        
-        # Ensure puzzle is not in solved state after shuffling
-        while self.is_solved_state():
-            for _ in range(100):
-                self.make_random_move_without_counting()
-        
-        self.moves = 0  # Reset moves counter again
-    
-    def make_random_move_without_counting(self):
-        """Make a random valid move without incrementing move counter"""
-        valid_moves = self.get_valid_moves()
-        if valid_moves:
-            move = random.choice(valid_moves)
-            # Swap tile with empty space without incrementing moves
-            self.grid[self.empty_pos], self.grid[move] = self.grid[move], self.grid[self.empty_pos]
-            self.empty_pos = move
+        self.board = PuzzleBoard(GRID_SIZE, scramble(GRID_SIZE, PUZZLE_DIFFICULTY))
     
     def is_solved_state(self):
         """Check if puzzle is in solved state without setting solved flag"""
-        for i in range(8):
-            if self.grid[i] != i:
-                return False
-        return True
+        return self.board.is_solved
     
     def make_random_move(self):
         """Make a random valid move"""
-        valid_moves = self.get_valid_moves()
-        if valid_moves:
-            move = random.choice(valid_moves)
-            self.move_tile(move)
+        self.move_tile(random.choice(self.board.valid_moves()))
     
     def get_valid_moves(self):
-        """Get list of tiles that can be moved"""
-        valid_moves = []
-        empty_row, empty_col = divmod(self.empty_pos, GRID_SIZE)
-        
-        # Check all four directions
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-        for dr, dc in directions:
-            new_row, new_col = empty_row + dr, empty_col + dc
-            if 0 <= new_row < GRID_SIZE and 0 <= new_col < GRID_SIZE:
-                valid_moves.append(new_row * GRID_SIZE + new_col)
-        
-        return valid_moves
+        """Get the positions of tiles that can be moved"""
+        return self.board.valid_moves()
     
     def move_tile(self, tile_pos):
         """Move a tile to the empty space"""
-        if tile_pos in self.get_valid_moves():
-            # Swap tile with empty space
-            self.grid[self.empty_pos], self.grid[tile_pos] = self.grid[tile_pos], self.grid[self.empty_pos]
-            self.empty_pos = tile_pos
+        if self.board.move(tile_pos):
             self.moves += 1
+            self.hint_pos = None
             
             # Check if puzzle is solved only after a player move
             self.check_solved()
@@ -197,172 +224,293 @@ class SlidePuzzle:
         """Check if the puzzle is solved"""
         if self.is_solved_state():
             self.solved = True
+            self.full_redraw = True
             return True
         return False
     
+    def show_hint(self):
+        """Highlight the optimal next tile to move"""
+        hint = get_solver(GRID_SIZE).hint(self.board)
+        self.hint_pos = hint.tile_pos if hint else None
+    
     def get_tile_at_pos(self, mouse_pos):
         """Get the tile position at mouse coordinates"""
-        mouse_x, mouse_y = mouse_pos
+        # Mouse positions are in window pixels; hit-test the grid as drawn
+        mouse_x = mouse_pos[0] * self.view.scale
+        mouse_y = mouse_pos[1] * self.view.scale
+        grid_left, grid_top = self.grid_origin
+        grid_extent = GRID_SIZE * self.tile_size
         
         # Check if click is within the grid
-        if (GRID_OFFSET_X <= mouse_x < GRID_OFFSET_X + GRID_SIZE * TILE_SIZE and
-            GRID_OFFSET_Y <= mouse_y < GRID_OFFSET_Y + GRID_SIZE * TILE_SIZE):
+        if (grid_left <= mouse_x < grid_left + grid_extent and
+            grid_top <= mouse_y < grid_top + grid_extent):
             
-            grid_x = (mouse_x - GRID_OFFSET_X) // TILE_SIZE
-            grid_y = (mouse_y - GRID_OFFSET_Y) // TILE_SIZE
+            grid_x = int((mouse_x - grid_left) // self.tile_size)
+            grid_y = int((mouse_y - grid_top) // self.tile_size)
             
             return grid_y * GRID_SIZE + grid_x
         
         return None
+
+    def line_width(self, width):
+        """Scene line width for a width in window pixels, at least 1"""
+        return max(1, self.view.px(width))
     
-    def draw(self):
-        self.screen.fill(LIGHT_GRAY)
+    def build_chrome(self):
+        """Draw the static parts of the puzzle screen onto a new surface"""
+        view = self.view
+        chrome = pygame.Surface(view.size).convert()
+        chrome.fill(LIGHT_GRAY)
+
+        # Draw title at the top
+        title_text = texts.render(self.big_font, "ACM Slide Puzzle", True, BLACK)
+        title_rect = title_text.get_rect(center=view.point(SCREEN_WIDTH//2, 40))
+        chrome.blit(title_text, title_rect)
         
-        if not self.solved:
-            # Draw title at the top
-            title_text = self.big_font.render("ACM Slide Puzzle", True, BLACK)
-            title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, 40))
-            self.screen.blit(title_text, title_rect)
-            
-            # Draw subtitle
-            subtitle_text = self.font.render("Second Half", True, BLUE)
-            subtitle_rect = subtitle_text.get_rect(center=(SCREEN_WIDTH//2, 80))
-            self.screen.blit(subtitle_text, subtitle_rect)
-            
-            # Draw instructions
-            instruction_text = self.font.render("Click on tiles next to empty space to move them", True, BLACK)
-            instruction_rect = instruction_text.get_rect(center=(SCREEN_WIDTH//2, 120))
-            self.screen.blit(instruction_text, instruction_rect)
-            
-            goal_text = self.font.render("Goal: Arrange tiles to form the complete ACM logo", True, BLACK)
-            goal_rect = goal_text.get_rect(center=(SCREEN_WIDTH//2, 150))
-            self.screen.blit(goal_text, goal_rect)
-            
-            # Draw move counter on the left side
-            moves_text = self.font.render(f"Moves: {self.moves}", True, BLACK)
-            self.screen.blit(moves_text, (50, 250))
-            
-            # Draw progress indicator on the right side
-            progress_text = self.font.render("Progress:", True, BLACK)
-            self.screen.blit(progress_text, (SCREEN_WIDTH - 200, 250))
-            
-            # Calculate how many tiles are in correct position
-            correct_tiles = sum(1 for i in range(8) if self.grid[i] == i)
-            progress_bar_width = 150
-            progress_bar_height = 20
-            progress_x = SCREEN_WIDTH - 200
-            progress_y = 280
-            
-            # Draw progress bar background
-            pygame.draw.rect(self.screen, WHITE, (progress_x, progress_y, progress_bar_width, progress_bar_height))
-            pygame.draw.rect(self.screen, BLACK, (progress_x, progress_y, progress_bar_width, progress_bar_height), 2)
-            
-            # Draw progress bar fill
-            fill_width = int((correct_tiles / 8) * progress_bar_width)
-            if fill_width > 0:
-                pygame.draw.rect(self.screen, GREEN, (progress_x, progress_y, fill_width, progress_bar_height))
-            
-            # Draw progress percentage
-            percentage = int((correct_tiles / 8) * 100)
-            percent_text = self.font.render(f"{percentage}%", True, BLACK)
-            self.screen.blit(percent_text, (progress_x, progress_y + 25))
-            
-            # Draw the puzzle grid
-            for i in range(GRID_SIZE):
-                for j in range(GRID_SIZE):
-                    pos = i * GRID_SIZE + j
-                    tile_x = GRID_OFFSET_X + j * TILE_SIZE
-                    tile_y = GRID_OFFSET_Y + i * TILE_SIZE
-                    
-                    if pos == self.empty_pos:
-                        # Draw empty space
-                        pygame.draw.rect(self.screen, GRAY, 
-                                       (tile_x, tile_y, TILE_SIZE, TILE_SIZE))
-                        pygame.draw.rect(self.screen, BLACK, 
-                                       (tile_x, tile_y, TILE_SIZE, TILE_SIZE), 3)
-                        
-                        # Add "EMPTY" text in the empty space
-                        empty_text = self.font.render("EMPTY", True, BLACK)
-                        empty_rect = empty_text.get_rect(center=(tile_x + TILE_SIZE//2, tile_y + TILE_SIZE//2))
-                        self.screen.blit(empty_text, empty_rect)
-                    else:
-                        # Draw tile
-                        tile_num = self.grid[pos]
-                        if tile_num < len(self.tiles):
-                            self.screen.blit(self.tiles[tile_num], (tile_x, tile_y))
-                            
-                            # Highlight tiles that can be moved
-                            if pos in self.get_valid_moves():
-                                pygame.draw.rect(self.screen, GREEN, 
-                                               (tile_x, tile_y, TILE_SIZE, TILE_SIZE), 4)
+        # Draw subtitle
+        subtitle_text = texts.render(self.font, "Second Half", True, BLUE)
+        subtitle_rect = subtitle_text.get_rect(center=view.point(SCREEN_WIDTH//2, 80))
+        chrome.blit(subtitle_text, subtitle_rect)
+        
+        # Draw instructions
+        instruction_text = texts.render(self.font, "Click on tiles next to empty space to move them", True, BLACK)
+        instruction_rect = instruction_text.get_rect(center=view.point(SCREEN_WIDTH//2, 120))
+        chrome.blit(instruction_text, instruction_rect)
+        
+        goal_text = texts.render(self.font, "Goal: Arrange tiles to form the complete ACM logo", True, BLACK)
+        goal_rect = goal_text.get_rect(center=view.point(SCREEN_WIDTH//2, 150))
+        chrome.blit(goal_text, goal_rect)
+        
+        # Progress label on the right side
+        progress_text = texts.render(self.font, "Progress:", True, BLACK)
+        chrome.blit(progress_text, view.point(PROGRESS_X, 250))
+        
+        # Draw hint at the bottom
+        hint_text = texts.render(self.font, "Green borders show movable tiles - press H for a hint", True, BLACK)
+        hint_rect = hint_text.get_rect(center=view.point(SCREEN_WIDTH//2, SCREEN_HEIGHT - 60))
+        chrome.blit(hint_text, hint_rect)
+        return chrome
+
+    def cell_state(self, pos):
+        """What a grid cell shows: its tile (None when empty) and its highlight"""
+        if pos == self.board.empty_pos:
+            return None, None
+        if pos == self.hint_pos:
+            return self.board[pos], BLUE
+        return self.board[pos], GREEN if self.board.can_move(pos) else None
+
+    def draw_cell(self, pos, state):
+        """Draw one grid cell and return its rect"""
+        tile_num, highlight = state
+        grid_left, grid_top = self.grid_origin
+        rect = pygame.Rect(grid_left + (pos % GRID_SIZE) * self.tile_size,
+                           grid_top + (pos // GRID_SIZE) * self.tile_size, self.tile_size, self.tile_size)
+        if tile_num is None:
+            # Draw empty space
+            pygame.draw.rect(self.screen, GRAY, rect)
+            pygame.draw.rect(self.screen, BLACK, rect, self.line_width(3))
             
-            # Draw hint at the bottom
-            hint_text = self.font.render("Green borders show movable tiles", True, BLACK)
-            hint_rect = hint_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT - 60))
-            self.screen.blit(hint_text, hint_rect)
+            # Add "EMPTY" text in the empty space
+            empty_text = texts.render(self.font, "EMPTY", True, BLACK)
+            self.screen.blit(empty_text, empty_text.get_rect(center=rect.center))
+        elif tile_num < len(self.tiles):
+            self.screen.blit(self.tiles[tile_num], rect)
             
-        else:
-            # Victory screen - better spacing
-            win_text = self.big_font.render("SECOND HALF COMPLETE!", True, GREEN)
-            win_rect = win_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 200))
-            self.screen.blit(win_text, win_rect)
+            # Highlight the hinted tile and the tiles that can be moved
+            if highlight is not None:
+                pygame.draw.rect(self.screen, highlight, rect, self.line_width(6 if highlight == BLUE else 4))
+        return rect
+
+    def draw_moves(self):
+        """Draw the move counter and return the area it covers"""
+        area = self.view.rect(MOVES_AREA)
+        self.screen.blit(self.chrome, area, area)
+        moves_text = texts.render(self.font, f"Moves: {self.moves}", True, BLACK)
+        self.screen.blit(moves_text, area.topleft)
+        return area
+
+    def draw_progress(self):
+        """Draw the progress bar and return the area it covers"""
+        view = self.view
+        area = view.rect(PROGRESS_AREA)
+        self.screen.blit(self.chrome, area, area)
+
+        # Calculate how many tiles are in correct position
+        correct_tiles = self.board.correct
+        total_tiles = self.board.cells - 1
+        progress_bar_width = 150
+        progress_bar_height = 20
+        
+        # Draw progress bar background
+        bar = view.rect(PROGRESS_X, PROGRESS_Y, progress_bar_width, progress_bar_height)
+        pygame.draw.rect(self.screen, WHITE, bar)
+        pygame.draw.rect(self.screen, BLACK, bar, self.line_width(2))
+        
+        # Draw progress bar fill
+        fill_width = int((correct_tiles / total_tiles) * progress_bar_width)
+        if fill_width > 0:
+            pygame.draw.rect(self.screen, GREEN, view.rect(PROGRESS_X, PROGRESS_Y, fill_width, progress_bar_height))
+        
+        # Draw progress percentage
+        percentage = int((correct_tiles / total_tiles) * 100)
+        percent_text = texts.render(self.font, f"{percentage}%", True, BLACK)
+        self.screen.blit(percent_text, view.point(PROGRESS_X, PROGRESS_Y + 25))
+        return area
+
+    def draw(self):
+        """Redraw whatever changed since the last call and present it
+
+        Returns whether anything was drawn.
+        """
+        if self.solved:
+            if not self.full_redraw:
+                return False
+            self.draw_victory()
+            self.view.present()
+            self.full_redraw = False
+            return True
+
+        if self.full_redraw:
+            self.screen.blit(self.chrome, (0, 0))
+            self.drawn_cells = [None] * self.board.cells
+            self.drawn_moves = self.drawn_correct = None
+
+        # Only the cells whose tile or highlight changed, normally the two
+        # that swapped and their neighbours
+        rects = []
+        for pos in range(self.board.cells):
+            state = self.cell_state(pos)
+            if state != self.drawn_cells[pos]:
+                rects.append(self.draw_cell(pos, state))
+                self.drawn_cells[pos] = state
+        if self.moves != self.drawn_moves:
+            rects.append(self.draw_moves())
+            self.drawn_moves = self.moves
+        if self.board.correct != self.drawn_correct:
+            rects.append(self.draw_progress())
+            self.drawn_correct = self.board.correct
+        self.overlay.update()
+        if self.overlay.dirty or self.full_redraw:
+            rects.extend(self.draw_overlay())
+
+        if self.full_redraw:
+            self.view.present()
+            self.full_redraw = False
+            return True
+        if rects:
+            self.view.present(rects)
+        return bool(rects)
+
+    def draw_overlay(self):
+        """Draw or clear the profiler overlay and return the areas it touched"""
+        # The overlay only covers static text, so the chrome is all there is to restore
+        rects = []
+        if self.overlay_rect is not None:
+            self.screen.blit(self.chrome, self.overlay_rect, self.overlay_rect)
+            rects.append(self.overlay_rect)
+            self.overlay_rect = None
+        if self.overlay.visible:
+            self.screen.blit(self.overlay.image, self.overlay.rect)
+            self.overlay_rect = self.overlay.rect.copy()
+            rects.append(self.overlay_rect)
+        self.overlay.dirty = 0
+        return rects
+
+    def draw_victory(self):
+        view = self.view
+        self.screen.fill(LIGHT_GRAY)
+        # Victory screen - better spacing
+        win_text = texts.render(self.big_font, "SECOND HALF COMPLETE!", True, GREEN)
+        win_rect = win_text.get_rect(center=view.point(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 200))
+        self.screen.blit(win_text, win_rect)
             
-            complete_text = self.font.render('Second half answer is: "tHe_gOaT"', True, GREEN)
-            complete_rect = complete_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 140))
-            self.screen.blit(complete_text, complete_rect)
+        complete_text = texts.render(self.font, 'Second half answer is: "tHe_gOaT"', True, GREEN)
+        complete_rect = complete_text.get_rect(center=view.point(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 140))
+        self.screen.blit(complete_text, complete_rect)
             
-            full_answer_text = self.big_font.render('Complete answer: "AcM_is_tHe_gOaT"', True, BLUE)
-            full_answer_rect = full_answer_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 80))
-            self.screen.blit(full_answer_text, full_answer_rect)
+        full_answer_text = texts.render(self.big_font, 'Complete answer: "AcM_is_tHe_gOaT"', True, BLUE)
+        full_answer_rect = full_answer_text.get_rect(center=view.point(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 80))
+        self.screen.blit(full_answer_text, full_answer_rect)
             
-            moves_text = self.font.render(f"Puzzle completed in {self.moves} moves!", True, BLACK)
-            moves_rect = moves_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 20))
-            self.screen.blit(moves_text, moves_rect)
+        moves_text = texts.render(self.font, f"Puzzle completed in {self.moves} moves!", True, BLACK)
+        moves_rect = moves_text.get_rect(center=view.point(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 20))
+        self.screen.blit(moves_text, moves_rect)
             
-            congrats_text = self.font.render("🎉 Congratulations! You completed both halves! 🎉", True, BLACK)
-            congrats_rect = congrats_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 40))
-            self.screen.blit(congrats_text, congrats_rect)
+        congrats_text = texts.render(self.font, "🎉 Congratulations! You completed both halves! 🎉", True, BLACK)
+        congrats_rect = congrats_text.get_rect(center=view.point(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 40))
+        self.screen.blit(congrats_text, congrats_rect)
             
-            challenge_text = self.font.render("You have successfully solved the ACM Challenge!", True, BLACK)
-            challenge_rect = challenge_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 80))
-            self.screen.blit(challenge_text, challenge_rect)
+        challenge_text = texts.render(self.font, "You have successfully solved the ACM Challenge!", True, BLACK)
+        challenge_rect = challenge_text.get_rect(center=view.point(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 80))
+        self.screen.blit(challenge_text, challenge_rect)
             
-            restart_text = self.font.render("Press SPACE to restart puzzle or ESC to quit", True, BLACK)
-            restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 140))
-            self.screen.blit(restart_text, restart_rect)
-        
-        pygame.display.flip()
+        restart_text = texts.render(self.font, "Press SPACE to restart puzzle or ESC to quit", True, BLACK)
+        restart_rect = restart_text.get_rect(center=view.point(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 140))
+        self.screen.blit(restart_text, restart_rect)
     
-    def handle_events(self):
-        for event in pygame.event.get():
+    def handle_events(self, events=None):
+        for event in pygame.event.get() if events is None else events:
             if event.type == pygame.QUIT:
                 return False
             elif event.type == pygame.KEYDOWN:
+                if profiler.handle_key(event.key):
+                    continue
                 if event.key == pygame.K_ESCAPE:
                     return False
                 elif event.key == pygame.K_SPACE and self.solved:
                     self.restart_puzzle()
+                elif event.key == pygame.K_h and not self.solved:
+                    self.show_hint()
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if not self.solved and event.button == 1:  # Left click
                     tile_pos = self.get_tile_at_pos(event.pos)
                     if tile_pos is not None:
                         self.move_tile(tile_pos)
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                # The window contents were lost (uncovered, restored)
+                self.full_redraw = True
         return True
     
     def restart_puzzle(self):
         """Restart the puzzle"""
-        self.__init__()
+        self.__init__(self.view)
     
     def run(self):
+        pygame.display.set_caption("ACM Slide Puzzle - Second Half")
+        if self.screen is not self.view.surface:
+            # The scale changed since this puzzle was created
+            self.build_scene()
+        self.full_redraw = True
+        profiler.scene = "puzzle"
         running = True
         while running:
-            running = self.handle_events()
-            self.draw()
+            start = time.perf_counter()
+            # Frames where nothing changed say nothing about drawing speed
+            if self.draw() and self.view.record(time.perf_counter() - start):
+                self.build_scene()
+            profiler.mark("draw")
             self.clock.tick(FPS)
+            # The screen only changes in response to input, so while there is
+            # none, sleep until some arrives instead of redrawing at FPS
+            events = pygame.event.get() or [pygame.event.wait(IDLE_TIMEOUT_MS)]
+            profiler.mark("wait")
+            running = self.handle_events(events)
+            profiler.mark("events")
+            profiler.end_frame()
         
         pygame.quit()
         return "quit"
 
 if __name__ == "__main__":
-    puzzle = SlidePuzzle()
+    parser = argparse.ArgumentParser(description="ACM Slide Puzzle")
+    parser.add_argument("--render-scale", type=parse_scale, default=1.0, metavar="SCALE",
+                        help="draw at this fraction of the window resolution, or 'auto' to pick one "
+                             "from the frame time (default: 1)")
+    parser.add_argument("--profile", nargs="?", const=DEFAULT_CSV, metavar="CSV",
+                        help=f"time every frame and write the phase times to CSV on exit (default: {DEFAULT_CSV}); "
+                             "F3 shows the overlay, F4 runs cProfile")
+    args = parser.parse_args()
+    if args.profile:
+        profiler.enable(args.profile)
+    puzzle = SlidePuzzle(args.render_scale)
     puzzle.run()
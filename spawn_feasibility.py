@@ -0,0 +1,287 @@
+# Monte Carlo feasibility check for the catch game's spawn schedule
+#
+# The item table, the spawn_delay ramp and the fast-item speed roll decide
+# whether a round can be won at all: two fast items that land far apart in
+# quick succession cannot both be reached by a basket that moves at most
+# BASKET_SPEED pixels per frame. This plays many seeded rounds of catch_sim
+# with a speed-capped bot and reports
+#
+# * the bot's win rate,
+# * the share of rounds whose schedule is feasible at all, from a lower
+#   bound on the basket speed each round needs (for every pair of items
+#   caught one after the other: the gap between them, less the slack the
+#   basket width gives, over the most frames their catch windows allow
+#   between the two catches; the items the rules let a winner miss are
+#   skipped where that helps most),
+# * the worst required speed seen, and
+# * which items the bot missed most often.
+#
+# Rounds are split into chunks of seeds and farmed out to a
+# multiprocessing pool, so a sweep scales with the number of cores:
+#
+#     python spawn_feasibility.py --rounds 20000
+#     python spawn_feasibility.py --rules web --fast-chance 0.5 --json
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import time
+from collections import Counter
+
+from catch_sim import PYGAME_RULES, WEB_RULES, CatchRules, CatchSimulation
+
+BASKET_SPEED = 8  # pixels per frame, as in catch_game.py
+CHUNK_SIZE = 250
+
+PRESETS = {'pygame': PYGAME_RULES, 'web': WEB_RULES}
+
+
+def catch_window(rules, speed):
+    """First and last frame (after spawning) on which an item falling at speed overlaps the basket"""
+    top = rules.height - rules.basket_height - rules.basket_margin
+    bottom = top + rules.basket_height + rules.item_size
+    return int(top // speed) + 1, math.ceil(bottom / speed) - 1
+
+
+def spawn_schedule(rules, seed):
+    """Return (first catch frame, last catch frame, centre x, kind) of every item a round spawns"""
+    sim = CatchSimulation(rules, seed)
+    schedule = []
+    for tick in range(1, rules.time_limit_ticks + 1):
+        if sim.current_item_index >= len(rules.items):
+            break
+        # Same timer as CatchSimulation.step; spawning never depends on the basket
+        sim.spawn_timer += 1
+        if sim.spawn_timer >= sim.spawn_delay:
+            spawned = sim.total_items_spawned
+            sim.spawn_item()
+            sim.spawn_timer = 0
+            if sim.total_items_spawned > spawned:
+                item = sim.items[-1]
+                first, last = catch_window(rules, item.speed)
+                schedule.append((tick + first - 1, tick + last - 1, item.x + rules.item_size / 2, item.kind))
+    schedule.sort()
+    return schedule
+
+
+def allowed_misses(rules):
+    """Items a round can let through and still be won"""
+    if rules.win_on_final_item:
+        return rules.max_misses - 1
+    return 0  # every item has to be caught
+
+
+def required_speed(rules, schedule):
+    """Lower bound on the basket speed (pixels per frame) needed to win a schedule
+
+    The basket may let through as many items as the rules allow and picks
+    the ones that save it the longest dashes. When catching the final item
+    wins, that item must be caught and nothing arriving after it matters.
+    Impossible schedules (two far-apart items catchable only on the same
+    frame) are capped at a full screen width per frame.
+    """
+    cap = float(rules.width)
+    final = None
+    if rules.win_on_final_item:
+        final = next((i for i, item in enumerate(schedule) if rules.items[item[3]][0] == rules.final_item), None)
+        if final is not None:
+            schedule = schedule[:final + 1]
+    n = len(schedule)
+    if n < 2:
+        return 0.0
+
+    # The basket catches anything whose centre is within this of its own
+    slack = (rules.basket_width + rules.item_size) / 2
+
+    def speed(a, b):
+        # Both catches happen somewhere in their windows; allow the longest time apart
+        (first_a, last_a, x_a, _), (first_b, last_b, x_b, _) = schedule[a], schedule[b]
+        gap = abs(x_b - x_a) - 2 * slack
+        if gap <= 0:
+            return 0.0
+        frames = max(last_b - first_a, last_a - first_b)
+        return gap / frames if frames > 0 else cap
+
+    # best[i][j]: lowest top speed of a run that catches item i, having let j items through
+    misses = allowed_misses(rules)
+    best = [[cap] * (misses + 1) for _ in range(n)]
+    for i in range(min(misses, n - 1) + 1):
+        best[i][i] = 0.0  # let the first i items through
+    for i in range(1, n):
+        for j in range(misses + 1):
+            for skipped in range(min(j, i - 1) + 1):
+                previous = i - 1 - skipped
+                candidate = max(best[previous][j - skipped], speed(previous, i))
+                if candidate < best[i][j]:
+                    best[i][j] = candidate
+
+    if final is not None:
+        return min(best[n - 1])
+    # Items at the end may be let through too, within the same allowance
+    return min(best[n - 1 - tail][j] for tail in range(min(misses, n - 1) + 1) for j in range(misses + 1 - tail))
+
+
+class ReachBot:
+    """Input source that moves the basket at most max_speed pixels per frame
+
+    Each frame it heads for the item that will reach the basket soonest
+    among those it can still get to in time, and gives up on the rest.
+    """
+
+    def __init__(self, max_speed=BASKET_SPEED):
+        self.max_speed = max_speed
+        self.position = None
+
+    def __call__(self, sim):
+        rules = sim.rules
+        half = rules.basket_width / 2
+        if self.position is None:
+            self.position = sim.basket_x + half
+        slack = (rules.basket_width + rules.item_size) / 2 - 1
+        top = sim.basket_y - rules.item_size
+
+        target = None
+        soonest = None
+        for item in sim.items:
+            if item.y > sim.basket_y + rules.basket_height:
+                continue  # already past the basket
+            frames = max(0.0, (top - item.y) / item.speed)
+            centre = item.x + rules.item_size / 2
+            if abs(centre - self.position) - slack > self.max_speed * (frames + 1):
+                continue  # cannot get there in time
+            if soonest is None or frames < soonest:
+                soonest = frames
+                target = centre
+
+        if target is not None:
+            # Only move as far as needed to get the item over the basket
+            offset = target - self.position
+            if abs(offset) > slack:
+                step = abs(offset) - slack
+                step = min(step, self.max_speed)
+                self.position += step if offset > 0 else -step
+        self.position = min(max(self.position, half), rules.width - half)
+        return self.position
+
+
+def _run_chunk(args):
+    rules, seeds, basket_speed = args
+    wins = 0
+    feasible = 0
+    worst = 0.0
+    worst_seed = None
+    speeds = []
+    missed = Counter()
+    for seed in seeds:
+        speed = required_speed(rules, spawn_schedule(rules, seed))
+        speeds.append(speed)
+        if speed <= basket_speed:
+            feasible += 1
+        if speed > worst or worst_seed is None:
+            worst, worst_seed = speed, seed
+
+        sim = CatchSimulation(rules, seed).run(ReachBot(basket_speed))
+        if sim.won:
+            wins += 1
+        missed.update(sim.missed_items)
+    return wins, feasible, worst, worst_seed, speeds, missed
+
+
+def analyze(rules, rounds, basket_speed=BASKET_SPEED, workers=None, first_seed=0):
+    """Play `rounds` seeded rounds in a process pool and summarise them"""
+    if rounds < 1:
+        raise ValueError('rounds must be at least 1')
+    seeds = range(first_seed, first_seed + rounds)
+    chunks = [(rules, seeds[i:i + CHUNK_SIZE], basket_speed) for i in range(0, rounds, CHUNK_SIZE)]
+    wins = feasible = 0
+    worst = 0.0
+    worst_seed = None
+    speeds = []
+    missed = Counter()
+    with multiprocessing.Pool(workers) as pool:
+        for c_wins, c_feasible, c_worst, c_seed, c_speeds, c_missed in pool.imap_unordered(_run_chunk, chunks):
+            wins += c_wins
+            feasible += c_feasible
+            if worst_seed is None or c_worst > worst:
+                worst, worst_seed = c_worst, c_seed
+            speeds.extend(c_speeds)
+            missed.update(c_missed)
+
+    speeds.sort()
+    names = [item[0].split('.')[0] for item in rules.items]
+    return {
+        'rounds': rounds,
+        'basket_speed': basket_speed,
+        'win_rate': wins / rounds,
+        'feasible_rate': feasible / rounds,
+        'required_speed': {
+            'p50': speeds[len(speeds) // 2],
+            'p95': speeds[min(len(speeds) - 1, int(len(speeds) * 0.95))],
+            'max': worst,
+            'max_seed': worst_seed,
+        },
+        'missed': {names[kind]: count for kind, count in missed.most_common()},
+    }
+
+
+def positive_int(text):
+    """argparse type for counts that must be at least 1"""
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f'must be at least 1, got {value}')
+    return value
+
+
+def parse_items(text):
+    """Parse "file:points:count,..." into an items table"""
+    items = []
+    for part in text.split(','):
+        filename, points, count = part.split(':')
+        items.append((filename, int(points), int(count)))
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Estimate how often a catch game spawn schedule can be won.')
+    parser.add_argument('--rounds', type=positive_int, default=10000, help='seeded rounds to play (default: 10000)')
+    parser.add_argument('--seed', type=int, default=0, help='first seed (default: 0)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes (default: all cores)')
+    parser.add_argument('--rules', choices=sorted(PRESETS), default='pygame', help='rules preset (default: pygame)')
+    parser.add_argument('--basket-speed', type=float, default=BASKET_SPEED,
+                        help=f'basket pixels per frame (default: {BASKET_SPEED})')
+    parser.add_argument('--items', type=parse_items,
+                        help='spawn table as file:points:count,... (default: the game\'s table)')
+    parser.add_argument('--fast-chance', type=float, help='chance of a fast item')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    settings = PRESETS[args.rules].to_dict()
+    if args.items:
+        settings['items'] = args.items
+    if args.fast_chance is not None:
+        settings['fast_chance'] = args.fast_chance
+    rules = CatchRules(**settings)
+
+    start = time.perf_counter()
+    report = analyze(rules, args.rounds, args.basket_speed, args.workers, args.seed)
+    report['seconds'] = round(time.perf_counter() - start, 2)
+
+    if args.json:
+        print(json.dumps(report, indent=2, allow_nan=False))
+        return
+
+    speed = report['required_speed']
+    print(f'{report["rounds"]} rounds, basket speed {report["basket_speed"]} px/frame, {report["seconds"]}s')
+    print(f'  bot win rate:       {report["win_rate"]:.1%}')
+    print(f'  feasible schedules: {report["feasible_rate"]:.1%}')
+    print(f'  required speed:     p50 {speed["p50"]:.2f}  p95 {speed["p95"]:.2f}  '
+          f'max {speed["max"]:.2f} (seed {speed["max_seed"]})')
+    print('  most missed:')
+    for name, count in list(report['missed'].items())[:5]:
+        print(f'    {name:<14} {count}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,557 @@
+# SQLite session backend for multi-process deployments
+#
+# Every worker process opens the same SQLite file in WAL mode, so a session
+# created by one gunicorn/uWSGI worker is visible to all the others.
+#
+# Writes are split in two:
+#   * hot counters (score, items_caught, items_missed, puzzle_moves) are
+#     coalesced in memory as deltas and flushed in batched transactions by a
+#     background writer. Deltas from different workers add up correctly.
+#     Setting a counter outright (the verified score at the end of a game, a
+#     new puzzle's move count) bumps the row's epoch; deltas buffered against
+#     an older epoch, in any worker, are dropped instead of being added on top.
+#   * everything else (game over, puzzle grid, answers...) is written through
+#     immediately, since those changes are rare and must be seen by the next
+#     request wherever it lands.
+#
+# Reads go through a small per-worker cache. Each row carries a version that
+# is bumped on every write; a cached entry is trusted for CACHE_TTL seconds
+# and after that revalidated with a cheap version lookup. Written-through
+# fields are only stored if the row is still at the version they were read
+# from; if it moved on, the write is redone on top of it when only counters
+# changed, and fails with SessionConflict when another worker changed any
+# other field.
+
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import islice
+
+from puzzle_engine import PuzzleBoard
+from session_store import GameSession, SessionConflict
+
+COUNTERS = ('score', 'items_caught', 'items_missed', 'puzzle_moves')
+FIELDS = tuple(name for name in GameSession.__slots__ if name not in COUNTERS and name != 'last_access')
+COLUMNS = ('session_id',) + COUNTERS + FIELDS + ('last_access', 'version', 'epoch')
+
+# Column definitions, used both to create the table and to add the columns
+# an older database file is missing
+COLUMN_TYPES = (
+    ('session_id', 'TEXT PRIMARY KEY'),
+    ('score', 'INTEGER NOT NULL DEFAULT 0'),
+    ('items_caught', 'INTEGER NOT NULL DEFAULT 0'),
+    ('items_missed', 'INTEGER NOT NULL DEFAULT 0'),
+    ('puzzle_moves', 'INTEGER NOT NULL DEFAULT 0'),
+    ('start_time', 'REAL'),
+    ('end_time', 'REAL'),
+    ('duration', 'REAL'),
+    ('game_over', 'INTEGER NOT NULL DEFAULT 0'),
+    ('won', 'INTEGER NOT NULL DEFAULT 0'),
+    ('missed_final_item', 'INTEGER NOT NULL DEFAULT 0'),
+    ('first_answer_part', "TEXT NOT NULL DEFAULT ''"),
+    ('puzzle_completed', 'INTEGER NOT NULL DEFAULT 0'),
+    ('puzzle_start_time', 'REAL'),
+    ('puzzle_end_time', 'REAL'),
+    ('puzzle_state', 'BLOB'),
+    ('second_answer_part', "TEXT NOT NULL DEFAULT ''"),
+    ('full_answer', "TEXT NOT NULL DEFAULT ''"),
+    ('event_seq', 'INTEGER NOT NULL DEFAULT 0'),
+    ('replay_seed', 'INTEGER NOT NULL DEFAULT 0'),
+    ('last_access', 'REAL NOT NULL'),
+    ('version', 'INTEGER NOT NULL DEFAULT 0'),
+    ('epoch', 'INTEGER NOT NULL DEFAULT 0'),
+)
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS sessions (\n    ' +
+    ',\n    '.join(f'{name} {kind}' for name, kind in COLUMN_TYPES) +
+    '\n);\nCREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access);\n'
+)
+
+FLUSH_SQL = '''
+UPDATE sessions SET
+    score = score + ?,
+    items_caught = items_caught + ?,
+    items_missed = items_missed + ?,
+    puzzle_moves = puzzle_moves + ?,
+    last_access = max(last_access, ?),
+    version = version + 1
+WHERE session_id = ? AND epoch = ?
+'''
+
+BOOL_FIELDS = ('game_over', 'won', 'missed_final_item', 'puzzle_completed')
+
+
+def _to_column(name, value):
+    if name == 'puzzle_state' and value is not None:
+        return bytes(value)
+    if name in BOOL_FIELDS:
+        return int(value)
+    return value
+
+
+def _from_column(name, value):
+    if name == 'puzzle_state' and value is not None:
+        return PuzzleBoard.from_bytes(value)
+    if name in BOOL_FIELDS:
+        return bool(value)
+    return value
+
+
+class _CacheStripe:
+    __slots__ = ('lock', 'entries', 'hits', 'misses', 'reads')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # session_id -> [session, version, checked_at, epoch]
+        self.hits = 0
+        self.misses = 0
+        self.reads = 0
+
+
+class SqliteSessionStore:
+    """Session store persisted to a shared SQLite file with write-behind counters"""
+
+    def __init__(self, path, ttl=3600, max_sessions=20000, stripes=64, reap_interval=30,
+                 cache_size=4096, cache_ttl=0.25, flush_interval=0.2, flush_batch=512):
+        self.path = path
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.reap_interval = reap_interval
+        self.cache_ttl = cache_ttl
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self._stripes = [_CacheStripe() for _ in range(stripes)]
+        self._stripe_capacity = max(1, -(-cache_size // stripes))
+        self._local = threading.local()
+
+        # session_id -> [d_score, d_caught, d_missed, d_moves, last_access, epoch]
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._flush_now = threading.Event()
+        self._stop = threading.Event()
+        self._writer_pid = None
+        self._writer_lock = threading.Lock()
+
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.dropped_rows = 0
+        self.expired = 0
+        self.evicted = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(SCHEMA)
+        self._migrate()
+
+    # -- connections -------------------------------------------------------
+
+    def _connection(self):
+        # sqlite3 connections must not be shared between threads or across fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _migrate(self):
+        # Add columns introduced after a database file was first created
+        conn = self._connection()
+        existing = {row[1] for row in conn.execute('PRAGMA table_info(sessions)')}
+        for name, kind in COLUMN_TYPES:
+            if name not in existing:
+                conn.execute(f'ALTER TABLE sessions ADD COLUMN {name} {kind}')
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    # -- public interface (same as SessionStore) ---------------------------
+
+    def _stripe_for(self, session_id):
+        return self._stripes[hash(session_id) % len(self._stripes)]
+
+    def new_session_id(self):
+        """Mint an unguessable, collision-free session ID"""
+        return secrets.token_urlsafe(12)
+
+    def create(self):
+        """Create a new session, written through so every worker sees it"""
+        self._ensure_writer()
+        session_id = self.new_session_id()
+        session = GameSession()
+        values = [session_id] + [_to_column(name, getattr(session, name)) for name in COLUMNS[1:-2]] + [0, 0]
+        placeholders = ', '.join('?' * len(COLUMNS))
+        with self._transaction() as conn:
+            conn.execute(f'INSERT INTO sessions ({", ".join(COLUMNS)}) VALUES ({placeholders})', values)
+
+        stripe = self._stripe_for(session_id)
+        with stripe.lock:
+            self._cache_put(stripe, session_id, session, 0, 0)
+        return session_id
+
+    def issue(self, session_id, session):
+        """Return the session ID the client should send next time"""
+        return session_id
+
+    def set_counters(self, session, **values):
+        """Set counters of the session being updated to absolute values
+
+        Increments other workers have buffered for the session are discarded
+        rather than added on top.
+        """
+        for name, value in values.items():
+            setattr(session, name, value)
+        current = getattr(self._local, 'assigned', None)
+        if current is not None and current[0] is session:
+            current[1].update(values)
+
+    @contextmanager
+    def locked(self, session_id):
+        """Yield the session for session_id with its per-worker lock held
+
+        Yields None if the session does not exist or has expired. Changes
+        made to the yielded session are persisted when the block exits;
+        raises SessionConflict if another worker changed the same fields
+        in the meantime.
+        """
+        if not isinstance(session_id, str):
+            yield None
+            return
+
+        # Any worker may hold coalesced counters, not just the ones creating sessions
+        self._ensure_writer()
+        stripe = self._stripe_for(session_id)
+        with stripe.lock:
+            session = self._get(stripe, session_id)
+            if session is None:
+                stripe.misses += 1
+                yield None
+                return
+
+            _, version, _, epoch = stripe.entries[session_id]
+            assigned = set()
+            self._local.assigned = (session, assigned)
+            before = {name: getattr(session, name) for name in COUNTERS + FIELDS}
+            if session.puzzle_state is not None:
+                # Routes move tiles in place, so compare against a copy
+                before['puzzle_state'] = session.puzzle_state.copy()
+            session.last_access = time.time()
+            try:
+                yield session
+            except BaseException:
+                # The cached object may be half-updated; reload it next time
+                stripe.entries.pop(session_id, None)
+                raise
+            finally:
+                self._local.assigned = None
+            self._record_changes(stripe, session_id, session, before, version, epoch, assigned)
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+
+    def sample(self, limit):
+        """Return up to limit sessions from the in-process cache"""
+        per_stripe = max(1, -(-limit // len(self._stripes)))
+        sessions = []
+        for stripe in self._stripes:
+            with stripe.lock:
+                sessions.extend(entry[0] for entry in islice(stripe.entries.values(), per_stripe))
+            if len(sessions) >= limit:
+                break
+        return sessions[:limit]
+
+    def stats(self):
+        """Return cache, flush and eviction counters and the live session count"""
+        with self._pending_lock:
+            pending = len(self._pending)
+        return {
+            'sessions': len(self),
+            'hits': sum(stripe.hits for stripe in self._stripes),
+            'misses': sum(stripe.misses for stripe in self._stripes),
+            'db_reads': sum(stripe.reads for stripe in self._stripes),
+            'pending': pending,
+            'flushes': self.flushes,
+            'flushed_rows': self.flushed_rows,
+            'dropped_rows': self.dropped_rows,
+            'expired': self.expired,
+            'evicted': self.evicted,
+        }
+
+    def close(self):
+        """Flush pending counters and stop the background writer"""
+        self._stop.set()
+        self._flush_now.set()
+        self.flush()
+
+    # -- reads -------------------------------------------------------------
+
+    def _get(self, stripe, session_id):
+        now = time.time()
+        entry = stripe.entries.get(session_id)
+        if entry is not None:
+            session, version, checked_at, _ = entry
+            if now - session.last_access > self.ttl:
+                del stripe.entries[session_id]
+                return None
+            if now - checked_at < self.cache_ttl:
+                stripe.hits += 1
+                stripe.entries.move_to_end(session_id)
+                return session
+            row = self._connection().execute(
+                'SELECT version FROM sessions WHERE session_id = ?', (session_id,)).fetchone()
+            if row is not None and row[0] == version:
+                entry[2] = now
+                stripe.hits += 1
+                stripe.entries.move_to_end(session_id)
+                return session
+
+        stripe.reads += 1
+        row = self._connection().execute(
+            f'SELECT {", ".join(COLUMNS)} FROM sessions WHERE session_id = ?', (session_id,)).fetchone()
+        if row is None:
+            stripe.entries.pop(session_id, None)
+            return None
+
+        session = GameSession.__new__(GameSession)
+        for name, value in zip(COLUMNS[1:-2], row[1:-2]):
+            setattr(session, name, _from_column(name, value))
+        version, epoch = row[-2:]
+
+        # Fold in this worker's deltas that have not reached the database yet,
+        # unless the counters were set since they were recorded
+        with self._pending_lock:
+            delta = self._pending.get(session_id)
+            if delta is not None and delta[5] != epoch:
+                del self._pending[session_id]
+                self.dropped_rows += 1
+            elif delta is not None:
+                for i, name in enumerate(COUNTERS):
+                    setattr(session, name, getattr(session, name) + delta[i])
+                session.last_access = max(session.last_access, delta[4])
+
+        if now - session.last_access > self.ttl:
+            stripe.entries.pop(session_id, None)
+            return None
+
+        self._cache_put(stripe, session_id, session, version, epoch)
+        return session
+
+    def _cache_put(self, stripe, session_id, session, version, epoch):
+        stripe.entries[session_id] = [session, version, time.time(), epoch]
+        stripe.entries.move_to_end(session_id)
+        while len(stripe.entries) > self._stripe_capacity:
+            stripe.entries.popitem(last=False)
+
+    # -- writes ------------------------------------------------------------
+
+    def _record_changes(self, stripe, session_id, session, before, version, epoch, assigned):
+        deltas = [0, 0, 0, 0]
+        counters = {}
+        for i, name in enumerate(COUNTERS):
+            value = getattr(session, name)
+            if name in assigned or value < before[name]:
+                counters[name] = value
+            else:
+                deltas[i] = value - before[name]
+        fields = {}
+        for name in FIELDS:
+            value = getattr(session, name)
+            if value != before[name]:
+                fields[name] = _to_column(name, value)
+
+        if counters:
+            # Written through together with this worker's own buffered
+            # increments, which would otherwise be dropped with everyone else's
+            with self._pending_lock:
+                pending = self._pending.pop(session_id, None)
+            if pending is not None and pending[5] == epoch:
+                for i in range(4):
+                    deltas[i] += pending[i]
+            increments = {name: deltas[i] for i, name in enumerate(COUNTERS) if name not in counters and deltas[i]}
+            try:
+                written = self._write_fields(session_id, fields, before, version, epoch,
+                                             counters, increments, session.last_access)
+            except BaseException:
+                if pending is not None:
+                    self._restore_pending({session_id: pending})
+                raise
+            if not written:
+                stripe.entries.pop(session_id, None)
+            return
+
+        if fields and not self._write_fields(session_id, fields, before, version, epoch):
+            # The row was reaped meanwhile; there is nothing left to update
+            stripe.entries.pop(session_id, None)
+            with self._pending_lock:
+                self._pending.pop(session_id, None)
+            return
+
+        with self._pending_lock:
+            pending = self._pending.get(session_id)
+            if pending is not None and pending[5] != epoch:
+                self.dropped_rows += 1
+                pending = None
+            if pending is None:
+                pending = self._pending[session_id] = [0, 0, 0, 0, 0.0, epoch]
+            for i in range(4):
+                pending[i] += deltas[i]
+            pending[4] = session.last_access
+            if len(self._pending) >= self.flush_batch:
+                self._flush_now.set()
+
+    def _write_fields(self, session_id, fields, before, version, epoch, counters=None, increments=None,
+                      last_access=None):
+        """Store fields if the row is still at version; returns False if the row is gone
+
+        counters are set outright, starting a new epoch, and increments are
+        added in the same statement. If the row moved on only through
+        counter flushes, the write is redone on the new version. If any other
+        field changed or the counters were set elsewhere, the request decided
+        on stale state and SessionConflict is raised. The cached entry is
+        refreshed or dropped to match.
+        """
+        stripe = self._stripe_for(session_id)
+        columns = [f'{name} = ?' for name in fields]
+        values = list(fields.values())
+        if counters:
+            columns += [f'{name} = ?' for name in counters]
+            columns += [f'{name} = {name} + ?' for name in increments]
+            columns += ['last_access = max(last_access, ?)', 'epoch = epoch + 1']
+            values += list(counters.values()) + list(increments.values()) + [last_access]
+        sql = f'UPDATE sessions SET {", ".join(columns)}, version = version + 1 WHERE session_id = ? AND version = ?'
+        with self._transaction() as conn:
+            written = conn.execute(sql, values + [session_id, version]).rowcount
+            if not written:
+                row = conn.execute(f'SELECT {", ".join(FIELDS)}, version, epoch FROM sessions WHERE session_id = ?',
+                                   (session_id,)).fetchone()
+                if row is None:
+                    return False
+                changed = row[-1] != epoch or any(
+                    value != _to_column(name, before[name]) for name, value in zip(FIELDS, row))
+                if changed:
+                    stripe.entries.pop(session_id, None)
+                    raise SessionConflict(session_id)
+                conn.execute(sql, values + [session_id, row[-2]])
+
+        entry = stripe.entries.get(session_id)
+        if entry is not None:
+            if written:
+                entry[1] = version + 1
+                if counters:
+                    entry[3] = epoch + 1
+            else:
+                # Other fields may have changed too; reload next time
+                del stripe.entries[session_id]
+        return True
+
+    def _restore_pending(self, pending):
+        # Put deltas back so the next flush retries them
+        with self._pending_lock:
+            for session_id, delta in pending.items():
+                current = self._pending.get(session_id)
+                if current is None or current[5] != delta[5]:
+                    self._pending[session_id] = delta
+                else:
+                    for i in range(4):
+                        current[i] += delta[i]
+                    current[4] = max(current[4], delta[4])
+
+    def flush(self):
+        """Write all coalesced counter deltas in one transaction"""
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        rows = [(d[0], d[1], d[2], d[3], d[4], session_id, d[5]) for session_id, d in pending.items()]
+        try:
+            with self._transaction() as conn:
+                before = conn.total_changes
+                conn.executemany(FLUSH_SQL, rows)
+                # Rows that were reaped, or whose counters were set after the
+                # deltas were recorded
+                dropped = len(rows) - (conn.total_changes - before)
+                versions = {}
+                ids = list(pending)
+                for start in range(0, len(ids), 500):
+                    chunk = ids[start:start + 500]
+                    marks = ', '.join('?' * len(chunk))
+                    for session_id, version, epoch in conn.execute(
+                            f'SELECT session_id, version, epoch FROM sessions WHERE session_id IN ({marks})', chunk):
+                        versions[session_id] = (version, epoch)
+        except sqlite3.Error:
+            self._restore_pending(pending)
+            raise
+
+        # Keep cached entries valid if nobody else touched them meanwhile
+        for session_id, (version, epoch) in versions.items():
+            stripe = self._stripe_for(session_id)
+            with stripe.lock:
+                entry = stripe.entries.get(session_id)
+                if entry is None:
+                    continue
+                if version == entry[1] + 1 and epoch == entry[3]:
+                    entry[1] = version
+                else:
+                    del stripe.entries[session_id]
+
+        self.flushes += 1
+        self.flushed_rows += len(rows) - dropped
+        self.dropped_rows += dropped
+        return len(rows)
+
+    def reap(self, now=None):
+        """Delete expired sessions and trim the table to max_sessions"""
+        now = time.time() if now is None else now
+        with self._transaction() as conn:
+            expired = conn.execute('DELETE FROM sessions WHERE last_access < ?', (now - self.ttl,)).rowcount
+            excess = conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0] - self.max_sessions
+            evicted = 0
+            if excess > 0:
+                evicted = conn.execute(
+                    'DELETE FROM sessions WHERE session_id IN '
+                    '(SELECT session_id FROM sessions ORDER BY last_access LIMIT ?)', (excess,)).rowcount
+        self.expired += expired
+        self.evicted += evicted
+        return expired + evicted
+
+    # -- background writer -------------------------------------------------
+
+    def _ensure_writer(self):
+        # Started lazily and per process, so forking servers get their own thread
+        if self._writer_pid == os.getpid():
+            return
+        with self._writer_lock:
+            if self._writer_pid == os.getpid():
+                return
+            self._writer_pid = os.getpid()
+            threading.Thread(target=self._writer_loop, name='session-writer', daemon=True).start()
+
+    def _writer_loop(self):
+        last_reap = time.time()
+        while not self._stop.is_set():
+            self._flush_now.wait(self.flush_interval)
+            self._flush_now.clear()
+            try:
+                self.flush()
+                if self.reap_interval and time.time() - last_reap >= self.reap_interval:
+                    self.reap()
+                    last_reap = time.time()
+            except sqlite3.Error:
+                # Typically a busy database; pending deltas are retried next round
+                pass
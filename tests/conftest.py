@@ -0,0 +1,22 @@
+# Test setup
+#
+# The modules live at the repository root, where app.py and the games import
+# them from; pygame runs without a window or sound. Run from the root with
+#
+#     python -m pytest -q
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+
+@pytest.fixture
+def client():
+    """Flask test client for the API, on the default in-memory session store"""
+    import app as app_module
+    return app_module.app.test_client()
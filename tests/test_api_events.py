@@ -0,0 +1,49 @@
+from app import MAX_EVENTS_PER_REQUEST
+
+
+def start(client):
+    return client.post('/api/start_game', json={}).get_json()['session_id']
+
+
+def post_events(client, session_id, events):
+    return client.post('/api/events', json={'session_id': session_id, 'events': events}).get_json()
+
+
+def test_events_already_applied_are_skipped(client):
+    session_id = start(client)
+    batch = [{'seq': 1, 'type': 'catch', 'points': 2}, {'seq': 2, 'type': 'miss'}]
+    assert post_events(client, session_id, batch)['applied'] == 2
+
+    # A resent batch overlapping the first one only applies the new event
+    data = post_events(client, session_id, batch + [{'seq': 3, 'type': 'catch', 'points': 3}])
+    assert data['applied'] == 1
+    assert data['last_seq'] == 3
+    assert (data['score'], data['items_caught'], data['items_missed']) == (5, 2, 1)
+
+
+def test_invalid_catch_points_are_skipped_and_large_ones_capped(client):
+    session_id = start(client)
+    data = post_events(client, session_id, [
+        {'seq': 1, 'type': 'catch', 'points': True},
+        {'seq': 2, 'type': 'catch', 'points': -5},
+        {'seq': 3, 'type': 'catch', 'points': 2.5},
+        {'seq': 4, 'type': 'catch', 'points': 10 ** 9},
+        {'seq': 5, 'type': 'catch', 'points': 4},
+    ])
+    assert data['applied'] == 2
+    assert (data['score'], data['items_caught']) == (14, 2)
+
+
+def test_update_score_validates_points_the_same_way(client):
+    session_id = start(client)
+    for points in (True, -1, 1.5, '3'):
+        data = client.post('/api/update_score', json={'session_id': session_id, 'points': points}).get_json()
+        assert data == {'success': False, 'error': 'Invalid points'}
+    data = client.post('/api/update_score', json={'session_id': session_id, 'points': 99}).get_json()
+    assert data['score'] == 10
+
+
+def test_oversized_batch_is_refused(client):
+    session_id = start(client)
+    events = [{'seq': i + 1, 'type': 'miss'} for i in range(MAX_EVENTS_PER_REQUEST + 1)]
+    assert post_events(client, session_id, events) == {'success': False, 'error': 'Invalid events'}
@@ -0,0 +1,49 @@
+import random
+
+from puzzle_engine import PuzzleBoard
+from puzzle_solver import UNREACHED, build_pattern_db, get_solver, permutation_unrank
+
+
+def test_pattern_databases_add_up_to_a_lower_bound():
+    # Checked against the exact 3x3 distances, on a sample of every state
+    groups = [(0, 1, 2, 3), (4, 5, 6, 7)]
+    tables = [build_pattern_db(3, tiles) for tiles in groups]
+    exact = get_solver(3).distance_table
+    for rank in range(0, len(exact), 11):
+        if exact[rank] == UNREACHED:
+            continue
+        positions = [0] * 9
+        for pos, tile in enumerate(permutation_unrank(rank)):
+            positions[tile] = pos
+        estimate = sum(table[sum(positions[tile] * 9 ** i for i, tile in enumerate(tiles))]
+                       for table, tiles in zip(tables, groups))
+        assert estimate <= exact[rank]
+
+
+def test_pattern_database_counts_only_its_own_tiles():
+    table = build_pattern_db(3, (0, 1))
+    # Tile 0 one cell below home, tile 1 home: one move
+    assert table[3 + 1 * 9] == 1
+    # Tiles 0 and 1 swapped: neither can pass the other in the top row
+    assert table[1 + 0 * 9] > 2
+    # Both home, wherever the other tiles are
+    assert table[0 + 1 * 9] == 0
+
+
+def test_following_hints_solves_in_the_promised_moves():
+    solver = get_solver(3)
+    rng = random.Random(2)
+    for _ in range(20):
+        board = PuzzleBoard(3)
+        for _ in range(60):
+            board.move(rng.choice(board.valid_moves()))
+        hint = solver.hint(board.to_list())
+        distance = 0 if hint is None else hint.distance
+        moves = 0
+        while hint is not None:
+            assert hint.exact
+            board.move(hint.tile_pos)
+            moves += 1
+            hint = solver.hint(board.to_list())
+        assert board.is_solved
+        assert moves == distance
@@ -0,0 +1,49 @@
+import random
+
+import pygame
+import pytest
+
+from render_scale import SceneRenderer
+
+WINDOW = (1000, 700)
+
+
+@pytest.fixture(scope='module')
+def window():
+    pygame.display.init()
+    yield pygame.display.set_mode(WINDOW)
+    pygame.display.quit()
+
+
+def noise(surface, rng):
+    width, height = surface.get_size()
+    for _ in range(400):
+        color = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        surface.fill(color, (rng.randrange(width), rng.randrange(height), rng.randrange(1, 40), rng.randrange(1, 40)))
+
+
+@pytest.mark.parametrize('scale', [0.5, 0.6, 0.75, 0.37])
+def test_dirty_rect_present_matches_a_full_present(window, scale):
+    rng = random.Random(scale)
+    view = SceneRenderer(window, scale)
+    noise(view.surface, rng)
+    view.present()
+
+    # Change a few areas and present only those
+    rects = []
+    for _ in range(30):
+        rect = pygame.Rect(rng.randrange(view.size[0]), rng.randrange(view.size[1]),
+                           rng.randrange(1, 60), rng.randrange(1, 60))
+        view.surface.fill((rng.randrange(256), 0, rng.randrange(256)), rect)
+        rects.append(rect)
+    view.present(rects)
+    partial = window.copy()
+
+    view.present()
+    assert pygame.image.tobytes(partial, 'RGB') == pygame.image.tobytes(window, 'RGB')
+
+
+def test_full_scale_draws_on_the_window(window):
+    view = SceneRenderer(window, 1.0)
+    assert view.surface is window
+    assert view.rect(10, 20, 30, 40) == pygame.Rect(10, 20, 30, 40)
@@ -0,0 +1,117 @@
+import base64
+
+import pytest
+
+from catch_sim import WEB_RULES, CatchSimulation, Mulberry32, chase_lowest_item
+from puzzle_solver import get_solver
+from replay import InvalidReplay, decode_replay, encode_replay, verify_replay
+
+
+def play(seed, input_source=chase_lowest_item):
+    """Play a round as the browser does and return (replay bytes, simulation)"""
+    sim = CatchSimulation(WEB_RULES, seed, rng=Mulberry32(seed))
+    positions = []
+    while not sim.finished:
+        x = round(input_source(sim))
+        positions.append(x)
+        sim.step(x)
+    # The tick that found the time up recorded a position without advancing
+    return encode_replay(seed, positions[:sim.tick]), sim
+
+
+def test_encoding_round_trips():
+    positions = [500, 500, 503, 490, 0, 1000, 999]
+    assert decode_replay(encode_replay(7, positions)) == (7, positions)
+
+
+def test_genuine_win_is_verified():
+    data, sim = play(3)
+    assert sim.won
+    result = verify_replay(data, 3)
+    assert result.won
+    assert (result.score, result.items_caught, result.items_missed) == (sim.score, sim.items_caught,
+                                                                       sim.items_missed)
+
+
+def test_replay_for_another_seed_is_rejected():
+    data, _ = play(3)
+    with pytest.raises(InvalidReplay):
+        verify_replay(data, 4)
+
+
+def test_malformed_replay_is_rejected():
+    data, _ = play(3)
+    with pytest.raises(InvalidReplay):
+        verify_replay(data[:-1], 3)
+    with pytest.raises(InvalidReplay):
+        verify_replay(b'\x00' * 3, 3)
+
+
+def test_replay_that_does_not_win_is_not_a_win():
+    data, sim = play(3, lambda sim: 0)
+    assert not sim.won
+    assert not verify_replay(data, 3).won
+
+
+def test_replay_cut_short_is_not_a_win():
+    _, positions = decode_replay(play(3)[0])
+    assert not verify_replay(encode_replay(3, positions[:-30]), 3).won
+
+
+# -- through the API --------------------------------------------------------
+
+def start(client):
+    data = client.post('/api/start_game', json={}).get_json()
+    return data['session_id'], data['seed']
+
+
+def end(client, session_id, replay=None):
+    body = {'session_id': session_id, 'won': True}
+    if replay is not None:
+        body['replay'] = base64.b64encode(replay).decode('ascii')
+    return client.post('/api/end_game', json=body).get_json()
+
+
+def test_claimed_win_without_a_replay_is_refused(client):
+    session_id, _ = start(client)
+    data = end(client, session_id)
+    assert data['success'] and not data['won'] and not data['verified']
+    assert data['first_answer_part'] == ''
+    for endpoint in ('start_puzzle', 'move_tile', 'move_tiles', 'puzzle_hint'):
+        data = client.post(f'/api/{endpoint}', json={'session_id': session_id, 'tile_pos': 0,
+                                                      'tile_positions': [0]}).get_json()
+        assert data == {'success': False, 'error': 'Catch game not won'}
+
+
+def test_claimed_win_with_a_forged_replay_is_refused(client):
+    session_id, seed = start(client)
+    replay, _ = play(seed ^ 1)
+    assert not end(client, session_id, replay)['won']
+
+    session_id, seed = start(client)
+    replay, _ = play(seed, lambda sim: sim.rules.width // 2)
+    assert not end(client, session_id, replay)['won']
+
+
+def test_verified_win_replaces_the_reported_score_and_unlocks_the_puzzle(client):
+    session_id, seed = start(client)
+    # The client claims more than the round was worth
+    events = [{'seq': i + 1, 'type': 'catch', 'points': 10} for i in range(50)]
+    assert client.post('/api/events', json={'session_id': session_id, 'events': events}).get_json()['score'] == 500
+    replay, sim = play(seed)
+    data = end(client, session_id, replay)
+    assert data['won'] and data['verified']
+    assert data['final_score'] == sim.score < 500
+    assert data['first_answer_part'] == 'aCM_iS_'
+
+    data = client.post('/api/start_puzzle', json={'session_id': session_id}).get_json()
+    assert data['success']
+    solver = get_solver(3)
+    grid = data['puzzle_state']
+    while True:
+        hint = solver.hint(grid)
+        data = client.post('/api/move_tile', json={'session_id': session_id, 'tile_pos': hint.tile_pos}).get_json()
+        grid = data['puzzle_state']
+        if data['solved']:
+            break
+    assert data['full_answer'] == 'aCM_iS_tHe_GOaT'
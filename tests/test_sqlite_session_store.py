@@ -0,0 +1,166 @@
+# Two SqliteSessionStore instances on one file stand in for two workers
+
+import sqlite3
+import time
+
+import pytest
+
+from puzzle_engine import PuzzleBoard
+from session_store import SessionConflict
+from sqlite_session_store import SqliteSessionStore
+
+
+@pytest.fixture
+def workers(tmp_path):
+    # Counters only reach the file on an explicit flush(), and cached
+    # sessions are trusted until a write finds them stale
+    path = str(tmp_path / 'sessions.db')
+    stores = [SqliteSessionStore(path, cache_ttl=3600, flush_interval=3600, reap_interval=0) for _ in range(2)]
+    yield stores
+    for store in stores:
+        store.close()
+
+
+def row(store, session_id, *columns):
+    return store._connection().execute(
+        f'SELECT {", ".join(columns)} FROM sessions WHERE session_id = ?', (session_id,)).fetchone()
+
+
+def test_counters_from_every_worker_add_up(workers):
+    a, b = workers
+    session_id = a.create()
+    for store in (a, b, a, b, b):
+        with store.locked(session_id) as session:
+            session.score += 3
+            session.items_caught += 1
+    with b.locked(session_id) as session:
+        session.items_missed += 1
+    a.flush()
+    b.flush()
+    assert row(a, session_id, 'score', 'items_caught', 'items_missed') == (15, 5, 1)
+
+
+def test_worker_that_never_created_a_session_flushes_its_counters(tmp_path):
+    path = str(tmp_path / 'sessions.db')
+    creator = SqliteSessionStore(path, flush_interval=3600, reap_interval=0)
+    other = SqliteSessionStore(path, flush_interval=0.01, reap_interval=0)
+    try:
+        session_id = creator.create()
+        with other.locked(session_id) as session:
+            session.score += 4
+        deadline = time.time() + 5
+        while row(creator, session_id, 'score') != (4,) and time.time() < deadline:
+            time.sleep(0.01)
+        assert row(creator, session_id, 'score') == (4,)
+    finally:
+        creator.close()
+        other.close()
+
+
+def test_set_counters_discards_increments_buffered_elsewhere(workers):
+    # Points posted to one worker just before end_game lands on another
+    a, b = workers
+    session_id = a.create()
+    with b.locked(session_id) as session:
+        session.score += 7
+        session.items_caught += 1
+    with a.locked(session_id) as session:
+        session.items_missed += 1
+    with a.locked(session_id) as session:
+        a.set_counters(session, score=3, items_caught=1)
+        session.game_over = True
+    b.flush()
+    a.flush()
+    assert row(a, session_id, 'score', 'items_caught', 'items_missed', 'game_over') == (3, 1, 1, 1)
+
+
+def test_set_counters_higher_than_before_is_not_a_delta(workers):
+    a, b = workers
+    session_id = a.create()
+    with b.locked(session_id) as session:
+        session.score += 70
+    with a.locked(session_id) as session:
+        a.set_counters(session, score=10)
+    b.flush()
+    a.flush()
+    assert row(a, session_id, 'score') == (10,)
+    with b.locked(session_id) as session:
+        assert session.score == 10
+
+
+def test_counter_reset_discards_moves_buffered_elsewhere(workers):
+    a, b = workers
+    session_id = a.create()
+    with b.locked(session_id) as session:
+        session.puzzle_moves += 5
+    with a.locked(session_id) as session:
+        a.set_counters(session, puzzle_moves=0)
+        session.puzzle_state = PuzzleBoard(3)
+    b.flush()
+    a.flush()
+    assert row(a, session_id, 'puzzle_moves') == (0,)
+
+
+def test_field_write_on_stale_state_conflicts(workers):
+    a, b = workers
+    session_id = a.create()
+    with b.locked(session_id) as session:
+        assert not session.game_over
+    with a.locked(session_id) as session:
+        session.game_over = True
+        session.won = True
+    with pytest.raises(SessionConflict):
+        with b.locked(session_id) as session:
+            # Still the cached copy from before the game ended
+            assert not session.game_over
+            session.first_answer_part = 'stale'
+    with b.locked(session_id) as session:
+        assert session.game_over and session.won
+        assert session.first_answer_part == ''
+
+
+def test_field_write_is_redone_after_counter_flushes(workers):
+    a, b = workers
+    session_id = a.create()
+    with a.locked(session_id) as session:
+        pass
+    with b.locked(session_id) as session:
+        session.score += 2
+    b.flush()
+    with a.locked(session_id) as session:
+        session.first_answer_part = 'x'
+    a.flush()
+    assert row(a, session_id, 'score', 'first_answer_part') == (2, 'x')
+
+
+def test_write_to_a_reaped_session_is_dropped(workers):
+    a, _ = workers
+    session_id = a.create()
+    with a.locked(session_id) as session:
+        a._connection().execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+        session.game_over = True
+        session.score += 1
+    assert a.flush() == 0
+    with a.locked(session_id) as session:
+        assert session is None
+
+
+def test_missing_columns_get_their_schema_type(tmp_path):
+    path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE sessions (session_id TEXT PRIMARY KEY, score INTEGER NOT NULL DEFAULT 0, '
+                 'start_time REAL, last_access REAL NOT NULL, version INTEGER NOT NULL DEFAULT 0)')
+    conn.execute('INSERT INTO sessions (session_id, start_time, last_access) VALUES (?, ?, ?)',
+                 ('old', time.time(), time.time()))
+    conn.commit()
+    conn.close()
+
+    store = SqliteSessionStore(path, flush_interval=3600, reap_interval=0)
+    try:
+        with store.locked('old') as session:
+            assert session.puzzle_state is None
+            assert session.first_answer_part == ''
+            assert session.game_over is False
+            assert session.end_time is None
+    finally:
+        store.close()
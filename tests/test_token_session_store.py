@@ -0,0 +1,85 @@
+import base64
+
+import pytest
+
+from token_session_store import InvalidToken, TokenSessionStore
+
+
+@pytest.fixture
+def store():
+    return TokenSessionStore('test-secret')
+
+
+def advance(store, token, **changes):
+    """Apply changes through locked() and return the token issued for them"""
+    with store.locked(token) as session:
+        assert session is not None
+        for name, value in changes.items():
+            setattr(session, name, value)
+        return store.issue(token, session)
+
+
+def test_round_trip(store):
+    token = advance(store, store.create(), score=12, items_caught=3, first_answer_part='aCM_iS_')
+    with store.locked(token) as session:
+        assert (session.score, session.items_caught, session.first_answer_part) == (12, 3, 'aCM_iS_')
+
+
+def test_forged_token_is_rejected(store):
+    raw = bytearray(base64.urlsafe_b64decode(store.create() + '=='))
+    raw[5] ^= 1
+    forged = base64.urlsafe_b64encode(bytes(raw)).rstrip(b'=').decode('ascii')
+    with pytest.raises(InvalidToken):
+        store.decode(forged)
+    with store.locked(forged) as session:
+        assert session is None
+
+    other = TokenSessionStore('another-secret')
+    with other.locked(store.create()) as session:
+        assert session is None
+
+
+def test_older_token_is_rejected(store):
+    first = store.create()
+    second = advance(store, first, score=5)
+    advance(store, second, score=10)
+    with store.locked(second) as session:
+        assert session is None
+    assert store.stats()['replays'] == 1
+
+
+def test_fork_from_an_earlier_token_is_rejected(store):
+    first = store.create()
+    with store.locked(first) as session:
+        session.score = 1
+        fork_a = store.issue(first, session)
+    # Same sequence number, different contents: only the first one used counts
+    other = TokenSessionStore('test-secret')
+    fork_b = advance(other, first, score=99)
+    advance(store, fork_a)
+    with store.locked(fork_b) as session:
+        assert session is None
+
+
+def test_token_is_spent_once_its_successor_is_issued(store):
+    token = store.create()
+    advance(store, token, score=1)
+    with store.locked(token) as session:
+        assert session is None
+
+
+def test_token_in_use_is_refused_until_released(store):
+    token = store.create()
+    with store.locked(token) as session:
+        assert session is not None
+        with store.locked(token) as again:
+            assert again is None
+    # Nothing was issued, so the client may retry with the same token
+    with store.locked(token) as session:
+        assert session is not None
+
+
+def test_out_of_range_counters_are_clamped(store):
+    token = advance(store, store.create(), score=10 ** 12, items_missed=-3, puzzle_moves=2.5)
+    with store.locked(token) as session:
+        assert (session.score, session.items_missed, session.puzzle_moves) == (2 ** 31 - 1, 0, 2)
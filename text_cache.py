@@ -0,0 +1,75 @@
+# Rendered text for the pygame games' HUDs and menus
+#
+# Both games draw every label every frame, but almost none of the text
+# changes between frames. render() keeps the surfaces in an LRU keyed by
+# (font, text, colour, antialias), so a font is only rasterised when a value
+# actually changes (a new score, the timer ticking down a second). Fonts are
+# shared through font() as well, so a restarted game keeps hitting the
+# entries its previous instance created.
+#
+# A lock keeps the LRU consistent should it be used from more than one
+# thread, and also keeps two threads from rasterising with one font at once.
+
+import threading
+from collections import OrderedDict
+
+import pygame
+
+
+class TextCache:
+    """LRU cache of rendered text surfaces"""
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self._fonts = {}
+        self._surfaces = OrderedDict()  # oldest use first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def font(self, name, size):
+        """Return a shared pygame Font"""
+        key = (name, size)
+        with self._lock:
+            font = self._fonts.get(key)
+            if font is None:
+                font = self._fonts[key] = pygame.font.Font(name, size)
+            return font
+
+    def render(self, font, text, antialias, color):
+        """Same as font.render(text, antialias, color), cached"""
+        key = (font, text, tuple(color), antialias)
+        with self._lock:
+            surface = self._surfaces.get(key)
+            if surface is not None:
+                self._surfaces.move_to_end(key)
+                self.hits += 1
+                return surface
+
+            self.misses += 1
+            surface = font.render(text, antialias, color)
+            if pygame.display.get_surface() is not None:
+                surface = surface.convert_alpha()
+            self._surfaces[key] = surface
+            while len(self._surfaces) > self.capacity:
+                self._surfaces.popitem(last=False)
+                self.evicted += 1
+            return surface
+
+    def clear(self):
+        with self._lock:
+            self._surfaces.clear()
+
+    def stats(self):
+        """Return cache size and hit/miss counters"""
+        return {
+            'size': len(self._surfaces),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evicted': self.evicted,
+        }
+
+
+# The cache every game shares
+texts = TextCache()
@@ -0,0 +1,268 @@
+# Stateless session backend
+#
+# The whole session is packed into a small binary blob, signed with the app's
+# SECRET_KEY and handed to the client as its session_id. Every API call
+# verifies the blob, applies the update and returns a freshly signed blob, so
+# no worker needs shared storage and any node can serve any request.
+#
+# Each token carries a monotonic sequence number. A worker remembers the
+# highest sequence it has seen per session (in a bounded LRU) and refuses
+# anything older, so a player cannot roll the game back by replaying an
+# earlier token to the same worker. A token is also spent once a response
+# carrying its successor has been issued, so it cannot be sent again and
+# again to pick the best of several outcomes (say, the easiest scramble);
+# it can still be retried after a request that issued nothing. Replays across workers cannot be caught
+# without shared state; use the sqlite backend if that matters.
+
+import base64
+import hashlib
+import hmac
+import math
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from puzzle_engine import PuzzleBoard
+from session_store import GameSession
+
+TOKEN_VERSION = 4
+MAC_SIZE = 16
+
+# version, flags, seq, id, score, caught, missed, moves, event_seq,
+# replay_seed, start_time, then end / puzzle start / puzzle end / last access as float32
+# offsets from start_time (NaN means None). The packed puzzle board follows.
+HEADER = struct.Struct('<BBI8siIIIIIdffff')
+INT32 = (-2 ** 31, 2 ** 31 - 1)
+UINT32 = (0, 2 ** 32 - 1)
+
+FLAG_GAME_OVER = 1
+FLAG_WON = 2
+FLAG_MISSED_FINAL = 4
+FLAG_PUZZLE_COMPLETED = 8
+FLAG_HAS_PUZZLE = 16
+
+STRINGS = ('first_answer_part', 'second_answer_part', 'full_answer')
+
+
+class InvalidToken(Exception):
+    """Raised when a token is malformed, forged, expired or replayed"""
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _clamp(value, bounds):
+    """Coerce a counter to an int that fits its packed field"""
+    low, high = bounds
+    if isinstance(value, float):
+        if math.isnan(value):
+            return 0
+        value = max(low, min(high, value))
+    return max(low, min(high, int(value)))
+
+
+def _offset(value, start):
+    return math.nan if value is None else value - start
+
+
+def _absolute(offset, start):
+    return None if math.isnan(offset) else start + offset
+
+
+class TokenSessionStore:
+    """Session "store" that keeps all state inside signed client tokens"""
+
+    def __init__(self, secret_key, ttl=3600, replay_window=50000):
+        if isinstance(secret_key, str):
+            secret_key = secret_key.encode('utf-8')
+        self._key = hashlib.sha256(b'session-token:' + secret_key).digest()
+        self.ttl = ttl
+        self.replay_window = replay_window
+        self._seen = OrderedDict()  # token id -> [highest sequence presented, its MAC, in use or spent]
+        self._seen_lock = threading.Lock()
+        self._local = threading.local()
+        self.issued = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.replays = 0
+
+    # -- encoding ----------------------------------------------------------
+
+    def _sign(self, payload):
+        return hmac.new(self._key, payload, hashlib.sha256).digest()[:MAC_SIZE]
+
+    def encode(self, session, token_id, seq):
+        """Pack and sign a session"""
+        start = session.start_time
+        flags = ((FLAG_GAME_OVER if session.game_over else 0) |
+                 (FLAG_WON if session.won else 0) |
+                 (FLAG_MISSED_FINAL if session.missed_final_item else 0) |
+                 (FLAG_PUZZLE_COMPLETED if session.puzzle_completed else 0) |
+                 (FLAG_HAS_PUZZLE if session.puzzle_state is not None else 0))
+        parts = [HEADER.pack(
+            TOKEN_VERSION, flags, seq, token_id,
+            _clamp(session.score, INT32), _clamp(session.items_caught, UINT32),
+            _clamp(session.items_missed, UINT32), _clamp(session.puzzle_moves, UINT32),
+            _clamp(session.event_seq, UINT32), session.replay_seed,
+            start,
+            _offset(session.end_time, start), _offset(session.puzzle_start_time, start),
+            _offset(session.puzzle_end_time, start), _offset(session.last_access, start),
+        )]
+        if session.puzzle_state is not None:
+            parts.append(bytes([len(session.puzzle_state)]))
+            parts.append(bytes(session.puzzle_state))
+        for name in STRINGS:
+            value = getattr(session, name).encode('utf-8')
+            parts.append(bytes([len(value)]))
+            parts.append(value)
+        payload = b''.join(parts)
+        return _b64encode(payload + self._sign(payload))
+
+    def decode(self, token):
+        """Verify a token and return (session, token_id, seq)"""
+        return self._decode(token)[:3]
+
+    def _decode(self, token):
+        try:
+            raw = _b64decode(token)
+        except (ValueError, TypeError):
+            raise InvalidToken('malformed token')
+        payload, mac = raw[:-MAC_SIZE], raw[-MAC_SIZE:]
+        if len(payload) < HEADER.size or not hmac.compare_digest(mac, self._sign(payload)):
+            raise InvalidToken('bad signature')
+
+        (version, flags, seq, token_id, score, caught, missed, moves, event_seq, replay_seed,
+         start, end, puzzle_start, puzzle_end, last_access) = HEADER.unpack_from(payload)
+        if version != TOKEN_VERSION:
+            raise InvalidToken('unsupported token version')
+
+        session = GameSession(start)
+        session.score = score
+        session.items_caught = caught
+        session.items_missed = missed
+        session.puzzle_moves = moves
+        session.event_seq = event_seq
+        session.replay_seed = replay_seed
+        session.game_over = bool(flags & FLAG_GAME_OVER)
+        session.won = bool(flags & FLAG_WON)
+        session.missed_final_item = bool(flags & FLAG_MISSED_FINAL)
+        session.puzzle_completed = bool(flags & FLAG_PUZZLE_COMPLETED)
+        session.end_time = _absolute(end, start)
+        session.duration = None if session.end_time is None else session.end_time - start
+        session.puzzle_start_time = _absolute(puzzle_start, start)
+        session.puzzle_end_time = _absolute(puzzle_end, start)
+        session.last_access = _absolute(last_access, start)
+
+        pos = HEADER.size
+        if flags & FLAG_HAS_PUZZLE:
+            size = payload[pos]
+            session.puzzle_state = PuzzleBoard.from_bytes(payload[pos + 1:pos + 1 + size])
+            pos += 1 + size
+        for name in STRINGS:
+            size = payload[pos]
+            setattr(session, name, payload[pos + 1:pos + 1 + size].decode('utf-8'))
+            pos += 1 + size
+        return session, token_id, seq, mac
+
+    # -- public interface (same as SessionStore) ---------------------------
+
+    def create(self):
+        """Return a signed token for a brand new session"""
+        self.issued += 1
+        return self.encode(GameSession(), os.urandom(8), 0)
+
+    @contextmanager
+    def locked(self, session_id):
+        """Yield the session carried by a token, or None if it is not acceptable"""
+        try:
+            if not isinstance(session_id, str):
+                raise InvalidToken('missing token')
+            session, token_id, seq, mac = self._decode(session_id)
+            if time.time() - session.last_access > self.ttl:
+                raise InvalidToken('expired token')
+            self._check_sequence(token_id, seq, mac)
+        except InvalidToken:
+            self.rejected += 1
+            yield None
+            return
+
+        self.accepted += 1
+        session.last_access = time.time()
+        current = self._local.current = [session_id, token_id, seq, False]
+        try:
+            yield session
+        finally:
+            self._local.current = None
+            if not current[3]:
+                self._release(token_id, seq, mac)
+
+    def issue(self, session_id, session):
+        """Return the token the client must send with its next request"""
+        current = getattr(self._local, 'current', None)
+        if current is not None and current[0] == session_id:
+            _, token_id, seq, _ = current
+            current[3] = True  # the token stays spent
+        else:
+            _, token_id, seq = self.decode(session_id)
+        self.issued += 1
+        return self.encode(session, token_id, seq + 1)
+
+    def set_counters(self, session, **values):
+        """Set counters of the session being updated to absolute values"""
+        for name, value in values.items():
+            setattr(session, name, value)
+
+    def _check_sequence(self, token_id, seq, mac):
+        # An older sequence, a different token with the same one (a fork from
+        # an earlier token), or the same token while another request is using
+        # it or after its successor was issued, is a replay
+        with self._seen_lock:
+            highest = self._seen.get(token_id)
+            if highest is not None and (
+                    seq < highest[0] or (seq == highest[0] and (mac != highest[1] or highest[2]))):
+                self.replays += 1
+                raise InvalidToken('replayed token')
+            self._seen[token_id] = [seq, mac, True]
+            self._seen.move_to_end(token_id)
+            while len(self._seen) > self.replay_window:
+                self._seen.popitem(last=False)
+
+    def _release(self, token_id, seq, mac):
+        # The request issued no new token, so the client may send this one again
+        with self._seen_lock:
+            highest = self._seen.get(token_id)
+            if highest is not None and highest[0] == seq and highest[1] == mac:
+                highest[2] = False
+
+    def __len__(self):
+        # Sessions live on the clients; the closest thing to a count is the
+        # number of sessions this worker is tracking for replay protection
+        return len(self._seen)
+
+    def sample(self, limit):
+        # The sessions themselves are only ever held by the clients
+        return []
+
+    def reap(self, now=None):
+        return 0
+
+    def close(self):
+        pass
+
+    def stats(self):
+        """Return token counters"""
+        return {
+            'sessions': len(self._seen),
+            'issued': self.issued,
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'replays': self.replays,
+        }